@@ -0,0 +1 @@
+"""Headless-Benchmarks des KVP-Tools (``python -m benchmarks.run``)."""
@@ -0,0 +1,261 @@
+"""Last- und Laufzeit-Benchmarks des KVP-Tools.
+
+Erzeugt ein synthetisches Portfolio in einer temporären Datenbank, misst
+Import- und Exportdurchsatz und steuert ``streamlit_app.py`` anschließend
+über Streamlits ``AppTest`` ohne Browser: Kaltstart bis zur ersten fertigen
+Seite in einem frischen Prozess, Rerun-Latenz typischer Aktionen
+(Phasenwechsel, Dashboard, Suche, Projektwechsel) und Speicher je Sitzung.
+
+    python -m benchmarks.run --projects 2000 --tasks 20
+    python -m benchmarks.run --save-baseline          # aktuellen Stand als Vergleichsbasis ablegen
+
+Ergebnisse landen in ``benchmarks/results/`` (nicht versioniert); liegt dort
+eine ``baseline.json``, wird jeder Lauf damit verglichen. Verschlechtert sich
+ein Wert über die Toleranz hinaus, endet der Lauf mit Exit-Code 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, 'streamlit_app.py')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+BASELINE_PATH = os.path.join(RESULTS_DIR, 'baseline.json')
+PHASES = ('plan', 'do', 'check', 'act', 'dashboard')
+# Bibliotheken, die erst bei Bedarf geladen werden sollen
+DEFERRED_MODULES = ('pandas', 'plotly.express', 'plotly.graph_objects', 'kvp.analytics')
+
+# Läuft in einem frischen Interpreter: Importe, Aufbau der prozessweiten Ressourcen und erster Durchlauf
+STARTUP_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=300)
+at.run()
+if at.exception:
+    sys.exit(f'Fehler in der App: {at.exception[0].value}')
+print(json.dumps({'seconds': time.perf_counter() - started, 'modules': len(sys.modules),
+                  'loaded': [name for name in sys.argv[2:] if name in sys.modules]}))
+'''
+
+sys.path.insert(0, ROOT)
+
+from kvp.exporter import export_jsonl  # noqa: E402
+from kvp.importer import import_file, import_records  # noqa: E402
+from kvp.sample import generate_portfolio  # noqa: E402
+from kvp.storage import ProjectStore  # noqa: E402
+
+
+class Results:
+    """Messwerte als ``name -> {value, unit, better}``; ``better`` ist ``lower`` oder ``higher``."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, value: float, unit: str, better: str = 'lower'):
+        self.metrics[name] = {'value': round(value, 3), 'unit': unit, 'better': better}
+        print(f'  {name:<34} {value:>12.1f} {unit}')
+
+    def add_latencies(self, name: str, seconds: List[float]):
+        millis = sorted(1000 * value for value in seconds)
+        self.add(f'{name}.median', statistics.median(millis), 'ms')
+        self.add(f'{name}.p95', millis[min(len(millis) - 1, int(0.95 * len(millis)))], 'ms')
+
+
+# Durchsatz
+def bench_storage(results: Results, workdir: str, projects: int, tasks: int, seed: int) -> str:
+    print('Import/Export')
+    db_path = os.path.join(workdir, 'kvp.db')
+    report = import_records(ProjectStore(db_path), generate_portfolio(projects, tasks, seed))
+    results.add('import.generated.projects_per_s', report.projects_per_second, 'Projekte/s', 'higher')
+    results.add('import.generated.tasks_per_s', report.tasks_per_second, 'Aufgaben/s', 'higher')
+
+    export_path = os.path.join(workdir, 'portfolio.jsonl.gz')
+    started = time.perf_counter()
+    count = export_jsonl(ProjectStore(db_path), export_path)
+    results.add('export.jsonl.projects_per_s', count / (time.perf_counter() - started), 'Projekte/s', 'higher')
+
+    report = import_file(ProjectStore(os.path.join(workdir, 'reimport.db')), export_path)
+    results.add('import.jsonl.projects_per_s', report.projects_per_second, 'Projekte/s', 'higher')
+    return db_path
+
+
+# Oberfläche
+def _app_test():
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_file(APP_PATH, default_timeout=300)
+
+
+def _timed(at, action: Optional[Callable[[Any], Any]] = None) -> float:
+    started = time.perf_counter()
+    (action(at) if action else at).run()
+    elapsed = time.perf_counter() - started
+    if at.exception:
+        raise RuntimeError(f'Fehler in der App: {at.exception[0].value}')
+    return elapsed
+
+
+def _project_select(at):
+    return next(box for box in at.sidebar.selectbox if box.label == 'Aktives Projekt:')
+
+
+def bench_startup(results: Results, runs: int):
+    """Zeit vom Start eines neuen Prozesses bis zur ersten fertigen Seite (wie eine frisch skalierte Instanz)."""
+    print('Kaltstart')
+    wall, script, modules, loaded = [], [], 0, []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, APP_PATH, *DEFERRED_MODULES],
+                                cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        wall.append(time.perf_counter() - started)
+        run = json.loads(output.strip().splitlines()[-1])
+        script.append(run['seconds'])
+        modules, loaded = run['modules'], run['loaded']
+    results.add_latencies('startup.first_paint', wall)
+    results.add_latencies('startup.first_run', script)
+    results.add('startup.modules', modules, 'Module')
+    if loaded:
+        print(f"  beim Start geladen, obwohl erst bei Bedarf benötigt: {', '.join(loaded)}")
+
+
+def bench_reruns(results: Results, reruns: int, search_query: str):
+    print('Rerun-Latenz')
+    at = _app_test()
+    results.add('app.first_run', 1000 * _timed(at), 'ms')
+    results.add_latencies('app.rerun', [_timed(at) for _ in range(reruns)])
+    for phase in PHASES:
+        samples = []
+        for _ in range(reruns):
+            # Hin- und Rückweg, damit jede Messung einen echten Phasenwechsel enthält
+            at.radio(key='active_phase').set_value('plan' if phase != 'plan' else 'act').run()
+            samples.append(_timed(at, lambda app: app.radio(key='active_phase').set_value(phase)))
+        results.add_latencies(f'app.phase.{phase}', samples)
+
+    at.radio(key='active_phase').set_value('dashboard').run()
+    samples = []
+    for _ in range(reruns):
+        at.radio(key='dashboard_scope').set_value('Projekt').run()
+        samples.append(_timed(at, lambda app: app.radio(key='dashboard_scope').set_value('Portfolio')))
+    results.add_latencies('app.dashboard.portfolio', samples)
+
+    samples = []
+    for position in range(reruns):
+        query = search_query[:max(3, len(search_query) - position % 3)]
+        samples.append(_timed(at, lambda app: app.text_input(key='project_search').input(query)))
+    results.add_latencies('app.search', samples)
+    at.text_input(key='project_search').input('').run()
+
+    count = len(_project_select(at).options)
+    samples = [_timed(at, lambda app: _project_select(app).select_index((position + 1) % count))
+               for position in range(reruns)]
+    results.add_latencies('app.switch_project', samples)
+
+
+def bench_memory(results: Results, sessions: int):
+    print('Speicher je Sitzung')
+    # Prozessweite Ressourcen (Ablage, Indizes) sind nach den Rerun-Messungen bereits aufgebaut
+    warm = _app_test()
+    _timed(warm)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = []
+    for _ in range(sessions):
+        at = _app_test()
+        _timed(at)
+        _timed(at, lambda app: app.radio(key='active_phase').set_value('do'))
+        kept.append(at)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    growth = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    results.add('app.memory_per_session', growth / sessions / 1024, 'KB')
+
+
+# Vergleich mit der Basis
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta_ms: float) -> List[str]:
+    regressions = []
+    print(f"\nVergleich mit Basis vom {baseline['meta']['created']} (Toleranz {tolerance:.0%})")
+    for name, metric in current['metrics'].items():
+        base = baseline['metrics'].get(name)
+        if not base or not base['value']:
+            continue
+        ratio = metric['value'] / base['value']
+        worse = ratio - 1 if metric['better'] == 'lower' else 1 - ratio
+        # Kleine absolute Abweichungen bei Latenzen sind Rauschen
+        noise = metric['unit'] == 'ms' and abs(metric['value'] - base['value']) < min_delta_ms
+        flag = 'REGRESSION' if worse > tolerance and not noise else ''
+        print(f"  {name:<34} {base['value']:>12.1f} -> {metric['value']:>12.1f} {metric['unit']:<10} "
+              f"{ratio - 1:+7.1%} {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Headless-Benchmarks des KVP-Tools')
+    parser.add_argument('--projects', type=int, default=2000, help='Projekte im synthetischen Portfolio')
+    parser.add_argument('--tasks', type=int, default=20, help='Aufgaben je Projekt')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reruns', type=int, default=10, help='Wiederholungen je Aktion')
+    parser.add_argument('--sessions', type=int, default=5, help='Sitzungen für die Speichermessung')
+    parser.add_argument('--startup-runs', type=int, default=5, help='Kaltstarts in frischen Prozessen')
+    parser.add_argument('--search', default='Rüstzeiten Montage', help='Suchbegriff für die Suchmessung')
+    parser.add_argument('--skip-app', action='store_true', help='Nur Import/Export messen (ohne Streamlit)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Vergleichsbasis')
+    parser.add_argument('--save-baseline', action='store_true', help='Ergebnis als neue Vergleichsbasis speichern')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Erlaubte Verschlechterung (Anteil)')
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help='Latenzabweichungen darunter ignorieren')
+    args = parser.parse_args(argv)
+
+    results = Results()
+    with tempfile.TemporaryDirectory(prefix='kvp-bench-') as workdir:
+        db_path = bench_storage(results, workdir, args.projects, args.tasks, args.seed)
+        if not args.skip_app:
+            # Die App liest Datenbankpfad und Stichprobenrate beim ersten Zugriff
+            os.environ['KVP_DB_PATH'] = db_path
+            os.environ.setdefault('KVP_PROFILE_SAMPLE', '0')
+            bench_startup(results, args.startup_runs)
+            bench_reruns(results, args.reruns, args.search)
+            bench_memory(results, args.sessions)
+
+    report = {
+        'meta': {'created': datetime.now().isoformat(timespec='seconds'), 'projects': args.projects,
+                 'tasks': args.tasks, 'seed': args.seed, 'reruns': args.reruns,
+                 'python': platform.python_version(), 'machine': platform.machine()},
+        'metrics': results.metrics,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"run_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(path, 'w', encoding='utf-8') as result_file:
+        json.dump(report, result_file, indent=2, ensure_ascii=False)
+    print(f'\nErgebnis: {path}')
+
+    exit_code = 0
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump(report, baseline_file, indent=2, ensure_ascii=False)
+        print(f'Vergleichsbasis gespeichert: {args.baseline}')
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        if {key: baseline['meta'].get(key) for key in ('projects', 'tasks', 'seed')} != \
+                {key: report['meta'][key] for key in ('projects', 'tasks', 'seed')}:
+            print('Hinweis: Basis wurde mit anderem Portfolio gemessen; Werte sind nur bedingt vergleichbar.')
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} Verschlechterung(en): {', '.join(regressions)}")
+            exit_code = 1
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
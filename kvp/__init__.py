@@ -0,0 +1 @@
+"""Hilfsmodule des digitalen KVP-Tools (Speicherung, Indizes, Export)."""
@@ -0,0 +1,298 @@
+"""Benutzer, Teams und Projektfreigaben mit Prüfung in der Datenzugriffsschicht.
+
+Freigaben liegen je Projekt in ``project_acl`` für einen Benutzer
+(``user:<id>``) oder ein Team (``team:<id>``); das Team ``all`` umfasst alle
+Benutzer. Stufen sind Lesen, Bearbeiten und Verwalten (Löschen, Freigeben);
+wer ein Projekt anlegt, verwaltet es. Die Rolle begrenzt die Stufe: Leser
+dürfen höchstens lesen, Bearbeiter über Teamfreigaben höchstens bearbeiten
+und nur über persönliche Freigaben (etwa als Anlegende) verwalten, Admins
+dürfen alles in allen Projekten.
+
+``compile_permissions`` löst Rolle, Teams und Freigaben einmal in ein
+``Permissions``-Objekt auf (zwei Abfragen über den Index nach Principal).
+``ScopedStore`` prüft damit jeden Zugriff und filtert Listen auf die
+sichtbaren Projekte; verbotene Zugriffe lösen ``PermissionDenied`` aus.
+"""
+
+from contextlib import contextmanager
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional
+
+from .storage import DEFAULT_GRANTS, ProjectNotFound, ProjectStore
+
+# Freigabestufen
+READ, WRITE, MANAGE = 1, 2, 3
+LEVEL_LABELS = {READ: "Lesen", WRITE: "Bearbeiten", MANAGE: "Verwalten"}
+
+ROLES = ('Admin', 'Bearbeiter', 'Leser')
+# Höchste Stufe je Rolle; Admins zusätzlich in allen Projekten
+ROLE_LEVELS = {'Admin': MANAGE, 'Bearbeiter': WRITE, 'Leser': READ}
+# Höchste Stufe über persönliche Freigaben (``user:<id>``), z. B. für Anlegende
+PERSONAL_LEVELS = {'Admin': MANAGE, 'Bearbeiter': MANAGE, 'Leser': READ}
+
+EVERYONE = 'team:all'
+# Neue Projekte erhalten in der Ablage ``DEFAULT_GRANTS``; die Anlegenden verwalten sie
+
+
+class PermissionDenied(PermissionError):
+    pass
+
+
+def user_principal(user_id: str) -> str:
+    return f'user:{user_id}'
+
+
+def team_principal(team_id: str) -> str:
+    return f'team:{team_id}'
+
+
+class Permissions:
+    """Aufgelöste Rechte eines Benutzers; unveränderlich und zwischen Sitzungen teilbar."""
+
+    def __init__(self, user: Dict[str, Any], teams: List[str], levels: Dict[str, int],
+                 personal: Optional[Dict[str, int]] = None):
+        self.user_id = user['id']
+        self.name = user['name']
+        self.role = user['role']
+        self.teams = tuple(teams)
+        self.max_level = ROLE_LEVELS.get(self.role, 0)
+        self.is_admin = self.role == 'Admin'
+        self._levels = {project_id: min(level, self.max_level) for project_id, level in levels.items()}
+        personal_max = PERSONAL_LEVELS.get(self.role, 0)
+        for project_id, level in (personal or {}).items():
+            self._levels[project_id] = max(self._levels.get(project_id, 0), min(level, personal_max))
+        self._readable = frozenset(self._levels)
+
+    @property
+    def readable(self) -> Optional[FrozenSet[str]]:
+        """Sichtbare Projekt-IDs; ``None`` steht für alle Projekte (Admin)."""
+        return None if self.is_admin else self._readable
+
+    @property
+    def can_create(self) -> bool:
+        return self.max_level >= WRITE
+
+    def level(self, project_id: str) -> int:
+        return MANAGE if self.is_admin else self._levels.get(project_id, 0)
+
+    def can_read(self, project_id: str) -> bool:
+        return self.level(project_id) >= READ
+
+    def can_write(self, project_id: str) -> bool:
+        return self.level(project_id) >= WRITE
+
+    def can_manage(self, project_id: str) -> bool:
+        return self.level(project_id) >= MANAGE
+
+
+def compile_permissions(store: ProjectStore, user_id: str) -> Permissions:
+    user = store.get_user(user_id)
+    if user is None:
+        raise PermissionDenied(f'Unbekannter Benutzer: {user_id}')
+    teams = store.user_teams(user_id)
+    if user['role'] == 'Admin':
+        return Permissions(user, teams, {})
+    levels = store.access_levels([EVERYONE] + [team_principal(team) for team in teams])
+    return Permissions(user, teams, levels, store.access_levels([user_principal(user_id)]))
+
+
+def ensure_admin(store: ProjectStore, user_id: str, name: Optional[str] = None):
+    """Legt bei leerer Benutzertabelle ``user_id`` als ersten Admin an."""
+    if not store.count_users():
+        store.save_user(user_id, name or user_id, 'Admin')
+
+
+class ScopedStore:
+    """Projektablage aus Sicht eines Benutzers; Rechte werden vor jedem Zugriff geprüft.
+
+    ``permissions`` kann zwischen zwei Durchläufen ausgetauscht werden (z. B.
+    nach geänderten Freigaben), die Instanz selbst bleibt pro Sitzung bestehen.
+    """
+
+    def __init__(self, store: ProjectStore, permissions: Permissions):
+        self.store = store
+        self.permissions = permissions
+
+    def _require(self, project_id: str, level: int):
+        if self.permissions.level(project_id) < level:
+            raise PermissionDenied(f'{LEVEL_LABELS[level]} von Projekt {project_id} nicht erlaubt')
+
+    def _require_task(self, task_id: str, level: int) -> Optional[str]:
+        task = self.store.get_task(task_id)
+        if task is None:
+            return None
+        self._require(task['project_id'], level)
+        return task['project_id']
+
+    def _visible(self, project_ids: Optional[Iterable[str]]) -> Optional[Iterable[str]]:
+        readable = self.permissions.readable
+        if readable is None:
+            return project_ids
+        if project_ids is None:
+            return readable
+        return [project_id for project_id in project_ids if project_id in readable]
+
+    # Ohne Projektbezug
+    @contextmanager
+    def transaction(self) -> Iterator[Any]:
+        with self.store.transaction() as conn:
+            yield conn
+
+    def last_change_seq(self) -> int:
+        return self.store.last_change_seq()
+
+    def changes_since(self, seq: int, limit: int = 1000):
+        changes = self.store.changes_since(seq, limit)
+        readable = self.permissions.readable
+        if changes is None or readable is None:
+            return changes
+        return [change for change in changes if change['project_id'] in readable]
+
+    def worker_state(self, name: str):
+        return self.store.worker_state(name)
+
+    # Lesen
+    def list_projects(self) -> List[Dict[str, Any]]:
+        return self.store.list_projects(self.permissions.readable)
+
+    def load_project(self, project_id: str, with_tasks: bool = True) -> Dict[str, Any]:
+        # Unsichtbare Projekte verhalten sich wie nicht vorhandene
+        if not self.permissions.can_read(project_id):
+            raise ProjectNotFound(project_id)
+        return self.store.load_project(project_id, with_tasks)
+
+    def load_tasks(self, project_id: str) -> List[Dict[str, Any]]:
+        self._require(project_id, READ)
+        return self.store.load_tasks(project_id)
+
+    def query_tasks(self, project_id: str, **filters):
+        self._require(project_id, READ)
+        return self.store.query_tasks(project_id, **filters)
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        task = self.store.get_task(task_id)
+        return task if task and self.permissions.can_read(task['project_id']) else None
+
+    def task_projects(self, task_ids: List[str]) -> Dict[str, str]:
+        """Wie ``ProjectStore.task_projects``; Aufgaben unsichtbarer Projekte erscheinen mit leerer
+        Projekt-ID, damit ihre Belegung erkennbar bleibt, ohne das Projekt preiszugeben."""
+        return {task_id: project_id if self.permissions.can_read(project_id) else ''
+                for task_id, project_id in self.store.task_projects(task_ids).items()}
+
+    def task_responsibles(self, project_id: str) -> List[str]:
+        self._require(project_id, READ)
+        return self.store.task_responsibles(project_id)
+
+    def load_tasks_by_id(self, task_ids: List[str]) -> List[Dict[str, Any]]:
+        return [task for task in self.store.load_tasks_by_id(task_ids)
+                if self.permissions.can_read(task['project_id'])]
+
+    def iter_projects(self, batch_size: int = 500, statuses: Optional[List[str]] = None,
+                      project_ids: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        return self.store.iter_projects(batch_size, statuses, self._visible(project_ids))
+
+    def list_metrics(self, project_id: str) -> List[Dict[str, Any]]:
+        self._require(project_id, READ)
+        return self.store.list_metrics(project_id)
+
+    def metric_chunks(self, project_id: str, metric: str, **window):
+        self._require(project_id, READ)
+        return self.store.metric_chunks(project_id, metric, **window)
+
+    def project_acl(self, project_id: str) -> Dict[str, int]:
+        self._require(project_id, READ)
+        return self.store.project_acl(project_id)
+
+    def list_versions(self, project_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        self._require(project_id, READ)
+        return self.store.list_versions(project_id, limit)
+
+    def load_version(self, project_id: str, version: int) -> Dict[str, Any]:
+        if not self.permissions.can_read(project_id):
+            raise ProjectNotFound(project_id)
+        return self.store.load_version(project_id, version)
+
+    # Schreiben
+    def save_project(self, project: Dict[str, Any]):
+        self.insert_projects([project])
+
+    def insert_projects(self, projects: Iterable[Dict[str, Any]]):
+        """Neue Projekte brauchen eine Rolle mit Schreibrecht, bestehende das Recht zum Bearbeiten."""
+        projects = list(projects)
+        existing = set(self.store.project_statuses([p['id'] for p in projects if 'id' in p]))
+        for project in projects:
+            if project.get('id') in existing:
+                self._require(project['id'], WRITE)
+            elif not self.permissions.can_create:
+                raise PermissionDenied('Anlegen von Projekten nicht erlaubt')
+        with self.store.transaction():
+            created = self.store.insert_projects(projects)
+            self.store.grant(created, user_principal(self.permissions.user_id), MANAGE)
+            if created:
+                # Folgezugriffe (z. B. weitere Aufgaben beim Import) brauchen die neuen Freigaben
+                self.permissions = compile_permissions(self.store, self.permissions.user_id)
+
+    def update_project(self, project_id: str, expected: Optional[Dict[str, Any]] = None, **columns):
+        self._require(project_id, WRITE)
+        return self.store.update_project(project_id, expected, **columns)
+
+    def write_fields(self, project_id: str, phase: str, fields: Dict[str, Any]):
+        self._require(project_id, WRITE)
+        self.store.write_fields(project_id, phase, fields)
+
+    def merge_fields(self, project_id: str, phase: str, fields: Dict[str, Any], base: Dict[str, Any],
+                     expected_version: Optional[int] = None):
+        self._require(project_id, WRITE)
+        return self.store.merge_fields(project_id, phase, fields, base, expected_version)
+
+    def restore_version(self, project_id: str, version: int):
+        self._require(project_id, WRITE)
+        self.store.restore_version(project_id, version)
+
+    def delete_project(self, project_id: str):
+        self._require(project_id, MANAGE)
+        self.store.delete_project(project_id)
+
+    def define_metric(self, project_id: str, metric: str, unit: str = '', target: Optional[float] = None,
+                      lower_is_better: bool = True):
+        self._require(project_id, WRITE)
+        self.store.define_metric(project_id, metric, unit, target, lower_is_better)
+
+    def delete_metric(self, project_id: str, metric: str):
+        self._require(project_id, WRITE)
+        self.store.delete_metric(project_id, metric)
+
+    def replace_metric_chunks(self, project_id: str, metric: str, from_chunk: int, chunks: List[tuple],
+                              added: int):
+        self._require(project_id, WRITE)
+        self.store.replace_metric_chunks(project_id, metric, from_chunk, chunks, added)
+
+    def add_task(self, project_id: str, task: Dict[str, Any]) -> str:
+        self._require(project_id, WRITE)
+        return self.store.add_task(project_id, task)
+
+    def append_tasks(self, project_id: str, tasks: List[Dict[str, Any]]):
+        self._require(project_id, WRITE)
+        self.store.append_tasks(project_id, tasks)
+
+    def update_task(self, task_id: str, expected: Optional[Dict[str, Any]] = None, **columns):
+        if self._require_task(task_id, WRITE) is None:
+            return {}
+        return self.store.update_task(task_id, expected, **columns)
+
+    def update_task_statuses(self, statuses: Dict[str, str], expected: Optional[Dict[str, str]] = None):
+        for task_id in statuses:
+            self._require_task(task_id, WRITE)
+        return self.store.update_task_statuses(statuses, expected)
+
+    def delete_task(self, task_id: str):
+        if self._require_task(task_id, MANAGE) is not None:
+            self.store.delete_task(task_id)
+
+    # Freigaben
+    def grant(self, project_id: str, principal: str, level: int):
+        self._require(project_id, MANAGE)
+        self.store.grant([project_id], principal, level)
+
+    def revoke(self, project_id: str, principal: str):
+        self._require(project_id, MANAGE)
+        self.store.revoke(project_id, principal)
@@ -0,0 +1,189 @@
+"""Inkrementeller Kennzahlen-Index für Sidebar und Dashboard.
+
+Statt bei jedem Rerun alle Projekte und Aufgaben zu durchlaufen, werden
+Zähler pro Projektstatus, pro Aufgabenstatus und der Fälligkeitsindex
+offener Aufgaben bei jeder Änderung angepasst.
+"""
+
+import threading
+from collections import Counter, defaultdict
+from datetime import date
+from typing import AbstractSet, Dict, List, Optional
+
+from .duedates import DueDateIndex
+
+TASK_STATUSES = ('open', 'in_progress', 'completed')
+
+
+class AggregateIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._projects: Dict[str, str] = {}
+        self._tasks: Dict[str, tuple] = {}
+        self._project_tasks = defaultdict(set)
+        self._project_status = Counter()
+        self._task_status = defaultdict(Counter)
+        self.due_dates = DueDateIndex()
+
+    @classmethod
+    def build(cls, store) -> 'AggregateIndex':
+        """Einmaliger vollständiger Aufbau aus der Datenbank."""
+        index = cls()
+        index.load(store)
+        return index
+
+    def load(self, store):
+        with self._lock:
+            self._reset()
+            for project in store.list_projects():
+                self._set_project(project['id'], project['status'])
+            self._add_tasks(store.iter_task_rows())
+
+    def reload_projects(self, store, project_ids):
+        """Liest einzelne Projekte neu ein, z. B. nach Änderungen aus einem anderen Prozess."""
+        project_ids = list(project_ids)
+        with self._lock:
+            for project_id in project_ids:
+                self._remove_project(project_id)
+            for project_id, status in store.project_statuses(project_ids).items():
+                self._set_project(project_id, status)
+            self._add_tasks(store.iter_task_rows(project_ids))
+
+    # Pflege der Zähler
+    def _set_project(self, project_id, status):
+        old = self._projects.get(project_id)
+        if old is not None:
+            self._project_status[old] -= 1
+        self._projects[project_id] = status
+        self._project_status[status] += 1
+
+    def _add_task(self, task_id, project_id, status, due_date, index_due_date=True):
+        if task_id in self._tasks:
+            self._remove_task(task_id)
+        self._tasks[task_id] = (project_id, status, due_date)
+        self._project_tasks[project_id].add(task_id)
+        self._task_status[project_id][status] += 1
+        if status != 'completed' and index_due_date:
+            self.due_dates.add(task_id, project_id, due_date)
+
+    def _add_tasks(self, rows):
+        """Viele Aufgaben auf einmal; der Fälligkeitsindex wird nur einmal sortiert."""
+        open_tasks = []
+        for row in rows:
+            self._add_task(row['id'], row['project_id'], row['status'], row['due_date'], index_due_date=False)
+            if row['status'] != 'completed':
+                open_tasks.append((row['id'], row['project_id'], row['due_date']))
+        self.due_dates.add_many(open_tasks)
+
+    def _remove_task(self, task_id):
+        entry = self._tasks.pop(task_id, None)
+        if entry is None:
+            return
+        project_id, status, due_date = entry
+        self._project_tasks[project_id].discard(task_id)
+        self._task_status[project_id][status] -= 1
+        self.due_dates.remove(task_id)
+
+    def _remove_project(self, project_id):
+        status = self._projects.pop(project_id, None)
+        if status is not None:
+            self._project_status[status] -= 1
+        for task_id in list(self._project_tasks.pop(project_id, ())):
+            self._remove_task(task_id)
+        self._project_tasks.pop(project_id, None)
+        self._task_status.pop(project_id, None)
+        self.due_dates.remove_project(project_id)
+
+    def apply(self, event):
+        """Listener für ``ProjectStore.subscribe``."""
+        with self._lock:
+            data = event.data or {}
+            if event.kind == 'project_saved':
+                self._remove_project(event.project_id)
+                self._set_project(event.project_id, data.get('status', 'draft'))
+                for task in (data.get('do') or {}).get('implementation_steps', []):
+                    self._add_task(task['id'], event.project_id, task.get('status', 'open'),
+                                   task.get('due_date'))
+            elif event.kind == 'project_updated' and 'status' in data:
+                self._set_project(event.project_id, data['status'])
+            elif event.kind == 'project_deleted':
+                self._remove_project(event.project_id)
+            elif event.kind == 'task_added':
+                self._add_task(event.task_id, event.project_id, data.get('status', 'open'),
+                               data.get('due_date'))
+            elif event.kind == 'task_updated' and event.task_id in self._tasks:
+                _, status, due_date = self._tasks[event.task_id]
+                self._add_task(event.task_id, event.project_id, data.get('status', status),
+                               data.get('due_date', due_date))
+            elif event.kind == 'task_deleted':
+                self._remove_task(event.task_id)
+
+    # Abfragen
+    def status_counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {status: n for status, n in self._project_status.items() if n}
+            counts['all'] = len(self._projects)
+            return counts
+
+    def project_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._projects)
+
+    def project_status(self, project_id: str) -> Optional[str]:
+        with self._lock:
+            return self._projects.get(project_id)
+
+    def task_counts(self, project_id: str) -> Dict[str, int]:
+        with self._lock:
+            counts = self._task_status.get(project_id, Counter())
+            result = {status: counts.get(status, 0) for status in TASK_STATUSES}
+            result.update({status: n for status, n in counts.items() if n})
+            result['total'] = sum(counts.values())
+            return result
+
+    def overdue_count(self, project_id: Optional[str] = None, today: Optional[date] = None) -> int:
+        """Überfällige offene Aufgaben eines Projekts oder (ohne ``project_id``) aller Projekte."""
+        with self._lock:
+            return self.due_dates.count_overdue(today, project_id)
+
+    def due_soon_count(self, days: int, project_id: Optional[str] = None,
+                       today: Optional[date] = None) -> int:
+        with self._lock:
+            return self.due_dates.count_due_within(days, today, project_id)
+
+    def overdue_tasks(self, limit: Optional[int] = 50, today: Optional[date] = None,
+                      project_ids: Optional[AbstractSet[str]] = None):
+        """Älteste überfällige Aufgaben im gesamten Portfolio (bzw. in ``project_ids``) als ``(Datum, task_id)``."""
+        with self._lock:
+            if project_ids is None:
+                return self.due_dates.overdue(today, limit=limit)
+            rows = [row for row in self.due_dates.overdue(today, limit=None)
+                    if self.due_dates.project_of(row[1]) in project_ids]
+            return rows if limit is None else rows[:limit]
+
+    def due_soon_tasks(self, days: int, today: Optional[date] = None,
+                       project_ids: Optional[AbstractSet[str]] = None):
+        """Aufgaben, die in den nächsten ``days`` Tagen fällig werden, als ``(Datum, task_id)``."""
+        with self._lock:
+            rows = self.due_dates.due_within(days, today)
+            if project_ids is None:
+                return rows
+            return [row for row in rows if self.due_dates.project_of(row[1]) in project_ids]
+
+    def verify(self, store) -> List[str]:
+        """Vergleicht den Index mit einem vollständigen Neuaufbau; liefert Abweichungen."""
+        fresh = AggregateIndex.build(store)
+        problems = []
+        with self._lock:
+            if self.status_counts() != fresh.status_counts():
+                problems.append(f'Projektstatus: {self.status_counts()} != {fresh.status_counts()}')
+            for project_id in set(self._projects) | set(fresh._projects):
+                if self.task_counts(project_id) != fresh.task_counts(project_id):
+                    problems.append(f'Aufgaben {project_id}: {self.task_counts(project_id)} '
+                                    f'!= {fresh.task_counts(project_id)}')
+                if self.due_dates.due_dates(project_id) != fresh.due_dates.due_dates(project_id):
+                    problems.append(f'Fälligkeiten {project_id} weichen ab')
+        return problems
@@ -0,0 +1,180 @@
+"""Portfolio-Auswertungen über alle Projekte mit pandas.
+
+Projekte (inkl. ``check.metrics.verbesserung_prozent``) und Aufgaben liegen
+als DataFrames im Speicher. Änderungsereignisse der Ablage markieren nur die
+betroffenen Projekte; deren Zeilen werden beim nächsten Zugriff neu gelesen
+und ausgetauscht. Alle Kennzahlen sind vektorisierte ``groupby``-Operationen
+und werden bis zur nächsten Datenänderung zwischengespeichert (mit
+``VersionedCache`` prozessweit über alle Sitzungen).
+"""
+
+import threading
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import pandas as pd
+
+from .cache import VersionedCache
+from .storage import ChangeEvent, ProjectStore
+
+PROJECT_FRAME_COLUMNS = ['project_id', 'name', 'status', 'created_date', 'progress', 'verbesserung_prozent']
+TASK_FRAME_COLUMNS = ['task_id', 'project_id', 'project_status', 'responsible', 'status',
+                      'due_date', 'completed_at']
+IMPROVEMENT_BINS = [float('-inf'), 0, 10, 25, 50, float('inf')]
+IMPROVEMENT_LABELS = ['≤ 0 %', '0–10 %', '10–25 %', '25–50 %', '> 50 %']
+UNASSIGNED = 'Nicht zugewiesen'
+
+
+def _project_frame(rows) -> pd.DataFrame:
+    frame = pd.DataFrame.from_records(rows, columns=PROJECT_FRAME_COLUMNS)
+    frame['progress'] = pd.to_numeric(frame['progress'], errors='coerce')
+    frame['verbesserung_prozent'] = pd.to_numeric(frame['verbesserung_prozent'], errors='coerce')
+    return frame
+
+
+def _task_frame(rows) -> pd.DataFrame:
+    frame = pd.DataFrame.from_records(rows, columns=TASK_FRAME_COLUMNS)
+    frame['due_date'] = pd.to_datetime(frame['due_date'], errors='coerce')
+    frame['completed_at'] = pd.to_datetime(frame['completed_at'], errors='coerce')
+    frame['responsible'] = frame['responsible'].replace('', UNASSIGNED)
+    return frame
+
+
+class PortfolioAnalytics:
+    """Thread-sicher; eine Instanz pro Prozess, gepflegt über ``store.subscribe``."""
+
+    # Ab dieser Zahl geänderter Projekte ist ein vollständiges Neuladen günstiger
+    FULL_RELOAD_THRESHOLD = 2000
+
+    def __init__(self, store: ProjectStore, cache: Optional[VersionedCache] = None):
+        self._store = store
+        self._cache = cache
+        self._lock = threading.RLock()
+        self._projects: Optional[pd.DataFrame] = None
+        self._tasks: Optional[pd.DataFrame] = None
+        self._dirty = set()
+        self._results: Dict[Any, Any] = {}
+        self.version = 0
+
+    def apply(self, event: ChangeEvent):
+        with self._lock:
+            self._dirty.add(event.project_id)
+
+    def invalidate(self, project_ids: Optional[Iterable[str]] = None):
+        """Markiert Projekte, die außerhalb dieses Prozesses geändert wurden; ohne Angabe alles."""
+        with self._lock:
+            if project_ids is None:
+                self._projects = None
+                self._dirty.clear()
+                return
+            self._dirty.update(project_ids)
+
+    def _refresh(self):
+        if self._projects is not None and not self._dirty:
+            return
+        if self._projects is None or len(self._dirty) > self.FULL_RELOAD_THRESHOLD:
+            self._dirty.clear()
+            self._projects = _project_frame(self._store.analytics_project_rows())
+            self._tasks = _task_frame(self._store.analytics_task_rows())
+        else:
+            changed = list(self._dirty)
+            self._dirty.clear()
+            projects = self._projects[~self._projects['project_id'].isin(changed)]
+            tasks = self._tasks[~self._tasks['project_id'].isin(changed)]
+            self._projects = pd.concat(
+                [projects, _project_frame(self._store.analytics_project_rows(changed))],
+                ignore_index=True)
+            self._tasks = pd.concat(
+                [tasks, _task_frame(self._store.analytics_task_rows(changed))], ignore_index=True)
+        self.version += 1
+        self._results.clear()
+
+    def _cached(self, key, compute: Callable[[pd.DataFrame, pd.DataFrame], Any]):
+        if self._cache is not None:
+            # Geteilter Cache: Ergebnisse gelten bis zur nächsten Änderung im Portfolio
+            def run():
+                with self._lock:
+                    self._refresh()
+                    return compute(self._projects, self._tasks)
+            return self._cache.get_or_compute('analytics', key, run)
+        with self._lock:
+            self._refresh()
+            if key not in self._results:
+                self._results[key] = compute(self._projects, self._tasks)
+            return self._results[key]
+
+    def frames(self):
+        """``(projekte, aufgaben)`` als DataFrames; nicht verändern."""
+        with self._lock:
+            self._refresh()
+            return self._projects, self._tasks
+
+    # Kennzahlen
+    def summary(self, today: Optional[date] = None) -> Dict[str, Any]:
+        today = today or date.today()
+
+        def compute(projects, tasks):
+            done = tasks['status'].eq('completed')
+            overdue = ~done & tasks['due_date'].le(pd.Timestamp(today))
+            return {'projects': len(projects), 'tasks': len(tasks),
+                    'completion_rate': float(done.mean()) if len(tasks) else 0.0,
+                    'overdue': int(overdue.sum()),
+                    'avg_progress': float(projects['progress'].mean())
+                    if projects['progress'].notna().any() else None,
+                    'avg_improvement': float(projects['verbesserung_prozent'].mean())
+                    if projects['verbesserung_prozent'].notna().any() else None}
+        return self._cached(('summary', today), compute)
+
+    def completion_by_responsible(self, top: Optional[int] = None) -> pd.DataFrame:
+        """Aufgaben, Abgeschlossene und Abschlussquote je verantwortlicher Person."""
+        def compute(projects, tasks):
+            result = (tasks.assign(completed=tasks['status'].eq('completed'))
+                      .groupby('responsible')['completed'].agg(['size', 'sum', 'mean'])
+                      .rename(columns={'size': 'tasks', 'sum': 'completed', 'mean': 'rate'})
+                      .sort_values('tasks', ascending=False))
+            return result.head(top) if top else result
+        return self._cached(('completion_by_responsible', top), compute)
+
+    def overdue_by_status(self, today: Optional[date] = None) -> pd.DataFrame:
+        """Anteil überfälliger an offenen Aufgaben je Projektstatus."""
+        today = today or date.today()
+
+        def compute(projects, tasks):
+            is_open = ~tasks['status'].eq('completed')
+            overdue = is_open & tasks['due_date'].le(pd.Timestamp(today))
+            result = (pd.DataFrame({'project_status': tasks['project_status'],
+                                    'open': is_open, 'overdue': overdue})
+                      .groupby('project_status')[['open', 'overdue']].sum())
+            result['ratio'] = (result['overdue'] / result['open'].where(result['open'] > 0)).fillna(0.0)
+            return result
+        return self._cached(('overdue_by_status', today), compute)
+
+    def progress_overview(self, limit: int = 20) -> pd.DataFrame:
+        """Offene Projekte mit dem geringsten Fortschritt."""
+        def compute(projects, tasks):
+            open_projects = projects[projects['status'].ne('completed') & projects['progress'].notna()]
+            return (open_projects.nsmallest(limit, 'progress')[['name', 'status', 'progress']]
+                    .reset_index(drop=True))
+        return self._cached(('progress_overview', limit), compute)
+
+    def improvement_distribution(self) -> Dict[str, Any]:
+        """Kennwerte und Klassen von ``verbesserung_prozent`` über alle Projekte."""
+        def compute(projects, tasks):
+            values = projects['verbesserung_prozent'].dropna()
+            bins = (pd.cut(values, IMPROVEMENT_BINS, labels=IMPROVEMENT_LABELS)
+                    .value_counts(sort=False).reindex(IMPROVEMENT_LABELS, fill_value=0))
+            return {'stats': values.describe(), 'bins': bins}
+        return self._cached(('improvement_distribution',), compute)
+
+    def weekly_throughput(self, weeks: int = 26) -> pd.Series:
+        """Abgeschlossene Aufgaben je Kalenderwoche (Wochenbeginn Montag)."""
+        def compute(projects, tasks):
+            done = tasks.loc[tasks['status'].eq('completed'), 'completed_at'].dropna()
+            if done.empty:
+                return pd.Series(dtype='int64')
+            counts = done.dt.to_period('W-SUN').value_counts().sort_index()
+            counts = counts.reindex(pd.period_range(counts.index.min(), counts.index.max(), freq='W-SUN'),
+                                    fill_value=0)
+            counts.index = counts.index.start_time
+            return counts.tail(weeks)
+        return self._cached(('weekly_throughput', weeks), compute)
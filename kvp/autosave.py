@@ -0,0 +1,163 @@
+"""Automatisches Speichern mit Änderungsverfolgung.
+
+Widget-Werte werden Feld für Feld mit dem zuletzt gespeicherten Stand
+verglichen. Nur geänderte Felder werden vorgemerkt und nach einer kurzen
+Ruhephase (Debounce) gesammelt in einer Transaktion geschrieben.
+
+Geschrieben wird mit optimistischer Sperre: Zu jedem vorgemerkten Feld wird
+der Ausgangswert und die Projektversion beim Bearbeitungsbeginn gemerkt.
+Hat eine andere Sitzung dasselbe Feld inzwischen anders geändert, bleibt
+deren Fassung erhalten und der Konflikt wird in ``conflicts`` gemeldet.
+"""
+
+import copy
+import json
+import logging
+import math
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from .storage import ProjectNotFound
+
+logger = logging.getLogger(__name__)
+
+SECTION_PHASES = ('plan', 'check', 'act')
+_MISSING = object()
+# Berechnete Kennzahlen (z. B. ``verbesserung_prozent``) schwanken in den letzten Stellen
+FLOAT_TOLERANCE = 1e-6
+
+
+def _same(stored: Any, value: Any) -> bool:
+    """Gleichheit wie ``==``, Gleitkommazahlen (auch verschachtelt) aber mit Toleranz."""
+    if isinstance(stored, float) or isinstance(value, float):
+        try:
+            return math.isclose(stored, value, rel_tol=FLOAT_TOLERANCE, abs_tol=FLOAT_TOLERANCE)
+        except TypeError:
+            return False
+    if isinstance(stored, dict) and isinstance(value, dict):
+        return stored.keys() == value.keys() and all(_same(stored[key], value[key]) for key in stored)
+    if isinstance(stored, list) and isinstance(value, list):
+        return len(stored) == len(value) and all(_same(a, b) for a, b in zip(stored, value))
+    return stored == value
+
+
+class FieldConflict(NamedTuple):
+    project_id: str
+    phase: str
+    field: str
+    mine: Any
+    theirs: Any
+
+
+class AutoSaver:
+    def __init__(self, store, debounce_seconds: float = 2.0, max_delay_seconds: float = 10.0):
+        self.store = store
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self._snapshots: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._bases: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._base_versions: Dict[Tuple[str, str], Optional[int]] = {}
+        self._versions: Dict[str, Optional[int]] = {}
+        self.conflicts: List[FieldConflict] = []
+        self._first_change_at = None
+        self._last_change_at = None
+        self.rerun_stats = {'writes': 0, 'bytes': 0}
+        self.total_stats = {'writes': 0, 'bytes': 0, 'flushes': 0}
+
+    def begin_rerun(self):
+        self.rerun_stats = {'writes': 0, 'bytes': 0}
+
+    def track(self, project: Dict[str, Any]):
+        """Merkt sich den gespeicherten Stand und blendet noch offene Änderungen ein."""
+        self._versions[project['id']] = project.get('version')
+        for phase in SECTION_PHASES:
+            key = (project['id'], phase)
+            section = project.setdefault(phase, {})
+            self._snapshots[key] = copy.deepcopy(section)
+            section.update(self._pending.get(key, {}))
+
+    def stage(self, project_id: str, phase: str, fields: Dict[str, Any]):
+        """Vergleicht Widget-Werte mit dem Snapshot und merkt nur Abweichungen vor."""
+        key = (project_id, phase)
+        snapshot = self._snapshots.setdefault(key, {})
+        pending = self._pending.setdefault(key, {})
+        bases = self._bases.setdefault(key, {})
+        changed = False
+        for field, value in fields.items():
+            stored = snapshot.get(field, _MISSING)
+            # Leere Widgets zu nie gespeicherten Feldern gelten nicht als Änderung
+            if _same(stored, value) or (stored is _MISSING and not value):
+                changed |= pending.pop(field, _MISSING) is not _MISSING
+                bases.pop(field, None)
+            elif not _same(pending.get(field, _MISSING), value):
+                if field not in pending:
+                    bases[field] = copy.deepcopy(stored)
+                    self._base_versions.setdefault(key, self._versions.get(project_id))
+                pending[field] = copy.deepcopy(value)
+                changed = True
+        if not pending:
+            del self._pending[key]
+            self._bases.pop(key, None)
+            self._base_versions.pop(key, None)
+        if changed:
+            now = time.monotonic()
+            self._last_change_at = now
+            if self._first_change_at is None:
+                self._first_change_at = now
+        if not self._pending:
+            self._first_change_at = self._last_change_at = None
+
+    def discard(self, project_id: str):
+        for mapping in (self._pending, self._bases, self._base_versions, self._snapshots):
+            for key in [key for key in mapping if key[0] == project_id]:
+                del mapping[key]
+        self._versions.pop(project_id, None)
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def flush(self, force: bool = False) -> bool:
+        """Schreibt vorgemerkte Felder, sobald die Eingabe zur Ruhe gekommen ist."""
+        if not self._pending:
+            return False
+        now = time.monotonic()
+        quiet = now - self._last_change_at >= self.debounce_seconds
+        overdue = now - self._first_change_at >= self.max_delay_seconds
+        if not (force or quiet or overdue):
+            return False
+
+        writes = 0
+        size = 0
+        with self.store.transaction():
+            for key, fields in self._pending.items():
+                project_id, phase = key
+                base = {field: value for field, value in self._bases.get(key, {}).items()
+                        if value is not _MISSING}
+                try:
+                    result = self.store.merge_fields(project_id, phase, fields, base,
+                                                     expected_version=self._base_versions.get(key))
+                except ProjectNotFound:
+                    # Projekt wurde zwischenzeitlich gelöscht
+                    continue
+                snapshot = self._snapshots.setdefault(key, {})
+                snapshot.update(copy.deepcopy(result.written))
+                for field, theirs in result.conflicts.items():
+                    snapshot[field] = copy.deepcopy(theirs)
+                    self.conflicts.append(FieldConflict(project_id, phase, field, fields[field], theirs))
+                writes += len(result.written)
+                size += sum(len(json.dumps(v, ensure_ascii=False, default=str).encode('utf-8'))
+                            for v in result.written.values())
+        self._pending.clear()
+        self._bases.clear()
+        self._base_versions.clear()
+        self._first_change_at = self._last_change_at = None
+
+        self.rerun_stats['writes'] += writes
+        self.rerun_stats['bytes'] += size
+        self.total_stats['writes'] += writes
+        self.total_stats['bytes'] += size
+        self.total_stats['flushes'] += 1
+        logger.debug('Autosave: %d Felder, %d Bytes geschrieben', writes, size)
+        return True
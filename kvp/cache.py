@@ -0,0 +1,86 @@
+"""Prozessweiter Lese-Cache für alle Sitzungen mit Invalidierung über Änderungsereignisse.
+
+Jeder Eintrag merkt sich den Versionsstand, zu dem er berechnet wurde:
+portfolioweite Einträge (Projektliste, Auswertungen, Suchergebnisse) den
+Zähler aller Änderungen, projektbezogene Einträge (z. B. Diagrammdaten einer
+Messreihe) nur den Zähler ihres Projekts. Ändert sich ein Projekt, passen die
+Stände nicht mehr und der nächste Zugriff rechnet neu – ohne TTL. Treffer und
+Fehlschläge werden je Namensraum gezählt.
+"""
+
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+from .storage import ChangeEvent
+
+
+class VersionedCache:
+    """Thread-sicher; eine Instanz pro Prozess, gepflegt über ``store.subscribe``."""
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._portfolio_version = 0
+        self._project_versions: Dict[str, int] = defaultdict(int)
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+    def apply(self, event: ChangeEvent):
+        self.invalidate([event.project_id])
+
+    def invalidate(self, project_ids: Optional[Iterable[str]] = None):
+        """Markiert Projekte als geändert (z. B. nach Änderungen aus einem anderen Prozess); ohne Angabe alles."""
+        with self._lock:
+            self._portfolio_version += 1
+            if project_ids is None:
+                self._entries.clear()
+                return
+            for project_id in project_ids:
+                self._project_versions[project_id] += 1
+
+    def _token(self, project_id: Optional[str]) -> int:
+        return self._portfolio_version if project_id is None else self._project_versions[project_id]
+
+    def get_or_compute(self, namespace: str, key: Hashable, compute: Callable[[], Any],
+                       project_id: Optional[str] = None) -> Any:
+        """Liefert den zwischengespeicherten Wert oder berechnet ihn neu.
+
+        Mit ``project_id`` hängt der Eintrag nur von diesem Projekt ab, sonst vom
+        gesamten Portfolio. Der Wert wird geteilt und darf nicht verändert werden.
+        """
+        entry_key = (namespace, project_id, key)
+        with self._lock:
+            token = self._token(project_id)
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[0] == token:
+                self._entries.move_to_end(entry_key)
+                self._stats[namespace]['hits'] += 1
+                return entry[1]
+            self._stats[namespace]['misses'] += 1
+        # Außerhalb der Sperre rechnen; eine Änderung währenddessen macht den Eintrag sofort ungültig
+        value = compute()
+        with self._lock:
+            self._entries[entry_key] = (token, value)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Treffer, Fehlschläge, Trefferquote und Einträge je Namensraum."""
+        with self._lock:
+            entries = defaultdict(int)
+            for namespace, _, _ in self._entries:
+                entries[namespace] += 1
+            return [{'namespace': namespace, 'hits': counts['hits'], 'misses': counts['misses'],
+                     'hit_rate': counts['hits'] / ((counts['hits'] + counts['misses']) or 1),
+                     'entries': entries[namespace]}
+                    for namespace, counts in sorted(self._stats.items())]
+
+    def prometheus_lines(self) -> List[str]:
+        lines = ['# TYPE kvp_cache_requests_total counter']
+        for row in self.stats():
+            lines.append(f'kvp_cache_requests_total{{namespace="{row["namespace"]}",result="hit"}} {row["hits"]}')
+            lines.append(f'kvp_cache_requests_total{{namespace="{row["namespace"]}",result="miss"}} {row["misses"]}')
+        return lines
@@ -0,0 +1,163 @@
+"""Plotly-Diagramme des Dashboards mit Zwischenspeicher.
+
+Die Diagramme werden nur neu gebaut, wenn sich ihre Eingangsdaten ändern.
+Der Schlüssel ist ein kurzer Hash der Eingaben; alte Einträge werden nach
+LRU-Prinzip und nach Ablauf einer Lebensdauer verdrängt. plotly wird erst
+beim ersten Diagramm geladen, plotly.express erst im Dashboard.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict
+
+from . import profiling
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+STATUS_COLORS = {
+    'completed': '#2ecc71',
+    'in_progress': '#f39c12',
+    'open': '#e74c3c'
+}
+
+
+class FigureCache:
+    def __init__(self, maxsize: int = 128, ttl_seconds: float = 3600):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(name: str, inputs: Any) -> str:
+        payload = json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')
+        return name + ':' + hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+    def get_or_build(self, name: str, inputs: Any, build: Callable[[], 'go.Figure']) -> 'go.Figure':
+        key = self.key(name, inputs)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        with profiling.section(f'chart:{name}'):
+            figure = build()
+        with self._lock:
+            self._entries[key] = (now, figure)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return figure
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+figure_cache = FigureCache()
+
+
+def status_pie(status_counts: Dict[str, int]) -> 'go.Figure':
+    """Tortendiagramm der Aufgabenstatus."""
+    def build():
+        import plotly.express as px
+        return px.pie(
+            values=list(status_counts.values()),
+            names=list(status_counts.keys()),
+            title="Aufgaben-Status Verteilung",
+            color_discrete_map=STATUS_COLORS
+        )
+    return figure_cache.get_or_build('status_pie', status_counts, build)
+
+
+def before_after_bar(before: float, after: float) -> 'go.Figure':
+    """Balkendiagramm Vorher/Nachher aus ``check.metrics``."""
+    def build():
+        import plotly.graph_objects as go
+        fig = go.Figure()
+        fig.add_trace(go.Bar(
+            x=['Vorher', 'Nachher'],
+            y=[before, after],
+            marker_color=['#e74c3c', '#2ecc71']
+        ))
+        fig.update_layout(title="Verbesserung im Vergleich", yaxis_title="Wert")
+        return fig
+    return figure_cache.get_or_build('before_after_bar', [before, after], build)
+
+
+# Portfolio-Diagramme: ``version`` stammt aus ``PortfolioAnalytics`` und ändert sich mit den Daten
+def completion_by_responsible_bar(frame, version: int) -> 'go.Figure':
+    def build():
+        import plotly.express as px
+        fig = px.bar(frame.reset_index(), x='responsible', y='rate',
+                     hover_data=['tasks', 'completed'], title="Abschlussquote je Verantwortlichem",
+                     labels={'responsible': "Verantwortlich", 'rate': "Abschlussquote"})
+        fig.update_yaxes(tickformat='.0%', range=[0, 1])
+        return fig
+    return figure_cache.get_or_build('completion_by_responsible', [version, len(frame)], build)
+
+
+def overdue_ratio_bar(frame, version: int, today) -> 'go.Figure':
+    def build():
+        import plotly.express as px
+        fig = px.bar(frame.reset_index(), x='project_status', y='ratio',
+                     hover_data=['open', 'overdue'], title="Anteil überfälliger Aufgaben je Projektstatus",
+                     labels={'project_status': "Projektstatus", 'ratio': "Überfällig"},
+                     color_discrete_sequence=['#e74c3c'])
+        fig.update_yaxes(tickformat='.0%')
+        return fig
+    return figure_cache.get_or_build('overdue_ratio', [version, today], build)
+
+
+def improvement_histogram(bins, version: int) -> 'go.Figure':
+    def build():
+        import plotly.express as px
+        return px.bar(x=list(bins.index.astype(str)), y=list(bins.values),
+                      title="Verteilung der Verbesserung (%)",
+                      labels={'x': "Verbesserung", 'y': "Projekte"},
+                      color_discrete_sequence=['#45B7D1'])
+    return figure_cache.get_or_build('improvement_histogram', version, build)
+
+
+def throughput_line(series, version: int) -> 'go.Figure':
+    def build():
+        import plotly.express as px
+        fig = px.line(x=series.index, y=series.values, markers=True,
+                      title="Abgeschlossene Aufgaben pro Woche",
+                      labels={'x': "Woche", 'y': "Abgeschlossen"})
+        fig.update_traces(line_color='#2ecc71')
+        return fig
+    return figure_cache.get_or_build('throughput', [version, len(series)], build)
+
+
+def metric_series_chart(series: Dict[str, Any], metric: str, unit: str, target, key: Any) -> 'go.Figure':
+    """Verdichtete Messreihe aus ``kvp.timeseries.chart_series``: Min/Max-Band, Mittelwert, gleitendes Mittel."""
+    def build():
+        import plotly.graph_objects as go
+        x = [datetime.fromtimestamp(t) for t in series['ts']]
+        fig = go.Figure()
+        if series['points'] > len(x):
+            fig.add_trace(go.Scatter(x=x, y=series['max'], mode='lines', line_width=0,
+                                     showlegend=False, hoverinfo='skip'))
+            fig.add_trace(go.Scatter(x=x, y=series['min'], mode='lines', line_width=0, fill='tonexty',
+                                     fillcolor='rgba(69, 183, 209, 0.25)', name="Min/Max"))
+        fig.add_trace(go.Scatter(x=x, y=series['mean'], mode='lines', line_color='#45B7D1',
+                                 name="Mittelwert" if series['points'] > len(x) else "Messwert"))
+        if 'rolling' in series:
+            fig.add_trace(go.Scatter(x=x, y=series['rolling'], mode='lines', line_dash='dash',
+                                     line_color='#2c3e50', name="Gleitender Mittelwert"))
+        if target is not None:
+            fig.add_hline(y=target, line_dash='dot', line_color='#2ecc71', annotation_text="Ziel")
+        fig.update_layout(title=f"Verlauf: {metric}", yaxis_title=unit or "Wert", hovermode='x unified')
+        return fig
+    return figure_cache.get_or_build('metric_series', key, build)
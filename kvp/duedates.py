@@ -0,0 +1,135 @@
+"""Sortierter Fälligkeitsindex offener Aufgaben über alle Projekte.
+
+Fälligkeitsdaten werden beim Einfügen einmal in Tagesordinalzahlen
+umgerechnet. "Überfällig" und "fällig in N Tagen" sind damit
+Bereichsabfragen per Binärsuche statt vollständiger Durchläufe.
+"""
+
+import bisect
+import logging
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def parse_due_date(value) -> Optional[int]:
+    """``'YYYY-MM-DD'`` oder ``date`` -> Tagesordinalzahl; ``None`` bei fehlendem Datum."""
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value.toordinal()
+    try:
+        return date.fromisoformat(str(value)[:10]).toordinal()
+    except ValueError:
+        logger.warning('Ungültiges Fälligkeitsdatum ignoriert: %r', value)
+        return None
+
+
+class DueDateIndex:
+    """Nicht thread-sicher; Aufrufer (z. B. ``AggregateIndex``) sperren selbst."""
+
+    def __init__(self):
+        self._entries: List[Tuple[int, str]] = []
+        self._by_project: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+        self._tasks: Dict[str, Tuple[int, str]] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, task_id: str, project_id: str, due_date):
+        self.remove(task_id)
+        ordinal = parse_due_date(due_date)
+        if ordinal is None:
+            return
+        entry = (ordinal, task_id)
+        bisect.insort(self._entries, entry)
+        bisect.insort(self._by_project[project_id], entry)
+        self._tasks[task_id] = (ordinal, project_id)
+
+    def add_many(self, tasks: Iterable[Tuple[str, str, Any]]):
+        """Fügt ``(task_id, project_id, due_date)`` gesammelt ein und sortiert einmal am Ende.
+
+        Für das Laden ganzer Projekte; ``add`` mit ``insort`` bleibt für einzelne Änderungen.
+        """
+        latest = {task_id: (project_id, due_date) for task_id, project_id, due_date in tasks}
+        for task_id in latest:
+            self.remove(task_id)
+        touched = set()
+        for task_id, (project_id, due_date) in latest.items():
+            ordinal = parse_due_date(due_date)
+            if ordinal is None:
+                continue
+            entry = (ordinal, task_id)
+            self._entries.append(entry)
+            self._by_project[project_id].append(entry)
+            self._tasks[task_id] = (ordinal, project_id)
+            touched.add(project_id)
+        if touched:
+            self._entries.sort()
+            for project_id in touched:
+                self._by_project[project_id].sort()
+
+    def remove(self, task_id: str):
+        known = self._tasks.pop(task_id, None)
+        if known is None:
+            return
+        ordinal, project_id = known
+        entry = (ordinal, task_id)
+        for entries in (self._entries, self._by_project[project_id]):
+            position = bisect.bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+        if not self._by_project[project_id]:
+            del self._by_project[project_id]
+
+    def remove_project(self, project_id: str):
+        for _, task_id in list(self._by_project.get(project_id, ())):
+            self.remove(task_id)
+
+    def _entries_for(self, project_id):
+        if project_id is None:
+            return self._entries
+        return self._by_project.get(project_id, [])
+
+    def _range(self, low: int, high: int, project_id=None) -> Tuple[int, int]:
+        # Halboffenes Intervall [low, high) in Tagesordinalzahlen
+        entries = self._entries_for(project_id)
+        return (bisect.bisect_left(entries, (low,)), bisect.bisect_left(entries, (high,)))
+
+    # Abfragen
+    def count_overdue(self, as_of: Optional[date] = None, project_id: Optional[str] = None) -> int:
+        # Fälligkeit 00:00 Uhr liegt schon am Fälligkeitstag in der Vergangenheit
+        as_of = as_of or date.today()
+        return bisect.bisect_left(self._entries_for(project_id), (as_of.toordinal() + 1,))
+
+    def overdue(self, as_of: Optional[date] = None, project_id: Optional[str] = None,
+                limit: Optional[int] = None) -> List[Tuple[date, str]]:
+        """Überfällige Aufgaben, älteste Fälligkeit zuerst."""
+        end = self.count_overdue(as_of, project_id)
+        if limit is not None:
+            end = min(end, limit)
+        return [(date.fromordinal(o), tid) for o, tid in self._entries_for(project_id)[:end]]
+
+    def count_due_within(self, days: int, as_of: Optional[date] = None,
+                         project_id: Optional[str] = None) -> int:
+        start, end = self._due_within_range(days, as_of, project_id)
+        return end - start
+
+    def due_within(self, days: int, as_of: Optional[date] = None,
+                   project_id: Optional[str] = None) -> List[Tuple[date, str]]:
+        """Aufgaben, die nach ``as_of`` und spätestens in ``days`` Tagen fällig werden."""
+        start, end = self._due_within_range(days, as_of, project_id)
+        return [(date.fromordinal(o), tid) for o, tid in self._entries_for(project_id)[start:end]]
+
+    def _due_within_range(self, days, as_of, project_id):
+        today = (as_of or date.today()).toordinal()
+        return self._range(today + 1, today + days + 1, project_id)
+
+    def project_of(self, task_id: str) -> Optional[str]:
+        known = self._tasks.get(task_id)
+        return known[1] if known else None
+
+    def due_dates(self, project_id: Optional[str] = None) -> List[str]:
+        return [date.fromordinal(o).isoformat() for o, _ in self._entries_for(project_id)]
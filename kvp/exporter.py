@@ -0,0 +1,140 @@
+"""Portfolio-Export aller (oder gefilterter) Projekte.
+
+Projekte werden einzeln aus der Datenbank gelesen und sofort geschrieben,
+der Speicherbedarf bleibt daher unabhängig von der Portfoliogröße konstant.
+
+* JSONL (optional gzip-komprimiert): ein Projekt pro Zeile, kompatibel
+  mit ``kvp.importer``.
+* Parquet: spaltenorientierte Tabellen ``tasks`` und ``metrics`` für die
+  BI-Strecke (benötigt pandas und pyarrow).
+
+Aufruf über die Kommandozeile::
+
+    python -m kvp.exporter exports/portfolio.jsonl.gz --status in_progress
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from .storage import ProjectStore, default_db_path
+
+TASK_EXPORT_COLUMNS = ['project_id', 'project_name', 'project_status', 'task_id', 'task',
+                       'responsible', 'due_date', 'status', 'priority']
+METRIC_EXPORT_COLUMNS = ['project_id', 'project_name', 'project_status', 'metric', 'value']
+
+
+def iter_export(store: ProjectStore, statuses: Optional[List[str]] = None,
+                project_ids: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    return store.iter_projects(statuses=statuses, project_ids=project_ids)
+
+
+def _open_text(path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+    return open(path, 'w', encoding='utf-8')
+
+
+def write_jsonl(projects: Iterator[Dict[str, Any]], stream) -> int:
+    """Schreibt Projekte kompakt (ohne Einrückung) zeilenweise; liefert die Anzahl."""
+    count = 0
+    for project in projects:
+        stream.write(json.dumps(project, ensure_ascii=False, separators=(',', ':'), default=str))
+        stream.write('\n')
+        count += 1
+    return count
+
+
+def export_jsonl(store: ProjectStore, path: str, **filters) -> int:
+    with _open_text(path) as stream:
+        return write_jsonl(iter_export(store, **filters), stream)
+
+
+def _task_rows(project):
+    for task in (project.get('do') or {}).get('implementation_steps', []):
+        yield {'project_id': project['id'], 'project_name': project['name'],
+               'project_status': project['status'], 'task_id': task['id'], 'task': task['task'],
+               'responsible': task['responsible'], 'due_date': task['due_date'],
+               'status': task['status'], 'priority': task['priority']}
+
+
+def _metric_rows(project):
+    for metric, value in ((project.get('check') or {}).get('metrics') or {}).items():
+        yield {'project_id': project['id'], 'project_name': project['name'],
+               'project_status': project['status'], 'metric': metric, 'value': value}
+
+
+def export_parquet(store: ProjectStore, directory: str, chunk_rows: int = 50000,
+                   **filters) -> Dict[str, str]:
+    """Schreibt ``tasks.parquet`` und ``metrics.parquet`` blockweise nach ``directory``."""
+    try:
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError('Für den Parquet-Export werden pandas und pyarrow benötigt '
+                           '(pip install pyarrow).') from exc
+
+    os.makedirs(directory, exist_ok=True)
+    paths = {'tasks': os.path.join(directory, 'tasks.parquet'),
+             'metrics': os.path.join(directory, 'metrics.parquet')}
+    columns = {'tasks': TASK_EXPORT_COLUMNS, 'metrics': METRIC_EXPORT_COLUMNS}
+    schemas = {
+        'tasks': pa.schema([(c, pa.string()) for c in TASK_EXPORT_COLUMNS]),
+        'metrics': pa.schema([(c, pa.string()) for c in METRIC_EXPORT_COLUMNS[:-1]]
+                             + [('value', pa.float64())]),
+    }
+    writers = {name: pq.ParquetWriter(path, schemas[name], compression='zstd')
+               for name, path in paths.items()}
+    buffers: Dict[str, list] = {'tasks': [], 'metrics': []}
+
+    def flush(name):
+        if buffers[name]:
+            frame = pd.DataFrame(buffers[name], columns=columns[name])
+            writers[name].write_table(pa.Table.from_pandas(frame, schema=schemas[name],
+                                                           preserve_index=False))
+            buffers[name] = []
+
+    try:
+        for project in iter_export(store, **filters):
+            buffers['tasks'].extend(_task_rows(project))
+            buffers['metrics'].extend(_metric_rows(project))
+            for name in buffers:
+                if len(buffers[name]) >= chunk_rows:
+                    flush(name)
+        for name in buffers:
+            flush(name)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Portfolio-Export aller KVP-Projekte')
+    parser.add_argument('target', help='Zieldatei (.jsonl oder .jsonl.gz) bzw. Verzeichnis für Parquet')
+    parser.add_argument('--db', default=default_db_path(), help='SQLite-Datenbank')
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl')
+    parser.add_argument('--status', action='append', help='Nur Projekte mit diesem Status (mehrfach möglich)')
+    args = parser.parse_args(argv)
+
+    store = ProjectStore(args.db)
+    started = time.perf_counter()
+    if args.format == 'parquet':
+        paths = export_parquet(store, args.target, statuses=args.status)
+        print(f"Parquet geschrieben: {', '.join(paths.values())} ({time.perf_counter() - started:.1f} s)")
+    else:
+        count = export_jsonl(store, args.target, statuses=args.status)
+        size = os.path.getsize(args.target)
+        print(f'{count} Projekte nach {args.target} exportiert ({size / 1e6:.1f} MB, '
+              f'{time.perf_counter() - started:.1f} s)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Versionsstände von Projekten als Deltas mit regelmäßigen Vollständen.
+
+Ein Stand (``snapshot``) enthält die Projektspalten, die vier PDCA-Abschnitte
+und die Aufgaben nach ID. Die Ablage speichert nach jeder inhaltlichen
+Änderung nur die Differenz zum vorherigen Stand und alle
+``CHECKPOINT_EVERY`` Versionen (oder wenn die Differenz kaum kleiner wäre)
+einen Vollstand. Ein beliebiger Stand entsteht aus dem letzten Vollstand
+davor plus höchstens ``CHECKPOINT_EVERY - 1`` Deltas.
+
+Ein Delta ist eine Liste von Operationen auf Pfaden im Stand:
+
+* ``['=', pfad, wert]``: Wert setzen,
+* ``['-', pfad]``: Schlüssel entfernen,
+* ``['~', pfad, [[von, bis, text], …]]``: Ausschnitte eines langen Texts ersetzen.
+"""
+
+import difflib
+import json
+import zlib
+from typing import Any, Dict, List, Optional, Sequence
+
+CHECKPOINT_EVERY = 20
+# Ab dieser Länge werden Texte zeichenweise verglichen statt ganz ersetzt
+TEXT_DIFF_MIN_LENGTH = 200
+# Kleinere Einträge lohnen die Kompression nicht
+COMPRESS_MIN_BYTES = 512
+
+_MISSING = object()
+
+
+def diff(old: Dict[str, Any], new: Dict[str, Any], path: Sequence[str] = ()) -> List[list]:
+    """Operationen, die ``old`` in ``new`` überführen."""
+    ops: List[list] = []
+    for key in old:
+        if key not in new:
+            ops.append(['-', [*path, key]])
+    for key, value in new.items():
+        before = old.get(key, _MISSING)
+        if before == value:
+            continue
+        if isinstance(before, dict) and isinstance(value, dict):
+            ops.extend(diff(before, value, [*path, key]))
+        elif isinstance(before, str) and isinstance(value, str) and len(value) >= TEXT_DIFF_MIN_LENGTH:
+            edits = _text_edits(before, value)
+            ops.append(['~', [*path, key], edits] if edits is not None else ['=', [*path, key], value])
+        else:
+            ops.append(['=', [*path, key], value])
+    return ops
+
+
+def _text_edits(old: str, new: str) -> Optional[List[list]]:
+    """Ersetzungen ``[von, bis, text]`` bezogen auf ``old``; ``None``, wenn sie kaum kürzer wären als ``new``."""
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    edits = [[i1, i2, new[j1:j2]] for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+    if sum(len(text) + 8 for _, _, text in edits) * 2 > len(new):
+        return None
+    return edits
+
+
+def patch(state: Dict[str, Any], ops: List[list]) -> Dict[str, Any]:
+    """Wendet ein Delta auf ``state`` an (verändert ``state``)."""
+    for op in ops:
+        *parents, key = op[1]
+        target = state
+        for part in parents:
+            target = target.setdefault(part, {})
+        if op[0] == '=':
+            target[key] = op[2]
+        elif op[0] == '-':
+            target.pop(key, None)
+        else:
+            text = target[key]
+            # Von hinten, damit die Positionen der übrigen Ersetzungen gültig bleiben
+            for start, end, replacement in reversed(op[2]):
+                text = text[:start] + replacement + text[end:]
+            target[key] = text
+    return state
+
+
+def changed_paths(ops: List[list]) -> List[str]:
+    """Geänderte Felder eines Deltas zur Anzeige (``plan.problem``, ``tasks`` …)."""
+    paths = []
+    for op in ops:
+        path = op[1]
+        label = 'tasks' if path[0] == 'tasks' else '.'.join(str(part) for part in path[:2])
+        if label not in paths:
+            paths.append(label)
+    return paths
+
+
+def encode(value: Any):
+    """JSON-Text, ab ``COMPRESS_MIN_BYTES`` zlib-komprimiert als BLOB."""
+    text = json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)
+    if len(text) < COMPRESS_MIN_BYTES:
+        return text
+    return zlib.compress(text.encode('utf-8'), 6)
+
+
+def decode(data) -> Any:
+    if isinstance(data, str):
+        return json.loads(data)
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+
+def as_project(snapshot: Dict[str, Any], project_id: str, version: int) -> Dict[str, Any]:
+    """Stand im Format von ``ProjectStore.load_project`` (Aufgaben in ``do.implementation_steps``)."""
+    project = {'id': project_id, 'version': version}
+    for column in ('name', 'description', 'created_date', 'status'):
+        project[column] = snapshot.get(column)
+    for phase in ('plan', 'do', 'check', 'act'):
+        project[phase] = dict(snapshot.get(phase) or {})
+    tasks = sorted((snapshot.get('tasks') or {}).items(), key=lambda item: item[1].get('position', 0))
+    if tasks:
+        project['do']['implementation_steps'] = [
+            {'id': task_id, **{column: value for column, value in task.items() if column != 'position'}}
+            for task_id, task in tasks]
+    return project
@@ -0,0 +1,456 @@
+"""Streaming-Massenimport von KVP-Projekten aus JSON, JSONL oder CSV.
+
+Dateien werden in kleinen Blöcken gelesen, jeder Datensatz gegen das
+Projektschema aus ``create_sample_project()`` geprüft und gebündelt in
+Transaktionen geschrieben. Fehlerhafte Datensätze werden mit Grund
+gemeldet, der Rest wird trotzdem importiert.
+
+Aufruf über die Kommandozeile::
+
+    python -m kvp.importer projekte.jsonl --db data/kvp.db
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .aggregates import TASK_STATUSES
+from .storage import ProjectStore, TaskIdConflict, default_db_path
+
+PROJECT_STATUSES = ('draft', 'in_progress', 'completed')
+TASK_PRIORITIES = ('low', 'medium', 'high')
+TEXT_FIELDS = {
+    'plan': ('problem', 'goal', 'root_cause'),
+    'check': ('results',),
+    'act': ('standardization', 'lessons_learned', 'next_steps'),
+}
+# Spalten des CSV-Formats: eine Zeile pro Aufgabe, Projektspalten wiederholen sich
+CSV_COLUMNS = (
+    'project_id', 'name', 'description', 'created_date', 'status',
+    'problem', 'goal', 'root_cause', 'measures',
+    'wartezeit_vorher', 'wartezeit_nachher', 'results',
+    'standardization', 'lessons_learned', 'next_steps',
+    'task_id', 'task', 'responsible', 'due_date', 'task_status', 'priority',
+)
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportReport:
+    def __init__(self):
+        self.projects = 0
+        self.tasks = 0
+        self.rejected = 0
+        self.errors: List[Tuple[int, str]] = []
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def reject(self, record_no: int, reasons: List[str]):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((record_no, '; '.join(reasons)))
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    @property
+    def tasks_per_second(self) -> float:
+        return self.tasks / self.seconds if self.seconds else 0.0
+
+    @property
+    def projects_per_second(self) -> float:
+        return self.projects / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        return (f'{self.projects} Projekte, {self.tasks} Aufgaben importiert, '
+                f'{self.rejected} abgelehnt in {self.seconds:.1f} s '
+                f'({self.projects_per_second:.0f} Projekte/s, {self.tasks_per_second:.0f} Aufgaben/s)')
+
+
+# Validierung
+def _iso_date(value, field, errors, required=False) -> Optional[str]:
+    if value in (None, ''):
+        if required:
+            errors.append(f'{field} fehlt')
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    try:
+        return date.fromisoformat(str(value).strip()[:10]).isoformat()
+    except ValueError:
+        errors.append(f'{field} ist kein Datum (JJJJ-MM-TT): {value!r}')
+        return None
+
+
+def _text(value, field, errors) -> str:
+    if value is None:
+        return ''
+    if not isinstance(value, (str, int, float)):
+        errors.append(f'{field} muss Text sein')
+        return ''
+    return str(value)
+
+
+def _choice(value, choices, default, field, errors) -> str:
+    if value in (None, ''):
+        return default
+    normalized = str(value).strip().lower()
+    if normalized not in choices:
+        errors.append(f'{field} muss eines von {", ".join(choices)} sein, nicht {value!r}')
+        return default
+    return normalized
+
+
+def validate_task(raw: Any, errors: List[str], prefix: str = 'Aufgabe') -> Optional[Dict[str, Any]]:
+    if not isinstance(raw, dict):
+        errors.append(f'{prefix} ist kein Objekt')
+        return None
+    task_errors: List[str] = []
+    task = {
+        'id': str(raw.get('id') or uuid.uuid4()),
+        'task': _text(raw.get('task'), f'{prefix}.task', task_errors).strip(),
+        'responsible': _text(raw.get('responsible'), f'{prefix}.responsible', task_errors),
+        'due_date': _iso_date(raw.get('due_date'), f'{prefix}.due_date', task_errors),
+        'status': _choice(raw.get('status'), TASK_STATUSES, 'open', f'{prefix}.status', task_errors),
+        'priority': _choice(raw.get('priority'), TASK_PRIORITIES, 'medium', f'{prefix}.priority', task_errors),
+    }
+    if not task['task']:
+        task_errors.append(f'{prefix}.task fehlt')
+    errors.extend(task_errors)
+    return None if task_errors else task
+
+
+def validate_project(raw: Any) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """Prüft und normalisiert einen Datensatz; liefert ``(projekt, fehler)``."""
+    errors: List[str] = []
+    if not isinstance(raw, dict):
+        return None, ['Datensatz ist kein JSON-Objekt']
+    name = _text(raw.get('name'), 'name', errors).strip()
+    if not name:
+        errors.append('name fehlt')
+    project = {
+        'id': str(raw.get('id') or uuid.uuid4()),
+        'name': name,
+        'description': _text(raw.get('description'), 'description', errors),
+        'created_date': _iso_date(raw.get('created_date'), 'created_date', errors)
+                        or datetime.now().strftime('%Y-%m-%d'),
+        'status': _choice(raw.get('status'), PROJECT_STATUSES, 'draft', 'status', errors),
+        'plan': {}, 'do': {}, 'check': {}, 'act': {},
+    }
+    for phase in ('plan', 'do', 'check', 'act'):
+        if not isinstance(raw.get(phase) or {}, dict):
+            errors.append(f'{phase} muss ein Objekt sein')
+    for phase, fields in TEXT_FIELDS.items():
+        section = raw.get(phase) or {}
+        if isinstance(section, dict):
+            for field in fields:
+                if section.get(field) not in (None, ''):
+                    project[phase][field] = _text(section[field], f'{phase}.{field}', errors)
+
+    plan = raw.get('plan') if isinstance(raw.get('plan'), dict) else {}
+    measures = plan.get('measures')
+    if isinstance(measures, str):
+        measures = [m.strip() for m in measures.split('\n')]
+    if measures is not None:
+        if not isinstance(measures, list):
+            errors.append('plan.measures muss eine Liste sein')
+        else:
+            project['plan']['measures'] = [str(m).strip() for m in measures if str(m).strip()]
+
+    check = raw.get('check') if isinstance(raw.get('check'), dict) else {}
+    metrics = check.get('metrics')
+    if metrics is not None:
+        if not isinstance(metrics, dict):
+            errors.append('check.metrics muss ein Objekt sein')
+        else:
+            project['check']['metrics'] = {}
+            for key, value in metrics.items():
+                try:
+                    project['check']['metrics'][str(key)] = float(value)
+                except (TypeError, ValueError):
+                    errors.append(f'check.metrics.{key} ist keine Zahl: {value!r}')
+
+    do = raw.get('do') if isinstance(raw.get('do'), dict) else {}
+    steps = do.get('implementation_steps') or []
+    if not isinstance(steps, list):
+        errors.append('do.implementation_steps muss eine Liste sein')
+        steps = []
+    tasks = [validate_task(step, errors, f'Aufgabe {i + 1}') for i, step in enumerate(steps)]
+    seen = set()
+    for task in tasks:
+        if task is not None:
+            if task['id'] in seen:
+                errors.append(f"Aufgaben-ID {task['id']} ist doppelt")
+            seen.add(task['id'])
+    if steps:
+        project['do']['implementation_steps'] = [t for t in tasks if t is not None]
+    if raw.get('_continuation'):
+        project['_continuation'] = True
+    return (None if errors else project), errors
+
+
+# Leser
+def iter_jsonl(stream: io.TextIOBase) -> Iterator[Any]:
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield ValueError(f'Ungültiges JSON: {exc.msg}')
+
+
+def iter_json(stream: io.TextIOBase, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """Liest ein JSON-Array (oder ein einzelnes Objekt, z. B. einen Projekt-Export) blockweise."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    in_array = None
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position >= len(buffer) and not eof:
+            chunk = stream.read(chunk_size)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+            continue
+        if position >= len(buffer):
+            return
+        if in_array is None:
+            in_array = buffer[position] == '['
+            if in_array:
+                position += 1
+            continue
+        if in_array and buffer[position] == ']':
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as exc:
+            if eof:
+                yield ValueError(f'Ungültiges JSON: {exc.msg}')
+                return
+            chunk = stream.read(chunk_size)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+            continue
+        yield value
+        position = end
+        if not in_array:
+            return
+
+
+def _number(value):
+    return None if value in (None, '') else value
+
+
+def iter_csv(stream: io.TextIOBase, max_tasks_per_record: int = 1000) -> Iterator[Any]:
+    """Gruppiert aufeinanderfolgende Zeilen eines Projekts zu Datensätzen.
+
+    Projekte mit sehr vielen Aufgaben werden in Teilstücke zu höchstens
+    ``max_tasks_per_record`` Aufgaben zerlegt, damit der Speicherbedarf
+    begrenzt bleibt; Folgestücke tragen ``_continuation``.
+    """
+    reader = csv.DictReader(stream)
+    record = None
+    key = None
+    for row in reader:
+        row_key = row.get('project_id') or row.get('name')
+        if record is not None and (row_key != key or
+                                   len(record['do']['implementation_steps']) >= max_tasks_per_record):
+            continuation = row_key == key
+            yield record
+            record = None
+            if continuation:
+                record = {'id': record_id, 'name': record_name, '_continuation': True,
+                          'do': {'implementation_steps': []}}
+        if record is None:
+            key = row_key
+            record_id = row.get('project_id') or str(uuid.uuid4())
+            record_name = row.get('name')
+            record = {
+                'id': record_id,
+                'name': record_name,
+                'description': row.get('description'),
+                'created_date': row.get('created_date'),
+                'status': row.get('status'),
+                'plan': {'problem': row.get('problem'), 'goal': row.get('goal'),
+                         'root_cause': row.get('root_cause'),
+                         'measures': [m for m in (row.get('measures') or '').split('|')]},
+                'do': {'implementation_steps': []},
+                'check': {'results': row.get('results')},
+                'act': {'standardization': row.get('standardization'),
+                        'lessons_learned': row.get('lessons_learned'),
+                        'next_steps': row.get('next_steps')},
+            }
+            metrics = {k: _number(row.get(k)) for k in ('wartezeit_vorher', 'wartezeit_nachher')}
+            if any(v is not None for v in metrics.values()):
+                record['check']['metrics'] = {k: v for k, v in metrics.items() if v is not None}
+        if row.get('task'):
+            record['do']['implementation_steps'].append({
+                'id': row.get('task_id') or None,
+                'task': row.get('task'),
+                'responsible': row.get('responsible'),
+                'due_date': row.get('due_date'),
+                'status': row.get('task_status'),
+                'priority': row.get('priority'),
+            })
+    if record is not None:
+        yield record
+
+
+READERS = {'jsonl': iter_jsonl, 'json': iter_json, 'csv': iter_csv}
+
+
+def detect_format(filename: str) -> str:
+    name = filename.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith('.json'):
+        return 'json'
+    raise ValueError(f'Unbekanntes Dateiformat: {filename}')
+
+
+# Import
+def import_records(store: ProjectStore, records: Iterable[Any], batch_size: int = 500,
+                   progress=None, max_batch_tasks: int = 5000) -> ImportReport:
+    """Validiert Datensätze und schreibt sie in Bündeln von höchstens ``batch_size``
+    Projekten bzw. ``max_batch_tasks`` Aufgaben."""
+    report = ImportReport()
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+    batch_tasks = 0
+    rejected_ids = set()
+    # Aufgaben-IDs müssen projektübergreifend eindeutig sein: noch nicht
+    # geschriebene Aufgaben des Bündels, Aufgaben des laufenden Projekts
+    # (CSV-Teilstücke) und Projekte, deren Kopf in diesem Lauf importiert wurde
+    pending_tasks: Dict[str, str] = {}
+    project_tasks = set()
+    imported_heads = set()
+
+    def task_clashes(project):
+        task_ids = [task['id'] for task in project['do'].get('implementation_steps', [])]
+        continuation = project.get('_continuation')
+        existing = store.task_projects(task_ids)
+        clashes = []
+        for task_id in task_ids:
+            owner = pending_tasks.get(task_id, existing.get(task_id))
+            if continuation and task_id in project_tasks:
+                clashes.append(f'Aufgaben-ID {task_id} ist doppelt')
+            elif owner == '':
+                # Projekt ist für den importierenden Benutzer nicht sichtbar (ScopedStore)
+                clashes.append(f'Aufgaben-ID {task_id} gehört bereits zu einem anderen Projekt')
+            elif owner is not None and owner != project['id']:
+                clashes.append(f'Aufgaben-ID {task_id} gehört bereits zu Projekt {owner}')
+            elif owner is not None and continuation and project['id'] not in imported_heads:
+                clashes.append(f'Aufgaben-ID {task_id} ist bereits vorhanden')
+        return clashes
+
+    def write_projects(projects):
+        with store.transaction():
+            new = [p for p in projects if not p.get('_continuation')]
+            store.insert_projects(new)
+            for project in projects:
+                if project.get('_continuation'):
+                    store.append_tasks(project['id'], project['do'].get('implementation_steps', []))
+        report.projects += len(new)
+        report.tasks += sum(len(p['do'].get('implementation_steps', [])) for p in projects)
+
+    def write(batch):
+        try:
+            write_projects([project for _, project in batch])
+        except TaskIdConflict:
+            # Zwischen Prüfung und Schreiben vergebene Aufgaben-IDs (z. B. durch eine andere
+            # Sitzung): einzeln schreiben, damit nur die betroffenen Datensätze scheitern
+            for record_no, project in batch:
+                if project.get('_continuation') and project['id'] in rejected_ids:
+                    report.reject(record_no, ['Projektkopf wurde abgelehnt'])
+                    continue
+                try:
+                    write_projects([project])
+                except TaskIdConflict as exc:
+                    rejected_ids.add(project['id'])
+                    report.reject(record_no, [str(exc)])
+        if progress is not None:
+            progress(report)
+
+    for record_no, raw in enumerate(records, start=1):
+        if isinstance(raw, ValueError):
+            report.reject(record_no, [str(raw)])
+            continue
+        project, errors = validate_project(raw)
+        if not errors and project.get('_continuation') and project['id'] in rejected_ids:
+            errors = ['Projektkopf wurde abgelehnt']
+        if not errors:
+            errors = task_clashes(project)
+        if errors:
+            if isinstance(raw, dict) and raw.get('id'):
+                rejected_ids.add(str(raw['id']))
+            report.reject(record_no, errors)
+            continue
+        if not project.get('_continuation'):
+            imported_heads.add(project['id'])
+            project_tasks.clear()
+        for task in project['do'].get('implementation_steps', []):
+            pending_tasks[task['id']] = project['id']
+            project_tasks.add(task['id'])
+        batch.append((record_no, project))
+        batch_tasks += len(project['do'].get('implementation_steps', []))
+        if len(batch) >= batch_size or batch_tasks >= max_batch_tasks:
+            write(batch)
+            batch = []
+            batch_tasks = 0
+            pending_tasks.clear()
+    if batch:
+        write(batch)
+    return report.finish()
+
+
+def import_stream(store: ProjectStore, stream: io.TextIOBase, fmt: str, batch_size: int = 500,
+                  progress=None) -> ImportReport:
+    return import_records(store, READERS[fmt](stream), batch_size=batch_size, progress=progress)
+
+
+def import_file(store: ProjectStore, path: str, fmt: Optional[str] = None, batch_size: int = 500,
+                progress=None) -> ImportReport:
+    fmt = fmt or detect_format(path)
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as stream:
+        return import_stream(store, stream, fmt, batch_size=batch_size, progress=progress)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='KVP-Projekte aus JSON/JSONL/CSV importieren')
+    parser.add_argument('files', nargs='+', help='Eingabedateien (optional .gz-komprimiert)')
+    parser.add_argument('--db', default=default_db_path(), help='SQLite-Datenbank')
+    parser.add_argument('--format', choices=sorted(READERS), help='Format erzwingen')
+    parser.add_argument('--batch-size', type=int, default=500, help='Projekte pro Transaktion')
+    args = parser.parse_args(argv)
+
+    store = ProjectStore(args.db)
+    exit_code = 0
+    for path in args.files:
+        report = import_file(store, path, args.format, args.batch_size,
+                             progress=lambda r: print(f'\r{os.path.basename(path)}: {r.projects} Projekte, '
+                                                      f'{r.tasks} Aufgaben', end='', file=sys.stderr))
+        print(file=sys.stderr)
+        print(f'{path}: {report.summary()}')
+        for record_no, reason in report.errors:
+            print(f'  Datensatz {record_no}: {reason}')
+        if report.rejected:
+            exit_code = 1
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
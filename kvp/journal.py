@@ -0,0 +1,450 @@
+"""Ereignisjournal (Audit-Historie) für alle Änderungen an Projekten.
+
+Jede Änderung der Ablage wird als JSON-Zeile an ein Segment angehängt
+(``data/journal/journal-000001.jsonl`` …); Segmente werden nie verändert,
+nur nach Erreichen der Maximalgröße abgeschlossen. Zu jedem abgeschlossenen
+Segment gehört eine Indexdatei mit Zeitspanne und Zeilen-Offsets je Projekt,
+Abfragen lesen daher nur die betroffenen Zeilen:
+
+* ``recent(limit)``: die letzten Einträge (für "Letzte Aktionen"),
+* ``history(project_id, since, until)``: Historie eines Projekts.
+
+Die Verdichtung läuft periodisch im Hintergrund: Abgeschlossene Segmente
+werden zusammengelegt, Serien von Autosave-Einträgen derselben Person zum
+selben Feld werden zu einem Eintrag zusammengefasst und Segmente jenseits
+der Aufbewahrungsfrist gelöscht.
+
+Mehrere Prozesse (z. B. mehrere Streamlit-Server) können dasselbe Journal
+nutzen: Schreiben und Segmentwechsel laufen unter einer exklusiven
+Dateisperre (``journal.lock``), jede Abfrage liest vorher die Zeilen der
+anderen Prozesse nach. Ohne ``fcntl`` (Windows) gilt das nur für einen Prozess.
+"""
+
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import AbstractSet, Any, Dict, Iterator, List, Optional
+
+from .storage import DERIVED_EVENTS, ChangeEvent, ProjectStore, current_origin
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Wer eine Änderung auslöst (Benutzer bzw. Rolle); wird von der Oberfläche gesetzt
+current_actor = ContextVar('kvp_actor', default=None)
+
+PHASE_LABELS = {'plan': "Plan", 'do': "Do", 'check': "Check", 'act': "Act"}
+STATUS_LABELS = {'open': "offen", 'in_progress': "in Bearbeitung", 'completed': "erledigt"}
+
+
+def default_journal_dir(db_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'journal')
+
+
+def describe(event: ChangeEvent) -> str:
+    """Kurzbeschreibung eines Ereignisses für die Anzeige."""
+    data = event.data or {}
+    if event.kind == 'project_saved':
+        if 'restored_from' in data:
+            return f"Version {data['restored_from']} wiederhergestellt"
+        return "Projekt angelegt" if data.get('created', True) else "Projekt gespeichert"
+    if event.kind == 'project_updated':
+        if 'name' in data:
+            return f"Projekt umbenannt in „{data['name']}“"
+        return "Projekt aktualisiert (" + ', '.join(data) + ")"
+    if event.kind == 'project_deleted':
+        return "Projekt gelöscht"
+    if event.kind == 'fields_written':
+        phase = PHASE_LABELS.get(data.get('phase'), data.get('phase'))
+        return f"{phase} bearbeitet (" + ', '.join(data.get('fields', {})) + ")"
+    if event.kind == 'task_added':
+        return f"Aufgabe hinzugefügt: {data.get('task', '')}"
+    if event.kind == 'task_updated':
+        if 'status' in data:
+            return f"Aufgabe {STATUS_LABELS.get(data['status'], data['status'])}"
+        return "Aufgabe geändert (" + ', '.join(c for c in data if c != 'completed_at') + ")"
+    if event.kind == 'task_deleted':
+        return "Aufgabe gelöscht"
+    if event.kind == 'metric_defined':
+        return f"Kennzahl „{data.get('metric')}“ angelegt"
+    if event.kind == 'metric_deleted':
+        return f"Kennzahl „{data.get('metric')}“ gelöscht"
+    if event.kind == 'measurements_added':
+        return f"{data.get('count')} Messwerte für „{data.get('metric')}“ erfasst"
+    if event.kind == 'acl_changed':
+        if data.get('level') is None:
+            return f"Freigabe für {data.get('principal')} entfernt"
+        return f"Freigabe für {data.get('principal')} geändert"
+    return event.kind
+
+
+class _Segment:
+    """Ein Journalsegment samt Offsets aller Zeilen und je Projekt."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offsets: List[int] = []
+        self.by_project: Dict[str, List[int]] = {}
+        self.first_ts: Optional[str] = None
+        self.last_ts: Optional[str] = None
+        self.size = 0
+
+    @property
+    def index_path(self) -> str:
+        return self.path[:-len('.jsonl')] + '.idx.json'
+
+    def add(self, offset: int, record: Dict[str, Any], length: int):
+        self.offsets.append(offset)
+        self.by_project.setdefault(record['project_id'], []).append(offset)
+        self.first_ts = self.first_ts or record['ts']
+        self.last_ts = record['ts']
+        self.size = offset + length
+
+    def scan(self):
+        """Liest die Zeilen ab ``size`` ein (anfangs alle, danach die anderer Prozesse)."""
+        try:
+            stream = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with stream:
+            offset = self.size
+            stream.seek(offset)
+            for line in stream:
+                if not line.endswith(b'\n'):
+                    # Unvollständige letzte Zeile nach einem Absturz; wird vor dem nächsten Schreiben abgeschnitten
+                    break
+                try:
+                    self.add(offset, json.loads(line), len(line))
+                except ValueError:
+                    logger.warning('Beschädigte Journalzeile in %s @%d übersprungen', self.path, offset)
+                offset += len(line)
+            self.size = offset
+
+    def save_index(self):
+        temp_path = f'{self.index_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as stream:
+            json.dump({'first_ts': self.first_ts, 'last_ts': self.last_ts, 'size': self.size,
+                       'offsets': self.offsets, 'by_project': self.by_project}, stream)
+        os.replace(temp_path, self.index_path)
+
+    def load_index(self) -> bool:
+        try:
+            with open(self.index_path, encoding='utf-8') as stream:
+                index = json.load(stream)
+        except (OSError, ValueError):
+            return False
+        if index.get('size') != os.path.getsize(self.path):
+            return False
+        self.first_ts, self.last_ts, self.size = index['first_ts'], index['last_ts'], index['size']
+        self.offsets, self.by_project = index['offsets'], index['by_project']
+        return True
+
+    def read(self, offsets: List[int]) -> Iterator[Dict[str, Any]]:
+        with open(self.path, 'rb') as stream:
+            for offset in offsets:
+                stream.seek(offset)
+                yield json.loads(stream.readline())
+
+
+class EventJournal:
+    """Append-only Journal; eine Instanz pro Prozess, gespeist über ``store.subscribe``.
+
+    Der Segmentbestand im Speicher wird bei jedem Zugriff unter der Dateisperre
+    mit dem Verzeichnis abgeglichen (``_refresh``).
+    """
+
+    def __init__(self, directory: str, segment_max_bytes: int = 1 << 20,
+                 compact_interval_seconds: float = 3600, retention_days: Optional[int] = None,
+                 coalesce_seconds: int = 600):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.compact_interval_seconds = compact_interval_seconds
+        self.retention_days = retention_days
+        self.coalesce_seconds = coalesce_seconds
+        self._lock = threading.RLock()
+        self._names: Dict[str, str] = {}
+        self._store: Optional[ProjectStore] = None
+        self._last_compaction = time.monotonic()
+        self._compacting = False
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, 'journal.lock'), 'ab')
+        self._sealed: List[_Segment] = []
+        self._active: Optional[_Segment] = None
+        self._stream = None
+        with self._locked(exclusive=False):
+            pass  # öffnet das aktive Segment
+
+    def attach(self, store: ProjectStore):
+        self._store = store
+        store.subscribe(self.apply)
+
+    def close(self):
+        if self._store is not None:
+            self._store.unsubscribe(self.apply)
+        with self._lock:
+            self._stream.close()
+            self._lock_file.close()
+
+    # Segmente
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f'journal-{number:06d}.jsonl')
+
+    @staticmethod
+    def _segment_number(path: str) -> int:
+        return int(os.path.basename(path)[len('journal-'):-len('.jsonl')])
+
+    def _open_sealed(self, path: str) -> _Segment:
+        segment = _Segment(path)
+        if not segment.load_index():
+            segment.scan()
+            segment.save_index()
+        return segment
+
+    @contextmanager
+    def _locked(self, exclusive: bool = True):
+        """Thread- und Dateisperre; gleicht danach den Segmentbestand ab. Nicht verschachteln."""
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                self._refresh()
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Übernimmt Segmentwechsel, Verdichtungen und Zeilen anderer Prozesse."""
+        paths = sorted(glob.glob(os.path.join(self.directory, 'journal-*.jsonl'))) or [self._segment_path(1)]
+        known = {segment.path: segment for segment in self._sealed}
+        if self._active is not None:
+            known[self._active.path] = self._active
+        sealed = []
+        for path in paths[:-1]:
+            segment = known.get(path)
+            try:
+                changed = segment is None or segment.size != os.path.getsize(path)
+            except FileNotFoundError:
+                continue
+            if changed and segment is not None and segment is self._active:
+                # Ein anderer Prozess hat das Segment abgeschlossen
+                segment.scan()
+            elif changed:
+                segment = self._open_sealed(path)
+            sealed.append(segment)
+        self._sealed = sealed
+        if self._active is None or self._active.path != paths[-1]:
+            if self._stream is not None:
+                self._stream.close()
+            self._active = _Segment(paths[-1])
+            self._stream = open(self._active.path, 'ab')
+        self._active.scan()
+
+    def _roll(self):
+        self._stream.close()
+        self._active.save_index()
+        self._sealed.append(self._active)
+        self._active = _Segment(self._segment_path(self._segment_number(self._active.path) + 1))
+        self._stream = open(self._active.path, 'ab')
+
+    # Schreiben
+    def _project_name(self, event: ChangeEvent) -> str:
+        data = event.data or {}
+        if event.kind in ('project_saved', 'project_updated') and 'name' in data:
+            self._names[event.project_id] = data['name']
+        elif event.project_id not in self._names and self._store is not None:
+            name = self._store.project_name(event.project_id)
+            if name is not None:
+                self._names[event.project_id] = name
+        return self._names.get(event.project_id, '')
+
+    def apply(self, event: ChangeEvent):
+        if event.kind in DERIVED_EVENTS:
+            # Abgeleitete Werte sind keine Aktionen
+            return
+        data = event.data or {}
+        record = {
+            'ts': datetime.now().isoformat(timespec='seconds'),
+            'kind': event.kind,
+            'project_id': event.project_id,
+            'project_name': self._project_name(event),
+            'task_id': event.task_id,
+            'actor': current_actor.get(),
+            'origin': current_origin.get(),
+            'version': event.version,
+            'summary': describe(event),
+        }
+        if event.kind == 'fields_written':
+            record['phase'] = data.get('phase')
+            record['fields'] = sorted(data.get('fields', {}))
+        self.append(record)
+        if event.kind == 'project_deleted':
+            self._names.pop(event.project_id, None)
+
+    def append(self, record: Dict[str, Any]):
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        with self._locked():
+            if os.path.getsize(self._active.path) > self._active.size:
+                # Unter der exklusiven Sperre schreibt niemand sonst: Rest eines Absturzes
+                logger.warning('Unvollständige Journalzeile in %s @%d verworfen',
+                               self._active.path, self._active.size)
+                os.truncate(self._active.path, self._active.size)
+            if self._active.size and self._active.size + len(line) > self.segment_max_bytes:
+                self._roll()
+            offset = self._active.size
+            self._stream.write(line)
+            self._stream.flush()
+            self._active.add(offset, record, len(line))
+        self._maybe_compact()
+
+    # Abfragen
+    def _segments(self) -> List[_Segment]:
+        with self._lock:
+            return self._sealed + [self._active]
+
+    def recent(self, limit: int = 10, project_id: Optional[str] = None,
+               project_ids: Optional[AbstractSet[str]] = None) -> List[Dict[str, Any]]:
+        """Die letzten ``limit`` Einträge, neueste zuerst; liest nur so viele Zeilen wie nötig.
+
+        ``project_ids`` beschränkt auf die sichtbaren Projekte (über den Index je Projekt).
+        """
+        records: List[Dict[str, Any]] = []
+        with self._locked(exclusive=False):
+            for segment in reversed(self._segments()):
+                if project_id is not None:
+                    offsets = segment.by_project.get(project_id, [])
+                elif project_ids is not None:
+                    offsets = sorted(offset for pid in segment.by_project.keys() & project_ids
+                                     for offset in segment.by_project[pid])
+                else:
+                    offsets = segment.offsets
+                wanted = offsets[-(limit - len(records)):] if offsets else []
+                records.extend(reversed(list(segment.read(wanted))))
+                if len(records) >= limit:
+                    break
+        return records
+
+    def history(self, project_id: str, since: Optional[str] = None,
+                until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Alle Einträge eines Projekts in zeitlicher Reihenfolge (ISO-Zeitstempel als Grenzen)."""
+        records = []
+        with self._locked(exclusive=False):
+            for segment in self._segments():
+                if segment.last_ts is None or (since and segment.last_ts < since) \
+                        or (until and segment.first_ts > until):
+                    continue
+                records.extend(record for record in segment.read(segment.by_project.get(project_id, []))
+                               if not (since and record['ts'] < since) and not (until and record['ts'] > until))
+        return records
+
+    # Verdichtung
+    def _maybe_compact(self):
+        with self._lock:
+            if self._compacting or time.monotonic() - self._last_compaction < self.compact_interval_seconds:
+                return
+            self._compacting = True
+        threading.Thread(target=self._compact_in_background, name='journal-compaction', daemon=True).start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception:
+            logger.exception('Verdichtung des Journals fehlgeschlagen')
+        finally:
+            self._last_compaction = time.monotonic()
+            self._compacting = False
+
+    def _coalesce(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fasst Autosave-Serien (gleiches Projekt, gleiche Person, gleiche Felder) zusammen.
+
+        Der zusammengefasste Eintrag steht an der Stelle des letzten Eintrags der Serie (``ts``
+        ist dessen Zeitpunkt, ``first_ts`` der Beginn), die Reihenfolge bleibt also zeitlich.
+        """
+        result: List[Optional[Dict[str, Any]]] = []
+        open_runs: Dict[tuple, int] = {}
+        window = timedelta(seconds=self.coalesce_seconds)
+        for record in records:
+            if record['kind'] != 'fields_written':
+                result.append(record)
+                continue
+            key = (record['project_id'], record.get('actor'), record.get('phase'),
+                   tuple(record.get('fields') or ()))
+            position = open_runs.get(key)
+            if position is not None:
+                previous = result[position]
+                if datetime.fromisoformat(record['ts']) - datetime.fromisoformat(previous['ts']) <= window:
+                    record = dict(record, count=previous.get('count', 1) + record.get('count', 1),
+                                  first_ts=previous.get('first_ts', previous['ts']))
+                    result[position] = None
+            open_runs[key] = len(result)
+            result.append(record)
+        return [record for record in result if record is not None]
+
+    def compact(self):
+        """Legt abgeschlossene Segmente zusammen, verdichtet sie und wendet die Aufbewahrungsfrist an."""
+        with open(os.path.join(self.directory, 'compact.lock'), 'ab') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # Verdichtet gerade ein anderer Prozess
+                    return
+            self._compact()
+
+    def _compact(self):
+        with self._locked(exclusive=False):
+            sealed = list(self._sealed)
+        expired = []
+        if self.retention_days is not None:
+            cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat(timespec='seconds')
+            expired = [segment for segment in sealed if segment.last_ts and segment.last_ts < cutoff]
+        # Zusammenhängende Folgen kleiner Segmente; große (bereits verdichtete) bleiben unverändert
+        runs: List[List[_Segment]] = [[]]
+        for segment in sealed:
+            if segment in expired or segment.size >= self.segment_max_bytes * 4:
+                runs.append([])
+            else:
+                runs[-1].append(segment)
+        merged = [(run, self._merge(run)) for run in runs if len(run) > 1]
+        with self._locked():
+            for segment in expired:
+                self._remove_segment(segment)
+            for run, target in merged:
+                for segment in run[1:]:
+                    self._remove_segment(segment)
+                os.replace(target.path, run[0].path)
+                target.path = run[0].path
+                target.save_index()
+                self._sealed[self._sealed.index(run[0])] = target
+        logger.info('Journal verdichtet: %d Segmente zusammengelegt, %d gelöscht',
+                    sum(len(run) for run, _ in merged), len(expired))
+
+    def _merge(self, run: List[_Segment]) -> _Segment:
+        records = []
+        for segment in run:
+            records.extend(segment.read(segment.offsets))
+        target = _Segment(f'{run[0].path}.{os.getpid()}.compact')
+        with open(target.path, 'wb') as stream:
+            for record in self._coalesce(records):
+                line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+                target.add(target.size, record, len(line))
+                stream.write(line)
+        return target
+
+    def _remove_segment(self, segment: _Segment):
+        self._sealed.remove(segment)
+        for path in (segment.path, segment.index_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,302 @@
+"""Laufzeitmessung je Rerun: Abschnitte, Datenbankabfragen, Diagramme, Widgets und Bytes.
+
+Jeder Durchlauf des Streamlit-Skripts (bzw. eines Fragments) erhält ein
+``RerunProfile``, das über eine ContextVar erreichbar ist. Abschnitte werden
+mit ``section('sidebar')`` gemessen, Datenbankabfragen über die
+Verbindungsklasse ``TimedConnection``, Diagramm-Neubauten über den
+``FigureCache``. Das kostet je Messpunkt nur einen ``perf_counter``-Aufruf.
+
+Nachrichten an den Browser (Anzahl, Widgets, Bytes) werden nur in einer
+Stichprobe der Durchläufe gezählt (``KVP_PROFILE_SAMPLE``, Standard 5 %),
+weil dafür jede Nachricht vermessen wird. Stichproben und langsame
+Durchläufe (``KVP_SLOW_RERUN_MS``) gehen als JSON-Zeile an den Logger
+``kvp.profile``; mit ``KVP_METRICS_FILE`` wird zusätzlich eine Textdatei im
+Prometheus-Format geschrieben (z. B. für den Textfile-Collector des
+node_exporter).
+"""
+
+import bisect
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger('kvp.profile')
+
+current_profile = ContextVar('kvp_profile', default=None)
+
+# Obergrenzen der Histogramm-Klassen in Sekunden
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Elementtypen, die Widgets sind (Feldnamen in ``Delta.new_element``)
+WIDGET_TYPES = frozenset({
+    'button', 'camera_input', 'chat_input', 'checkbox', 'color_picker', 'date_input', 'download_button',
+    'file_uploader', 'multiselect', 'number_input', 'radio', 'selectbox', 'slider', 'text_area',
+    'text_input', 'time_input',
+})
+
+
+class RerunProfile:
+    """Messwerte eines Durchlaufs; wird nur vom Skript-Thread beschrieben."""
+
+    def __init__(self, name: str, sampled: bool):
+        self.name = name
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.sections: Dict[str, List[float]] = {}
+        self._stack: List[str] = []
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.messages = 0
+        self.elements = 0
+        self.widgets = 0
+        self.bytes = 0
+
+    @contextmanager
+    def section(self, name: str) -> Iterator[None]:
+        self._stack.append(name)
+        path = '/'.join(self._stack)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._stack.pop()
+            entry = self.sections.setdefault(path, [0.0, 0])
+            entry[0] += elapsed
+            entry[1] += 1
+
+    def add_query(self, seconds: float):
+        self.queries += 1
+        self.query_seconds += seconds
+
+    def add_message(self, msg):
+        self.messages += 1
+        self.bytes += msg.ByteSize()
+        if msg.HasField('delta') and msg.delta.HasField('new_element'):
+            self.elements += 1
+            if msg.delta.new_element.WhichOneof('type') in WIDGET_TYPES:
+                self.widgets += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        record = {
+            'run': self.name,
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'duration_ms': round(self.duration * 1000, 1),
+            'sections': {path: {'ms': round(seconds * 1000, 1), 'calls': calls}
+                         for path, (seconds, calls) in self.sections.items()},
+            'queries': self.queries,
+            'query_ms': round(self.query_seconds * 1000, 1),
+        }
+        if self.sampled:
+            record.update(messages=self.messages, elements=self.elements, widgets=self.widgets, bytes=self.bytes)
+        return record
+
+
+@contextmanager
+def section(name: str) -> Iterator[None]:
+    """Misst einen Abschnitt des laufenden Durchlaufs; ohne aktives Profil ohne Wirkung."""
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+    with profile.section(name):
+        yield
+
+
+class TimedConnection(sqlite3.Connection):
+    """SQLite-Verbindung, die die Ausführungszeit jeder Anweisung dem aktiven Profil zurechnet."""
+
+    def execute(self, *args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return super().execute(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().execute(*args, **kwargs)
+        finally:
+            profile.add_query(time.perf_counter() - started)
+
+    def executemany(self, *args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return super().executemany(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().executemany(*args, **kwargs)
+        finally:
+            profile.add_query(time.perf_counter() - started)
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def quantile(self, q: float) -> float:
+        """Obergrenze der Klasse, in die das Quantil fällt (grobe Schätzung)."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (self.max,), self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Profiler:
+    """Prozessweite Sammelstelle; Durchläufe werden mit ``run()`` gemessen."""
+
+    def __init__(self, sample_rate: Optional[float] = None, slow_rerun_ms: Optional[float] = None,
+                 metrics_file: Optional[str] = None, metrics_interval_seconds: float = 15.0,
+                 keep_recent: int = 50):
+        env = os.environ
+        self.sample_rate = float(env.get('KVP_PROFILE_SAMPLE', 0.05)) if sample_rate is None else sample_rate
+        self.slow_rerun_ms = float(env.get('KVP_SLOW_RERUN_MS', 500)) if slow_rerun_ms is None else slow_rerun_ms
+        self.metrics_file = env.get('KVP_METRICS_FILE') if metrics_file is None else metrics_file
+        self.metrics_interval_seconds = metrics_interval_seconds
+        self._lock = threading.Lock()
+        self._runs: Dict[str, _Histogram] = defaultdict(_Histogram)
+        self._sections: Dict[str, _Histogram] = defaultdict(_Histogram)
+        self._counters: Dict[str, float] = defaultdict(float)
+        self.recent: deque = deque(maxlen=keep_recent)
+        self._metrics_written = 0.0
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def add_collector(self, collector: Callable[[], List[str]]):
+        """Weitere Zeilen für die Prometheus-Ausgabe (z. B. Cache-Statistik)."""
+        self._collectors.append(collector)
+
+    @contextmanager
+    def run(self, name: str) -> Iterator[RerunProfile]:
+        """Misst einen Durchlauf; innerhalb eines laufenden Profils nur als Abschnitt."""
+        outer = current_profile.get()
+        if outer is not None:
+            with outer.section(name):
+                yield outer
+            return
+        profile = RerunProfile(name, random.random() < self.sample_rate)
+        token = current_profile.set(profile)
+        restore = _count_messages(profile) if profile.sampled else None
+        try:
+            yield profile
+        finally:
+            profile.duration = time.perf_counter() - profile.started
+            if restore is not None:
+                restore()
+            current_profile.reset(token)
+            self._finish(profile)
+
+    def _finish(self, profile: RerunProfile):
+        record = profile.as_dict()
+        with self._lock:
+            self._runs[profile.name].observe(profile.duration)
+            for path, (seconds, _) in profile.sections.items():
+                self._sections[path].observe(seconds)
+            self._counters['queries'] += profile.queries
+            self._counters['query_seconds'] += profile.query_seconds
+            if profile.sampled:
+                self._counters['sampled_runs'] += 1
+                for key in ('messages', 'elements', 'widgets', 'bytes'):
+                    self._counters[key] += getattr(profile, key)
+            self.recent.append(record)
+        if profile.sampled or record['duration_ms'] >= self.slow_rerun_ms:
+            logger.info(json.dumps(record, ensure_ascii=False))
+        if self.metrics_file and time.monotonic() - self._metrics_written >= self.metrics_interval_seconds:
+            self._metrics_written = time.monotonic()
+            self.write_metrics_file()
+
+    # Auswertung
+    def last(self, name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for record in reversed(self.recent):
+                if name is None or record['run'] == name:
+                    return record
+        return None
+
+    def section_stats(self) -> List[Dict[str, Any]]:
+        """Aufrufe, Mittelwert, p95 (Klassenobergrenze) und Maximum je Abschnitt in ms, langsamste zuerst."""
+        with self._lock:
+            rows = [{'section': path, 'calls': hist.count, 'mean_ms': 1000 * hist.total / hist.count,
+                     'p95_ms': 1000 * hist.quantile(0.95), 'max_ms': 1000 * hist.max}
+                    for path, hist in self._sections.items()]
+        return sorted(rows, key=lambda row: row['mean_ms'], reverse=True)
+
+    def counters(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._counters)
+
+    def prometheus_text(self) -> str:
+        lines = []
+
+        def histogram(metric, label, hists):
+            lines.append(f'# TYPE {metric} histogram')
+            for value, hist in sorted(hists.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, hist.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{label}="{value}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{label}="{value}",le="+Inf"}} {hist.count}')
+                lines.append(f'{metric}_sum{{{label}="{value}"}} {hist.total:.6f}')
+                lines.append(f'{metric}_count{{{label}="{value}"}} {hist.count}')
+
+        with self._lock:
+            histogram('kvp_rerun_seconds', 'run', self._runs)
+            histogram('kvp_section_seconds', 'section', self._sections)
+            for key, value in sorted(self._counters.items()):
+                lines.append(f'# TYPE kvp_{key}_total counter')
+                lines.append(f'kvp_{key}_total {value:g}')
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+    def write_metrics_file(self, path: Optional[str] = None):
+        path = path or self.metrics_file
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as metrics_file:
+                metrics_file.write(self.prometheus_text())
+            os.replace(temp_path, path)
+        except OSError:
+            logger.exception('Metrikdatei %s konnte nicht geschrieben werden', path)
+
+
+def _count_messages(profile: RerunProfile):
+    """Zählt die Nachrichten des laufenden Streamlit-Durchlaufs; liefert eine Funktion zum Aufräumen."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx()
+    enqueue = getattr(ctx, '_enqueue', None)
+    if enqueue is None:
+        return None
+
+    def counting_enqueue(msg):
+        profile.add_message(msg)
+        enqueue(msg)
+
+    ctx._enqueue = counting_enqueue
+
+    def restore():
+        ctx._enqueue = enqueue
+    return restore
@@ -0,0 +1,216 @@
+"""Projektfortschritt und automatische Fortschreibung des Projektstatus.
+
+Der Fortschritt gewichtet die PDCA-Phasen nach ihrem Inhalt statt nach
+bloßem Vorhandensein eines Felds:
+
+* Plan: Anteil ausgefüllter Planungsfelder,
+* Do: Abschlussquote der Aufgaben (begonnene zählen halb) und Abdeckung der
+  geplanten Maßnahmen durch Aufgaben,
+* Check: Ergebnisbeschreibung und Zielerreichung der Messreihen mit Zielwert,
+* Act: Anteil ausgefüllter Standardisierungsfelder.
+
+Das Ergebnis liegt in ``projects.progress``. ``ProgressTracker`` rechnet in
+einem Hintergrund-Thread nur Projekte neu, die ein Änderungsereignis
+betrifft; noch nie berechnete Projekte (z. B. nach einem Import über die
+Kommandozeile) werden in Portionen nachgeholt. Der Hintergrunddienst
+(``kvp.worker``) rechnet zusätzlich die Projekte nach, die andere Prozesse
+geändert haben.
+"""
+
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, Optional
+
+from .storage import ChangeEvent, ProjectNotFound, ProjectStore, current_origin
+from .timeseries import metric_levels
+
+logger = logging.getLogger(__name__)
+
+PHASE_WEIGHTS = {'plan': 0.2, 'do': 0.4, 'check': 0.25, 'act': 0.15}
+PLAN_FIELDS = ('problem', 'goal', 'root_cause', 'measures')
+ACT_FIELDS = ('standardization', 'lessons_learned', 'next_steps')
+# Anteile innerhalb der Phasen
+DO_COMPLETION_SHARE = 0.8
+CHECK_ATTAINMENT_SHARE = 0.6
+# Änderungen an Name, Beschreibung oder Status ändern den Fortschritt nicht
+PROGRESS_EVENTS = frozenset({'project_saved', 'fields_written', 'task_added', 'task_updated', 'task_deleted',
+                             'metric_defined', 'metric_deleted', 'measurements_added'})
+
+
+def _filled(value) -> bool:
+    if isinstance(value, str):
+        return bool(value.strip())
+    return bool(value)
+
+
+def _share_filled(section: Dict[str, Any], fields) -> float:
+    return sum(_filled(section.get(field)) for field in fields) / len(fields)
+
+
+def attainment(baseline: float, current: float, target: float, lower_is_better: bool) -> float:
+    """Zurückgelegter Anteil des Wegs vom Ausgangsniveau zum Zielwert (0 bis 1)."""
+    if not lower_is_better:
+        baseline, current, target = -baseline, -current, -target
+    gap = baseline - target
+    if gap <= 0:
+        # Ziel lag schon zu Beginn nicht über dem Ausgangsniveau
+        return 1.0 if current <= target else 0.0
+    return min(max((baseline - current) / gap, 0.0), 1.0)
+
+
+def target_attainment(store: ProjectStore, project_id: str) -> Optional[float]:
+    """Mittlere Zielerreichung aller Messreihen mit Zielwert; ``None`` ohne solche Reihen."""
+    scores = []
+    for info in store.list_metrics(project_id):
+        if info['target'] is None or not info['count']:
+            continue
+        levels = metric_levels(store, project_id, info['metric'], info['first_ts'])
+        if levels is not None:
+            scores.append(attainment(*levels, info['target'], info['lower_is_better']))
+    return sum(scores) / len(scores) if scores else None
+
+
+def phase_scores(project: Dict[str, Any], task_counts: Dict[str, int],
+                 metric_attainment: Optional[float] = None) -> Dict[str, float]:
+    """Erfüllungsgrad je Phase zwischen 0 und 1."""
+    plan = project.get('plan') or {}
+    total = task_counts.get('total', 0)
+    if total:
+        completion = (task_counts.get('completed', 0) + 0.5 * task_counts.get('in_progress', 0)) / total
+        measures = [measure for measure in plan.get('measures') or [] if _filled(measure)]
+        # Abdeckung über die Anzahl angenähert: mindestens eine Aufgabe je geplanter Maßnahme
+        coverage = min(total / len(measures), 1.0) if measures else 1.0
+        do = DO_COMPLETION_SHARE * completion + (1 - DO_COMPLETION_SHARE) * coverage
+    else:
+        do = 0.0
+    results = float(_filled((project.get('check') or {}).get('results')))
+    if metric_attainment is None:
+        check = results
+    else:
+        check = (1 - CHECK_ATTAINMENT_SHARE) * results + CHECK_ATTAINMENT_SHARE * metric_attainment
+    return {'plan': _share_filled(plan, PLAN_FIELDS), 'do': do, 'check': check,
+            'act': _share_filled(project.get('act') or {}, ACT_FIELDS)}
+
+
+def compute_progress(project: Dict[str, Any], task_counts: Dict[str, int],
+                     metric_attainment: Optional[float] = None) -> float:
+    """Gewichteter Fortschritt in Prozent."""
+    scores = phase_scores(project, task_counts, metric_attainment)
+    return round(100 * sum(PHASE_WEIGHTS[phase] * score for phase, score in scores.items()), 1)
+
+
+def refresh_progress(store: ProjectStore, project_ids: Iterable[str]) -> Dict[str, float]:
+    """Berechnet den Fortschritt der Projekte neu und speichert ihn; gelöschte Projekte entfallen."""
+    project_ids = list(project_ids)
+    if not project_ids:
+        return {}
+    counts = defaultdict(Counter)
+    for row in store.iter_task_rows(project_ids):
+        counts[row['project_id']][row['status']] += 1
+    progress = {}
+    for project_id in project_ids:
+        try:
+            project = store.load_project(project_id, with_tasks=False)
+        except ProjectNotFound:
+            continue
+        task_counts = dict(counts[project_id], total=sum(counts[project_id].values()))
+        progress[project_id] = compute_progress(project, task_counts, target_attainment(store, project_id))
+    store.set_progress(progress)
+    return progress
+
+
+class ProgressTracker:
+    """Thread-sicher; eine Instanz pro Prozess, gepflegt über ``store.subscribe``.
+
+    ``start`` rechnet im Hintergrund nach, damit kein Rerun der Oberfläche darauf wartet.
+    """
+
+    def __init__(self, store: ProjectStore, backfill_batch: int = 200):
+        self._store = store
+        self._lock = threading.RLock()
+        self._dirty: Dict[str, None] = {}
+        self._backlog: Dict[str, None] = {}
+        self.backfill_batch = backfill_batch
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, interval_seconds: float = 1.0, origin: Optional[str] = None):
+        """Startet den Hintergrund-Thread; ``origin`` kennzeichnet seine Schreibzugriffe."""
+        def run():
+            current_origin.set(origin)
+            while not self._stop.is_set():
+                self._wake.wait(interval_seconds)
+                self._wake.clear()
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception('Fortschritt konnte nicht neu berechnet werden')
+
+        self._thread = threading.Thread(target=run, name='progress-tracker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def load(self):
+        with self._lock:
+            self._backlog = dict.fromkeys(self._store.projects_without_progress())
+
+    def apply(self, event: ChangeEvent):
+        if event.kind not in PROGRESS_EVENTS:
+            return
+        with self._lock:
+            # Neue Projekte (auch Massenimporte) laufen über den portionierten Rückstand,
+            # geänderte (auch Wiederherstellen und erneuter Import) sofort
+            created = event.kind == 'project_saved' and (event.data or {}).get('created', True)
+            target = self._backlog if created else self._dirty
+            target[event.project_id] = None
+        if not created:
+            self._wake.set()
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._dirty) + len(self._backlog)
+
+    def flush(self) -> Dict[str, float]:
+        """Rechnet alle geänderten Projekte und eine Portion des Rückstands neu."""
+        with self._lock:
+            project_ids = list(self._dirty)
+            self._dirty.clear()
+            for project_id in list(self._backlog)[:self.backfill_batch]:
+                del self._backlog[project_id]
+                project_ids.append(project_id)
+        return refresh_progress(self._store, project_ids)
+
+    def progress(self, project: Dict[str, Any]) -> float:
+        """Gespeicherter Fortschritt eines geladenen Projekts; fehlt er noch, wird er sofort berechnet."""
+        if project.get('progress') is not None:
+            return project['progress']
+        with self._lock:
+            self._backlog.pop(project['id'], None)
+        return refresh_progress(self._store, [project['id']]).get(project['id'], 0.0)
+
+
+def rolled_up_status(status: str, task_counts: Dict[str, Any]) -> Optional[str]:
+    """Projektstatus, der sich aus dem Aufgabenstand ergibt; ``None``, wenn er passt.
+
+    Alle Aufgaben erledigt -> ``completed``; wieder geöffnete Aufgabe in einem
+    abgeschlossenen Projekt oder begonnene Arbeit an einem Entwurf -> ``in_progress``.
+    """
+    total = task_counts.get('total', 0)
+    if not total:
+        return None
+    completed = task_counts.get('completed', 0)
+    if completed == total:
+        return 'completed' if status != 'completed' else None
+    if status == 'completed':
+        return 'in_progress'
+    if status == 'draft' and completed + task_counts.get('in_progress', 0):
+        return 'in_progress'
+    return None
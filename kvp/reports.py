@@ -0,0 +1,445 @@
+"""A3-Berichte je Projekt als HTML oder PDF, erzeugt in einem Prozesspool.
+
+Ein Bericht zeigt den PDCA-Zyklus eines Projekts auf A3 quer: Plan
+(Problem, Ziel, Ursache, Maßnahmen), Do (Aufgabentabelle), Check
+(Kennzahlen und die Diagramme des Dashboards, statisch über kaleido
+exportiert) und Act. Fertige Berichte liegen als Dateien unter
+``<cache_dir>/<projekt>/v<version>.<format>``; solange sich ein Projekt
+nicht ändert, wird der vorhandene Bericht ausgeliefert.
+
+Die Erzeugung läuft in eigenen Prozessen (``ReportPool``), nutzt also alle
+Kerne und blockiert die Oberfläche nicht. Sammelberichte, z. B. für ein
+Management-Review, auch ohne Oberfläche::
+
+    python -m kvp.reports berichte.zip --format pdf --status completed --workers 8
+
+PDF-Berichte benötigen reportlab, statische Diagramme kaleido. Ohne kaleido
+enthält der HTML-Bericht interaktive Diagramme, der PDF-Bericht keine.
+"""
+
+import argparse
+import base64
+import hashlib
+import html
+import importlib.util
+import io
+import os
+import re
+import sys
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import Future, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from . import charts
+from .storage import ProjectNotFound, ProjectStore, default_db_path
+from .timeseries import chart_series
+
+REPORT_FORMATS = ('html', 'pdf')
+# Aufgaben in der Tabelle; weitere werden nur gezählt
+MAX_REPORT_TASKS = 40
+CHART_WIDTH, CHART_HEIGHT = 900, 420
+STATUS_LABELS = {'draft': "Entwurf", 'in_progress': "In Bearbeitung", 'completed': "Abgeschlossen",
+                 'open': "Offen"}
+PLAN_FIELDS = (('problem', "Problem"), ('goal', "Ziel"), ('root_cause', "Ursache"), ('measures', "Maßnahmen"))
+ACT_FIELDS = (('standardization', "Standardisierung"), ('lessons_learned', "Lessons Learned"),
+              ('next_steps', "Nächste Schritte"))
+
+HTML_STYLE = """
+@page { size: A3 landscape; margin: 12mm; }
+body { font-family: Helvetica, Arial, sans-serif; font-size: 11pt; color: #2c3e50; margin: 0; }
+header { display: flex; justify-content: space-between; align-items: baseline;
+         border-bottom: 3px solid #45B7D1; margin-bottom: 8mm; }
+header h1 { margin: 0 0 2mm 0; font-size: 20pt; }
+.grid { display: grid; grid-template-columns: 1fr 1fr; gap: 6mm; }
+section { border-left: 5px solid; padding: 2mm 4mm; break-inside: avoid; }
+section h2 { margin: 0 0 3mm 0; font-size: 14pt; }
+.plan { border-color: #FF6B6B; } .do { border-color: #4ECDC4; }
+.check { border-color: #45B7D1; } .act { border-color: #96CEB4; }
+dt { font-weight: bold; margin-top: 2mm; } dd { margin: 0 0 0 0; }
+table { border-collapse: collapse; width: 100%; font-size: 9pt; }
+th, td { border-bottom: 1px solid #ddd; padding: 1mm 2mm; text-align: left; }
+img { max-width: 100%; }
+footer { margin-top: 6mm; font-size: 8pt; color: #7f8c8d; }
+"""
+
+
+def default_report_dir(db_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'reports')
+
+
+def static_charts_available() -> bool:
+    return importlib.util.find_spec('kaleido') is not None
+
+
+def _safe_name(value: str) -> str:
+    """Dateinamen-taugliche Kennung (IDs aus Importen können beliebige Zeichen enthalten)."""
+    if re.fullmatch(r'[\w-]{1,64}', value):
+        return value
+    return hashlib.blake2b(value.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def _text(value) -> str:
+    if isinstance(value, list):
+        return ', '.join(str(item) for item in value)
+    return '' if value is None else str(value)
+
+
+# Inhalt
+def report_data(store: ProjectStore, project_id: str) -> Dict[str, Any]:
+    """Alles, was ein Bericht zeigt: Projekt samt Aufgaben, Statuszählung und Messreihen."""
+    project = store.load_project(project_id)
+    tasks = (project.get('do') or {}).get('implementation_steps', [])
+    metrics = []
+    for info in store.list_metrics(project_id):
+        if info['count']:
+            metrics.append((info, chart_series(store, project_id, info['metric'], buckets=200,
+                                               rolling_window_seconds=7 * 86400)))
+    return {'project': project, 'tasks': tasks, 'status_counts': dict(Counter(task['status'] for task in tasks)),
+            'metrics': metrics}
+
+
+def report_figures(data: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """Die Dashboard-Diagramme des Projekts als ``(titel, figure)``."""
+    project = data['project']
+    figures = []
+    if data['status_counts']:
+        figures.append(("Aufgabenstatus", charts.status_pie(data['status_counts'])))
+    for info, series in data['metrics']:
+        figures.append((info['metric'], charts.metric_series_chart(
+            series, info['metric'], info['unit'], info['target'],
+            key=[project['id'], info['metric'], project.get('version'), 'report'])))
+    check_metrics = (project.get('check') or {}).get('metrics') or {}
+    if not data['metrics'] and 'wartezeit_vorher' in check_metrics:
+        figures.append(("Vorher/Nachher", charts.before_after_bar(
+            check_metrics.get('wartezeit_vorher', 0), check_metrics.get('wartezeit_nachher', 0))))
+    return figures
+
+
+def figure_images(figures: List[Tuple[str, Any]]) -> List[Tuple[str, bytes]]:
+    """PNG-Export der Diagramme; leer, wenn kaleido fehlt."""
+    if not static_charts_available():
+        return []
+    return [(title, figure.to_image(format='png', width=CHART_WIDTH, height=CHART_HEIGHT, scale=2))
+            for title, figure in figures]
+
+
+# HTML
+def render_html(data: Dict[str, Any], figures: List[Tuple[str, Any]], images: List[Tuple[str, bytes]]) -> str:
+    project = data['project']
+
+    def esc(value):
+        return html.escape(_text(value)).replace('\n', '<br>')
+
+    def fields(phase, labels):
+        values = project.get(phase) or {}
+        items = [f'<dt>{label}</dt><dd>{esc(values.get(field)) or "–"}</dd>' for field, label in labels]
+        return '<dl>' + ''.join(items) + '</dl>'
+
+    rows = ''.join(
+        f"<tr><td>{esc(task.get('task'))}</td><td>{esc(task.get('responsible'))}</td>"
+        f"<td>{esc(task.get('due_date'))}</td><td>{esc(STATUS_LABELS.get(task.get('status'), task.get('status')))}</td></tr>"
+        for task in data['tasks'][:MAX_REPORT_TASKS])
+    more = len(data['tasks']) - MAX_REPORT_TASKS
+    counts = ', '.join(f"{STATUS_LABELS.get(status, status)}: {n}" for status, n in data['status_counts'].items())
+
+    check = project.get('check') or {}
+    metric_items = ''.join(f'<dt>{esc(name)}</dt><dd>{esc(value)}</dd>'
+                           for name, value in (check.get('metrics') or {}).items())
+    if images:
+        chart_html = ''.join(f'<img alt="{esc(title)}" src="data:image/png;base64,'
+                             f'{base64.b64encode(png).decode("ascii")}">' for title, png in images)
+    else:
+        chart_html = ''.join(figure.to_html(full_html=False, include_plotlyjs='cdn' if position == 0 else False,
+                                            default_width='100%', default_height=f'{CHART_HEIGHT}px')
+                             for position, (_, figure) in enumerate(figures))
+
+    return f"""<!DOCTYPE html>
+<html lang="de"><head><meta charset="utf-8"><title>A3-Bericht: {esc(project['name'])}</title>
+<style>{HTML_STYLE}</style></head>
+<body>
+<header><h1>{esc(project['name'])}</h1>
+<div>{esc(STATUS_LABELS.get(project['status'], project['status']))} · Fortschritt
+{'–' if project.get('progress') is None else f"{project['progress']:.0f} %"} · angelegt {esc(project.get('created_date'))}</div>
+</header>
+<p>{esc(project.get('description'))}</p>
+<div class="grid">
+<section class="plan"><h2>📋 Plan</h2>{fields('plan', PLAN_FIELDS)}</section>
+<section class="do"><h2>🔨 Do</h2><p>{counts or 'Keine Aufgaben'}</p>
+<table><thead><tr><th>Aufgabe</th><th>Verantwortlich</th><th>Fällig</th><th>Status</th></tr></thead>
+<tbody>{rows}</tbody></table>{f'<p>… und {more} weitere Aufgaben</p>' if more > 0 else ''}</section>
+<section class="check"><h2>📊 Check</h2><dl>{metric_items}</dl><p>{esc(check.get('results'))}</p>{chart_html}</section>
+<section class="act"><h2>🎯 Act</h2>{fields('act', ACT_FIELDS)}</section>
+</div>
+<footer>Version {project.get('version')} · erstellt {datetime.now():%d.%m.%Y %H:%M}</footer>
+</body></html>
+"""
+
+
+# PDF
+def render_pdf(data: Dict[str, Any], images: List[Tuple[str, bytes]]) -> bytes:
+    try:
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A3, landscape
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.units import mm
+        from reportlab.platypus import (BaseDocTemplate, Frame, FrameBreak, Image, PageTemplate, Paragraph,
+                                        Spacer, Table, TableStyle)
+    except ImportError as exc:
+        raise RuntimeError('Für PDF-Berichte wird reportlab benötigt (pip install reportlab).') from exc
+
+    project = data['project']
+    styles = getSampleStyleSheet()
+
+    def esc(value):
+        return html.escape(_text(value)).replace('\n', '<br/>')
+    buffer = io.BytesIO()
+    page_width, page_height = landscape(A3)
+    margin, gap, header = 12 * mm, 8 * mm, 22 * mm
+    column_width = (page_width - 2 * margin - gap) / 2
+    column_height = page_height - 2 * margin - header
+    frames = [Frame(margin + column * (column_width + gap), margin, column_width, column_height,
+                    id=f'column{column}') for column in range(2)]
+
+    def draw_header(canvas, doc):
+        canvas.saveState()
+        canvas.setFont('Helvetica-Bold', 20)
+        canvas.drawString(margin, page_height - margin - 8 * mm, project['name'][:90])
+        canvas.setFont('Helvetica', 10)
+        progress = '–' if project.get('progress') is None else f"{project['progress']:.0f} %"
+        canvas.drawString(margin, page_height - margin - 15 * mm,
+                          f"{STATUS_LABELS.get(project['status'], project['status'])} · Fortschritt {progress} · "
+                          f"angelegt {project.get('created_date')} · Version {project.get('version')} · "
+                          f"Seite {doc.page}")
+        canvas.setStrokeColor(colors.HexColor('#45B7D1'))
+        canvas.setLineWidth(2)
+        canvas.line(margin, page_height - margin - 18 * mm, page_width - margin, page_height - margin - 18 * mm)
+        canvas.restoreState()
+
+    doc = BaseDocTemplate(buffer, pagesize=(page_width, page_height), title=f"A3-Bericht: {project['name']}",
+                          leftMargin=margin, rightMargin=margin, topMargin=margin, bottomMargin=margin)
+    doc.addPageTemplates([PageTemplate(id='a3', frames=frames, onPage=draw_header)])
+
+    def heading(text):
+        return Paragraph(text, styles['Heading2'])
+
+    def fields(phase, labels):
+        values = project.get(phase) or {}
+        return [Paragraph(f'<b>{label}:</b> {esc(values.get(field)) or "–"}', styles['BodyText'])
+                for field, label in labels]
+
+    story = [heading("Plan"), *fields('plan', PLAN_FIELDS), Spacer(0, 6 * mm), heading("Do")]
+    counts = ', '.join(f"{STATUS_LABELS.get(status, status)}: {n}" for status, n in data['status_counts'].items())
+    story.append(Paragraph(counts or "Keine Aufgaben", styles['BodyText']))
+    if data['tasks']:
+        cell = styles['BodyText'].clone('cell', fontSize=8, leading=10)
+        rows = [["Aufgabe", "Verantwortlich", "Fällig", "Status"]]
+        rows += [[Paragraph(esc(task.get('task')), cell), Paragraph(esc(task.get('responsible')), cell),
+                  esc(task.get('due_date')), STATUS_LABELS.get(task.get('status'), task.get('status'))]
+                 for task in data['tasks'][:MAX_REPORT_TASKS]]
+        table = Table(rows, colWidths=[column_width * share for share in (0.5, 0.22, 0.13, 0.15)], repeatRows=1)
+        table.setStyle(TableStyle([
+            ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 8), ('FONT', (0, 1), (-1, -1), 'Helvetica', 8),
+            ('LINEBELOW', (0, 0), (-1, -1), 0.25, colors.HexColor('#dddddd')), ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]))
+        story.append(table)
+        if len(data['tasks']) > MAX_REPORT_TASKS:
+            story.append(Paragraph(f"… und {len(data['tasks']) - MAX_REPORT_TASKS} weitere Aufgaben",
+                                   styles['BodyText']))
+
+    check = project.get('check') or {}
+    story += [FrameBreak(), heading("Check")]
+    story += [Paragraph(f'<b>{esc(name)}:</b> {esc(value)}', styles['BodyText'])
+              for name, value in (check.get('metrics') or {}).items()]
+    if check.get('results'):
+        story.append(Paragraph(esc(check['results']), styles['BodyText']))
+    for _, png in images:
+        story.append(Image(io.BytesIO(png), width=column_width, height=column_width * CHART_HEIGHT / CHART_WIDTH))
+    if not images and (data['status_counts'] or data['metrics']):
+        story.append(Paragraph("<i>Diagramme benötigen kaleido (pip install kaleido).</i>", styles['BodyText']))
+    story += [Spacer(0, 6 * mm), heading("Act"), *fields('act', ACT_FIELDS)]
+    doc.build(story)
+    return buffer.getvalue()
+
+
+# Ablage der fertigen Berichte
+class ReportCache:
+    """Berichte je Projekt und Version als Dateien; von allen Prozessen gemeinsam genutzt."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, project_id: str, version: int, fmt: str) -> str:
+        return os.path.join(self.directory, _safe_name(project_id), f'v{version}.{fmt}')
+
+    def get(self, project_id: str, version: int, fmt: str) -> Optional[str]:
+        path = self.path(project_id, version, fmt)
+        return path if os.path.exists(path) else None
+
+    def put(self, project_id: str, version: int, fmt: str, content: bytes) -> str:
+        path = self.path(project_id, version, fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as report_file:
+            report_file.write(content)
+        os.replace(temp_path, path)
+        # Ältere Fassungen desselben Formats werden nicht mehr gebraucht
+        for name in os.listdir(os.path.dirname(path)):
+            if name.endswith(f'.{fmt}') and os.path.join(os.path.dirname(path), name) != path:
+                try:
+                    os.remove(os.path.join(os.path.dirname(path), name))
+                except OSError:
+                    pass
+        return path
+
+
+def build_report(store: ProjectStore, cache: ReportCache, project_id: str, fmt: str) -> Dict[str, Any]:
+    """Erzeugt einen Bericht oder liefert den vorhandenen; ``{project_id, name, path, cached}``."""
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f'Unbekanntes Berichtsformat: {fmt}')
+    version = store.project_version(project_id)
+    if version is None:
+        raise ProjectNotFound(project_id)
+    cached = cache.get(project_id, version, fmt)
+    if cached:
+        return {'project_id': project_id, 'name': store.project_name(project_id), 'path': cached, 'cached': True}
+    data = report_data(store, project_id)
+    figures = report_figures(data)
+    images = figure_images(figures)
+    if fmt == 'pdf':
+        content = render_pdf(data, images)
+    else:
+        content = render_html(data, figures, images).encode('utf-8')
+    # Version des tatsächlich gelesenen Stands
+    path = cache.put(project_id, data['project']['version'], fmt, content)
+    return {'project_id': project_id, 'name': data['project']['name'], 'path': path, 'cached': False}
+
+
+# Prozesspool
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(db_path: str, cache_dir: str):
+    _worker['store'] = ProjectStore(db_path)
+    _worker['cache'] = ReportCache(cache_dir)
+
+
+def _build_in_worker(project_id: str, fmt: str) -> Dict[str, Any]:
+    return build_report(_worker['store'], _worker['cache'], project_id, fmt)
+
+
+class ReportBatch:
+    """Laufender Auftrag über ein oder mehrere Projekte; wird abgefragt, nicht abgewartet."""
+
+    def __init__(self, fmt: str, futures: Dict[Future, str]):
+        self.fmt = fmt
+        self.futures = futures
+        self.started = time.monotonic()
+
+    @property
+    def total(self) -> int:
+        return len(self.futures)
+
+    @property
+    def done(self) -> int:
+        return sum(future.done() for future in self.futures)
+
+    @property
+    def finished(self) -> bool:
+        return all(future.done() for future in self.futures)
+
+    def results(self) -> List[Dict[str, Any]]:
+        return [future.result() for future in self.futures
+                if future.done() and not future.cancelled() and future.exception() is None]
+
+    def errors(self) -> Dict[str, str]:
+        return {project_id: str(future.exception()) for future, project_id in self.futures.items()
+                if future.done() and not future.cancelled() and future.exception() is not None}
+
+    def cancel(self):
+        for future in self.futures:
+            future.cancel()
+
+    def write_zip(self, path: str) -> str:
+        """Fasst die fertigen Berichte in einer ZIP-Datei zusammen (ein Eintrag je Projekt)."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        used = Counter()
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for result in sorted(self.results(), key=lambda result: result['name'] or ''):
+                stem = re.sub(r'[^\w.-]+', '_', result['name'] or result['project_id']).strip('_')[:80] or 'projekt'
+                used[stem] += 1
+                suffix = f'_{used[stem]}' if used[stem] > 1 else ''
+                archive.write(result['path'], f'{stem}{suffix}.{self.fmt}')
+        return path
+
+
+class ReportPool:
+    """Prozessweiter Pool für Berichte; vorhandene Berichte werden ohne Umweg über den Pool geliefert."""
+
+    def __init__(self, db_path: str, cache_dir: Optional[str] = None, workers: Optional[int] = None):
+        # Erst hier importiert: die Oberfläche lädt das Modul bei jedem Start, den Pool erst bei Bedarf
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.store = ProjectStore(db_path)
+        self.cache = ReportCache(cache_dir or default_report_dir(db_path))
+        # spawn statt fork: der aufrufende Prozess (z. B. Streamlit) hat bereits Threads
+        self._executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                             mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_init_worker, initargs=(db_path, self.cache.directory))
+
+    def submit(self, project_ids: Sequence[str], fmt: str) -> ReportBatch:
+        if fmt not in REPORT_FORMATS:
+            raise ValueError(f'Unbekanntes Berichtsformat: {fmt}')
+        futures: Dict[Future, str] = {}
+        for project_id in project_ids:
+            version = self.store.project_version(project_id)
+            cached = None if version is None else self.cache.get(project_id, version, fmt)
+            if cached:
+                future: Future = Future()
+                future.set_result({'project_id': project_id, 'name': self.store.project_name(project_id),
+                                   'path': cached, 'cached': True})
+            else:
+                future = self._executor.submit(_build_in_worker, project_id, fmt)
+            futures[future] = project_id
+        return ReportBatch(fmt, futures)
+
+    def shutdown(self):
+        if sys.version_info >= (3, 9):
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            self._executor.shutdown(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='A3-Berichte für viele KVP-Projekte')
+    parser.add_argument('target', help='ZIP-Datei mit allen Berichten')
+    parser.add_argument('--db', default=default_db_path(), help='SQLite-Datenbank')
+    parser.add_argument('--format', choices=REPORT_FORMATS, default='pdf')
+    parser.add_argument('--status', action='append', help='Nur Projekte mit diesem Status (mehrfach möglich)')
+    parser.add_argument('--workers', type=int, default=None, help='Prozesse (Standard: alle Kerne)')
+    parser.add_argument('--cache-dir', default=None, help='Ablage der Einzelberichte')
+    args = parser.parse_args(argv)
+
+    pool = ReportPool(args.db, args.cache_dir, args.workers)
+    project_ids = [project['id'] for project in pool.store.list_projects()
+                   if not args.status or project['status'] in args.status]
+    started = time.perf_counter()
+    batch = pool.submit(project_ids, args.format)
+    for done, _ in enumerate(as_completed(batch.futures), start=1):
+        if done % 50 == 0 or done == batch.total:
+            print(f'{done}/{batch.total} Berichte ({time.perf_counter() - started:.1f} s)', file=sys.stderr)
+    pool.shutdown()
+    batch.write_zip(args.target)
+    cached = sum(result['cached'] for result in batch.results())
+    print(f'{len(batch.results())} Berichte nach {args.target} ({cached} unverändert übernommen, '
+          f'{time.perf_counter() - started:.1f} s)')
+    for project_id, error in batch.errors().items():
+        print(f'Fehler bei {project_id}: {error}', file=sys.stderr)
+    return 1 if batch.errors() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
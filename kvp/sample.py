@@ -0,0 +1,118 @@
+"""Beispielprojekt und synthetische Portfolios (z. B. für Benchmarks).
+
+``generate_portfolio`` erzeugt beliebig viele Projekte im Format von
+``create_sample_project()``; mit gleichem ``seed`` entsteht immer dasselbe
+Portfolio.
+"""
+
+import random
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, Optional
+
+TOPICS = [
+    ('Wartezeiten', 'Produktion', 'min'), ('Rüstzeiten', 'Montage', 'min'), ('Ausschuss', 'Fertigung', '%'),
+    ('Durchlaufzeit', 'Logistik', 'h'), ('Reklamationen', 'Qualität', 'Stück'), ('Suchzeiten', 'Lager', 'min'),
+    ('Energieverbrauch', 'Instandhaltung', 'kWh'), ('Bestände', 'Einkauf', 'Stück'),
+]
+MEASURES = ['Prozessanalyse', 'Wertstromanalyse', '5S-Workshop', 'Schulung', 'Kanban einführen',
+            'SMED-Workshop', 'Standardarbeitsblatt', 'Visualisierung', 'Poka-Yoke', 'Layout anpassen']
+TASK_VERBS = ['analysieren', 'dokumentieren', 'umsetzen', 'prüfen', 'abstimmen', 'schulen', 'messen']
+PEOPLE = ['Max Mustermann', 'Anna Schmidt', 'Tom Weber', 'Lena Fischer', 'Jonas Becker', 'Sara Wolf',
+          'Paul Hoffmann', 'Mia Schulz', '']
+PROJECT_STATUS_WEIGHTS = {'draft': 0.2, 'in_progress': 0.6, 'completed': 0.2}
+TASK_STATUS_WEIGHTS = {'open': 0.4, 'in_progress': 0.3, 'completed': 0.3}
+
+
+# Beispieldaten erstellen
+def create_sample_project():
+    sample_id = str(uuid.uuid4())
+    return {
+        'id': sample_id,
+        'name': 'Beispiel: Reduzierung der Wartezeiten',
+        'description': 'Wartezeiten in der Produktion um 30% reduzieren',
+        'created_date': datetime.now().strftime('%Y-%m-%d'),
+        'status': 'in_progress',
+        'plan': {
+            'problem': 'Lange Wartezeiten zwischen Produktionsschritten',
+            'goal': 'Wartezeiten um 30% reduzieren',
+            'root_cause': 'Unausgewogene Maschinenkapazitäten',
+            'measures': ['Maschinenanalyse', 'Prozessoptimierung', 'Schulung']
+        },
+        'do': {
+            'implementation_steps': [
+                {'id': str(uuid.uuid4()), 'task': 'Maschinenauslastung analysieren', 'responsible': 'Max Mustermann', 'due_date': '2024-07-15', 'status': 'completed'},
+                {'id': str(uuid.uuid4()), 'task': 'Engpässe identifizieren', 'responsible': 'Anna Schmidt', 'due_date': '2024-07-20', 'status': 'in_progress'},
+                {'id': str(uuid.uuid4()), 'task': 'Optimierungsmaßnahmen implementieren', 'responsible': 'Tom Weber', 'due_date': '2024-07-30', 'status': 'open'}
+            ]
+        },
+        'check': {
+            'metrics': {'wartezeit_vorher': 45, 'wartezeit_nachher': 32, 'verbesserung_prozent': 28.9},
+            'results': 'Wartezeiten konnten um 28.9% reduziert werden'
+        },
+        'act': {
+            'standardization': 'Neue Arbeitsanweisungen erstellt',
+            'lessons_learned': 'Regelmäßige Kapazitätsanalyse ist essentiell',
+            'next_steps': 'Ausweitung auf andere Produktionslinien'
+        }
+    }
+
+
+def _choice(rng: random.Random, weights: Dict[str, float]) -> str:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def generate_project(rng: random.Random, number: int, tasks: int = 20, today: Optional[date] = None,
+                     text_length: int = 1) -> Dict[str, Any]:
+    """Ein synthetisches Projekt; ``text_length`` vervielfacht die Freitexte (große Projekte)."""
+    today = today or date.today()
+    topic, area, unit = rng.choice(TOPICS)
+    status = _choice(rng, PROJECT_STATUS_WEIGHTS)
+    created = today - timedelta(days=rng.randint(0, 365))
+    before = round(rng.uniform(20, 120), 1)
+    after = round(before * rng.uniform(0.5, 1.05), 1)
+    steps = []
+    for position in range(tasks):
+        task_status = 'completed' if status == 'completed' else _choice(rng, TASK_STATUS_WEIGHTS)
+        steps.append({
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'task': f'{rng.choice(MEASURES)} {rng.choice(TASK_VERBS)} ({position + 1})',
+            'responsible': rng.choice(PEOPLE),
+            'due_date': (created + timedelta(days=rng.randint(7, 180))).isoformat(),
+            'status': task_status,
+            'priority': rng.choice(['low', 'medium', 'high']),
+        })
+    filled = status != 'draft'
+    return {
+        'id': str(uuid.UUID(int=rng.getrandbits(128))),
+        'name': f'{topic} {area} #{number}',
+        'description': f'{topic} im Bereich {area} reduzieren',
+        'created_date': created.isoformat(),
+        'status': status,
+        'plan': {
+            'problem': ' '.join([f'Zu hohe {topic} im Bereich {area}.'] * text_length),
+            'goal': f'{topic} um {rng.randint(10, 50)}% reduzieren',
+            'root_cause': ' '.join(['Fehlende Standards und unklare Zuständigkeiten.'] * text_length),
+            'measures': rng.sample(MEASURES, rng.randint(2, 5)),
+        },
+        'do': {'implementation_steps': steps},
+        'check': {
+            'metrics': {'wartezeit_vorher': before, 'wartezeit_nachher': after,
+                        'verbesserung_prozent': round(100 * (before - after) / before, 1)},
+            'results': f'{topic} von {before} auf {after} {unit} gesenkt' if filled else '',
+        },
+        'act': {
+            'standardization': 'Arbeitsanweisung aktualisiert' if status == 'completed' else '',
+            'lessons_learned': ' '.join(['Frühzeitige Einbindung der Mitarbeitenden lohnt sich.'] * text_length)
+            if filled else '',
+            'next_steps': '',
+        },
+    }
+
+
+def generate_portfolio(projects: int, tasks: int = 20, seed: int = 42, today: Optional[date] = None,
+                       text_length: int = 1) -> Iterator[Dict[str, Any]]:
+    """Erzeugt ``projects`` Projekte mit je ``tasks`` Aufgaben, ohne sie im Speicher zu halten."""
+    rng = random.Random(seed)
+    for number in range(1, projects + 1):
+        yield generate_project(rng, number, tasks, today, text_length)
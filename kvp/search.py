@@ -0,0 +1,278 @@
+"""Volltextsuche über Projekte, PDCA-Texte und Aufgaben.
+
+Invertierter Index im Speicher: Begriff -> {Projekt-ID: gewichtete Häufigkeit}.
+Texte werden kleingeschrieben, Umlaute gefaltet (ä -> ae, ß -> ss), deutsche
+Stoppwörter entfernt und Endungen leicht gekürzt, damit z. B. "Wartezeit" und
+"Wartezeiten" denselben Begriff ergeben. Die Trefferliste wird nach BM25
+sortiert; das letzte Suchwort gilt als Präfix (Suche während der Eingabe).
+
+Der Index wird einmal aus der Datenbank aufgebaut und danach über die
+Änderungsereignisse der Ablage feldweise nachgeführt.
+"""
+
+import bisect
+import functools
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import AbstractSet, Any, Dict, List, NamedTuple, Optional
+
+from .storage import ChangeEvent, ProjectNotFound
+
+# (Phase, Feld) der PDCA-Abschnitte, die durchsucht werden
+SEARCH_SECTION_FIELDS = (
+    ('plan', 'problem'), ('plan', 'goal'), ('plan', 'root_cause'), ('plan', 'measures'),
+    ('check', 'results'), ('act', 'lessons_learned'),
+)
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'description': 2.0,
+    'plan.problem': 1.5,
+    'plan.goal': 1.5,
+    'act.lessons_learned': 1.5,
+}
+FIELD_LABELS = {
+    'name': "Name",
+    'description': "Beschreibung",
+    'plan.problem': "Problem",
+    'plan.goal': "Ziel",
+    'plan.root_cause': "Ursache",
+    'plan.measures': "Maßnahmen",
+    'check.results': "Ergebnisse",
+    'act.lessons_learned': "Lessons Learned",
+    'task': "Aufgabe",
+}
+
+STOPWORDS = frozenset("""
+aber alle allem allen aller alles als also am an ans auch auf aus bei beim bin bis bist da
+damit dann das dass dem den denn der des die dies diese diesem diesen dieser dieses doch dort
+du durch ein eine einem einen einer eines er es etwa euer fuer hat hatte hier ich ihr im in
+ins ist ja jede jedem jeden jeder jedes kann kein keine man mehr mit nach nicht noch nun nur
+ob oder ohne sehr sein sich sie sind so soll sollen sowie ueber um und uns unter vom von vor
+war waren was weil wenn wer werden wie wir wird wo zu zum zur
+""".split())
+_FOLDING = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+_WORD = re.compile(r'\w+')
+_SUFFIXES = ('ern', 'em', 'en', 'er', 'es', 'e', 's', 'n')
+
+# BM25-Parameter
+K1 = 1.2
+B = 0.75
+
+
+def fold(text: str) -> str:
+    text = text.lower()
+    return text if text.isascii() else text.translate(_FOLDING)
+
+
+@functools.lru_cache(maxsize=100000)
+def stem(word: str) -> str:
+    """Sehr leichte Endungskürzung; lässt kurze Wörter und Zahlen unverändert."""
+    if word.isdigit():
+        return word
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem(word) for word in _WORD.findall(fold(text))
+            if len(word) > 1 and word not in STOPWORDS]
+
+
+def _as_text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return ' '.join(str(item) for item in value)
+    if isinstance(value, dict):
+        return ''
+    return str(value)
+
+
+def _weight(key: str) -> float:
+    return FIELD_WEIGHTS.get(key, 1.0)
+
+
+class SearchHit(NamedTuple):
+    project_id: str
+    name: str
+    score: float
+    fields: List[str]
+
+
+class SearchIndex:
+    """Thread-sicher; eine Instanz pro Prozess, gepflegt über ``store.subscribe``."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._terms: List[str] = []
+        self._fields: Dict[str, Dict[str, Counter]] = defaultdict(dict)
+        self._lengths: Dict[str, float] = {}
+        self._total_length = 0.0
+        self._names: Dict[str, str] = {}
+
+    @classmethod
+    def build(cls, store) -> 'SearchIndex':
+        index = cls()
+        index.load(store)
+        return index
+
+    def load(self, store):
+        with self._lock:
+            self._reset()
+            for project_id, key, value in store.iter_search_texts(SEARCH_SECTION_FIELDS):
+                self._set_field(project_id, key, value)
+
+    def reload_projects(self, store, project_ids):
+        """Liest einzelne Projekte neu ein, z. B. nach Änderungen aus einem anderen Prozess."""
+        for project_id in project_ids:
+            try:
+                project = store.load_project(project_id)
+            except ProjectNotFound:
+                with self._lock:
+                    self._remove_project(project_id)
+                continue
+            with self._lock:
+                self._index_project(project)
+
+    def __len__(self):
+        return len(self._lengths)
+
+    # Pflege
+    def _set_field(self, project_id: str, key: str, value):
+        if key == 'name':
+            self._names[project_id] = _as_text(value)
+        old = self._fields[project_id].pop(key, None)
+        new = Counter(tokenize(_as_text(value)))
+        if old == new:
+            if new:
+                self._fields[project_id][key] = new
+            return
+        weight = _weight(key.split(':')[0])
+        if old:
+            self._add_counts(project_id, old, -weight)
+        if new:
+            self._fields[project_id][key] = new
+            self._add_counts(project_id, new, weight)
+
+    def _add_counts(self, project_id, counts: Counter, weight: float):
+        postings = self._postings
+        for term, count in counts.items():
+            docs = postings[term]
+            if not docs:
+                bisect.insort(self._terms, term)
+            value = docs.get(project_id, 0.0) + weight * count
+            if value > 1e-9:
+                docs[project_id] = value
+            else:
+                docs.pop(project_id, None)
+                if not docs:
+                    del postings[term]
+                    position = bisect.bisect_left(self._terms, term)
+                    if position < len(self._terms) and self._terms[position] == term:
+                        del self._terms[position]
+        delta = weight * sum(counts.values())
+        self._lengths[project_id] = self._lengths.get(project_id, 0.0) + delta
+        self._total_length += delta
+
+    def _remove_project(self, project_id: str):
+        for key in list(self._fields.get(project_id, ())):
+            self._set_field(project_id, key, None)
+        self._fields.pop(project_id, None)
+        self._total_length -= self._lengths.pop(project_id, 0.0)
+        self._names.pop(project_id, None)
+
+    def _index_project(self, project: Dict[str, Any]):
+        project_id = project['id']
+        self._remove_project(project_id)
+        self._set_field(project_id, 'name', project.get('name'))
+        self._set_field(project_id, 'description', project.get('description'))
+        for phase, field in SEARCH_SECTION_FIELDS:
+            self._set_field(project_id, f'{phase}.{field}', (project.get(phase) or {}).get(field))
+        for task in (project.get('do') or {}).get('implementation_steps', []):
+            self._set_field(project_id, f"task:{task['id']}", task.get('task'))
+
+    def apply(self, event: ChangeEvent):
+        data = event.data or {}
+        with self._lock:
+            if event.kind == 'project_saved':
+                self._index_project(data)
+            elif event.kind == 'project_deleted':
+                self._remove_project(event.project_id)
+            elif event.kind == 'project_updated':
+                for key in ('name', 'description'):
+                    if key in data:
+                        self._set_field(event.project_id, key, data[key])
+            elif event.kind == 'fields_written':
+                for field, value in data.get('fields', {}).items():
+                    if (data.get('phase'), field) in SEARCH_SECTION_FIELDS:
+                        self._set_field(event.project_id, f"{data['phase']}.{field}", value)
+            elif event.kind in ('task_added', 'task_updated'):
+                if 'task' in data:
+                    self._set_field(event.project_id, f'task:{event.task_id}', data['task'])
+            elif event.kind == 'task_deleted':
+                self._set_field(event.project_id, f'task:{event.task_id}', None)
+
+    # Suche
+    def _expand(self, term: str, prefix: bool) -> List[str]:
+        if not prefix:
+            return [term] if term in self._postings else []
+        start = bisect.bisect_left(self._terms, term)
+        end = bisect.bisect_left(self._terms, term + '\uffff')
+        return self._terms[start:end]
+
+    def search(self, query: str, limit: int = 10, prefix: bool = True,
+               project_ids: Optional[AbstractSet[str]] = None) -> List[SearchHit]:
+        """Projekte, die alle Suchwörter enthalten, nach Relevanz sortiert.
+
+        ``project_ids`` beschränkt die Treffer auf sichtbare Projekte (vor der Begrenzung auf ``limit``).
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        with self._lock:
+            count = len(self._lengths)
+            if not count:
+                return []
+            average = self._total_length / count or 1.0
+            scores: Optional[Dict[str, float]] = None
+            matched_terms = set()
+            for position, word in enumerate(words):
+                # Das letzte Wort gilt als Präfix, z. B. "warte" -> "wartezeit"
+                terms = self._expand(word, prefix and position == len(words) - 1)
+                word_scores: Dict[str, float] = defaultdict(float)
+                for term in terms:
+                    docs = self._postings[term]
+                    idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+                    for project_id, tf in docs.items():
+                        norm = K1 * (1 - B + B * self._lengths[project_id] / average)
+                        word_scores[project_id] += idf * tf * (K1 + 1) / (tf + norm)
+                    matched_terms.add(term)
+                if scores is None:
+                    scores = word_scores if project_ids is None else \
+                        {pid: score for pid, score in word_scores.items() if pid in project_ids}
+                else:
+                    scores = {pid: score + word_scores[pid] for pid, score in scores.items()
+                              if pid in word_scores}
+                if not scores:
+                    return []
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [SearchHit(project_id, self._names.get(project_id, ''), round(score, 3),
+                              self._matched_fields(project_id, matched_terms))
+                    for project_id, score in best]
+
+    def _matched_fields(self, project_id, terms) -> List[str]:
+        labels = []
+        for key, counts in self._fields.get(project_id, {}).items():
+            if any(term in counts for term in terms):
+                label = FIELD_LABELS.get(key.split(':')[0], key)
+                if label not in labels:
+                    labels.append(label)
+        return labels
@@ -0,0 +1,1125 @@
+"""Persistente Projektablage auf Basis von SQLite.
+
+Projekte, ihre PDCA-Abschnitte (Feld für Feld) und die Aufgaben aus
+``do.implementation_steps`` liegen als indizierte Zeilen in einer Datenbank.
+Geladen wird immer nur ein Projekt, geschrieben wird in Transaktionen.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from . import history
+from .profiling import TimedConnection
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('plan', 'do', 'check', 'act')
+PROJECT_COLUMNS = ('name', 'description', 'created_date', 'status')
+TASK_COLUMNS = ('task', 'responsible', 'due_date', 'status', 'priority')
+TASK_SORT_COLUMNS = ('position', 'due_date', 'status', 'responsible', 'task')
+
+# Schema-Migrationen, Index = PRAGMA user_version nach Anwendung
+MIGRATIONS = [
+    """
+    CREATE TABLE projects (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT NOT NULL DEFAULT '',
+        created_date TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'draft',
+        updated_at TEXT NOT NULL
+    );
+    CREATE INDEX idx_projects_status ON projects(status);
+
+    CREATE TABLE section_fields (
+        project_id TEXT NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+        phase TEXT NOT NULL,
+        field TEXT NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY (project_id, phase, field)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE tasks (
+        id TEXT PRIMARY KEY,
+        project_id TEXT NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        task TEXT NOT NULL,
+        responsible TEXT NOT NULL DEFAULT '',
+        due_date TEXT,
+        status TEXT NOT NULL DEFAULT 'open',
+        priority TEXT NOT NULL DEFAULT 'medium'
+    );
+    CREATE INDEX idx_tasks_project ON tasks(project_id, position);
+    CREATE INDEX idx_tasks_status_due ON tasks(status, due_date);
+    """,
+    """
+    CREATE INDEX idx_tasks_project_status_due ON tasks(project_id, status, due_date);
+    CREATE INDEX idx_tasks_project_responsible ON tasks(project_id, responsible);
+    """,
+    """
+    ALTER TABLE tasks ADD COLUMN completed_at TEXT;
+    UPDATE tasks SET completed_at = (SELECT updated_at FROM projects WHERE projects.id = tasks.project_id)
+        WHERE status = 'completed';
+    """,
+    """
+    ALTER TABLE projects ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
+    CREATE TABLE changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id TEXT NOT NULL,
+        version INTEGER,
+        origin TEXT,
+        changed_at TEXT NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE metrics (
+        project_id TEXT NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+        metric TEXT NOT NULL,
+        unit TEXT NOT NULL DEFAULT '',
+        target REAL,
+        lower_is_better INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (project_id, metric)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE metric_chunks (
+        project_id TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        chunk INTEGER NOT NULL,
+        first_ts REAL NOT NULL,
+        last_ts REAL NOT NULL,
+        count INTEGER NOT NULL,
+        timestamps BLOB NOT NULL,
+        vals BLOB NOT NULL,
+        PRIMARY KEY (project_id, metric, chunk),
+        FOREIGN KEY (project_id, metric) REFERENCES metrics(project_id, metric) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    """,
+    """
+    CREATE TABLE project_summaries (
+        project_id TEXT PRIMARY KEY REFERENCES projects(id) ON DELETE CASCADE,
+        version INTEGER NOT NULL,
+        progress REAL NOT NULL,
+        tasks_total INTEGER NOT NULL,
+        tasks_completed INTEGER NOT NULL,
+        overdue INTEGER NOT NULL,
+        due_soon INTEGER NOT NULL,
+        computed_at TEXT NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE TABLE reminders_sent (
+        task_id TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+        kind TEXT NOT NULL,
+        due_date TEXT NOT NULL,
+        sent_at TEXT NOT NULL,
+        PRIMARY KEY (task_id, kind, due_date)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE worker_state (
+        name TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    ) WITHOUT ROWID;
+    """,
+    """
+    ALTER TABLE projects ADD COLUMN progress REAL;
+    """,
+    """
+    CREATE TABLE users (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        role TEXT NOT NULL DEFAULT 'Leser',
+        created_at TEXT NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE TABLE teams (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE TABLE team_members (
+        team_id TEXT NOT NULL REFERENCES teams(id) ON DELETE CASCADE,
+        user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        PRIMARY KEY (team_id, user_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX idx_team_members_user ON team_members(user_id);
+
+    CREATE TABLE project_acl (
+        project_id TEXT NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+        principal TEXT NOT NULL,
+        level INTEGER NOT NULL,
+        PRIMARY KEY (project_id, principal)
+    ) WITHOUT ROWID;
+    CREATE INDEX idx_project_acl_principal ON project_acl(principal, project_id, level);
+
+    -- Bisher durfte jede Rolle alle Projekte sehen und bearbeiten: Freigabe für alle übernehmen
+    INSERT INTO teams (id, name) VALUES ('all', 'Alle');
+    INSERT INTO project_acl (project_id, principal, level) SELECT id, 'team:all', 2 FROM projects;
+    """,
+    """
+    CREATE TABLE project_versions (
+        project_id TEXT NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+        version INTEGER NOT NULL,
+        checkpoint INTEGER NOT NULL,
+        data BLOB NOT NULL,
+        changed_at TEXT NOT NULL,
+        origin TEXT,
+        PRIMARY KEY (project_id, version)
+    ) WITHOUT ROWID;
+
+    -- Bisheriger Stand jedes Projekts als erster Vollstand (Format wie ProjectStore._snapshot)
+    INSERT INTO project_versions (project_id, version, checkpoint, data, changed_at)
+    SELECT p.id, p.version, 1, json_object(
+        'name', p.name, 'description', p.description, 'created_date', p.created_date, 'status', p.status,
+        'plan', json((SELECT json_group_object(field, json(value)) FROM section_fields
+                      WHERE project_id = p.id AND phase = 'plan')),
+        'do', json((SELECT json_group_object(field, json(value)) FROM section_fields
+                    WHERE project_id = p.id AND phase = 'do')),
+        'check', json((SELECT json_group_object(field, json(value)) FROM section_fields
+                       WHERE project_id = p.id AND phase = 'check')),
+        'act', json((SELECT json_group_object(field, json(value)) FROM section_fields
+                     WHERE project_id = p.id AND phase = 'act')),
+        'tasks', json((SELECT json_group_object(t.id, json_object(
+            'task', t.task, 'responsible', t.responsible, 'due_date', t.due_date, 'status', t.status,
+            'priority', t.priority, 'position', t.position, 'completed_at', t.completed_at))
+            FROM tasks t WHERE t.project_id = p.id))), p.updated_at
+    FROM projects p;
+    """,
+    # Fortschritt steht in projects.progress, die Aufgabenzahlen liefert der Kennzahlen-Index
+    """
+    DROP TABLE project_summaries;
+    """,
+    # Abgeleitete Änderungen (z. B. neu berechneter Fortschritt) ohne inhaltliche Änderung
+    """
+    ALTER TABLE changes ADD COLUMN derived INTEGER NOT NULL DEFAULT 0;
+    """,
+]
+
+# Freigaben neuer Projekte (``principal``, Stufe wie in kvp.access): wie bisher für alle bearbeitbar
+DEFAULT_GRANTS = (('team:all', 2),)
+
+# Änderungsprotokoll: ältere Einträge werden regelmäßig entfernt
+CHANGE_FEED_KEEP = 10000
+CHANGE_FEED_PRUNE_EVERY = 1000
+
+# Ereignisse, nach denen ein neuer Versionsstand abgelegt wird (Kennzahlen und Freigaben gehören nicht dazu)
+HISTORY_EVENTS = frozenset({'project_saved', 'project_updated', 'fields_written', 'task_added', 'task_updated',
+                            'task_deleted'})
+# Ereignisse für abgeleitete Werte; im Änderungsprotokoll als ``derived`` markiert, ohne Versionsstand
+DERIVED_EVENTS = frozenset({'progress_updated'})
+
+# Herkunft der Schreibzugriffe (z. B. Streamlit-Session), landet im Änderungsprotokoll
+current_origin = ContextVar('kvp_origin', default=None)
+_MISSING = object()
+
+_INSERT_TASK = (
+    'INSERT INTO tasks (id, project_id, position, task, responsible, due_date, status, priority, '
+    'completed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)')
+
+
+# Aktualisiert nur Aufgaben desselben Projekts; ein schon gesetzter Abschlusszeitpunkt bleibt erhalten
+_UPSERT_TASK = _INSERT_TASK + (
+    ' ON CONFLICT(id) DO UPDATE SET position = excluded.position, task = excluded.task, '
+    'responsible = excluded.responsible, due_date = excluded.due_date, status = excluded.status, '
+    'priority = excluded.priority, completed_at = CASE WHEN tasks.status = excluded.status '
+    'THEN COALESCE(tasks.completed_at, excluded.completed_at) ELSE excluded.completed_at END '
+    'WHERE tasks.project_id = excluded.project_id')
+
+
+class ProjectNotFound(KeyError):
+    pass
+
+
+class TaskIdConflict(ValueError):
+    """Aufgaben-IDs sind doppelt oder gehören bereits zu einem anderen Projekt."""
+
+    def __init__(self, message: str, task_ids: Iterable[str]):
+        super().__init__(message)
+        self.task_ids = sorted(task_ids)
+
+
+class ChangeEvent(NamedTuple):
+    """Änderung, die nach erfolgreichem Commit an alle Abonnenten verteilt wird.
+
+    ``kind`` ist eines von ``project_saved``, ``project_updated``,
+    ``project_deleted``, ``fields_written``, ``task_added``, ``task_updated``,
+    ``task_deleted``, ``metric_defined``, ``metric_deleted``,
+    ``measurements_added``, ``acl_changed`` und ``progress_updated``; ``data`` enthält die neuen
+    Werte (bei ``project_saved`` das Projekt mit ``created``), ``version`` die Projektversion nach
+    dem Commit (``None`` bei gelöschten Projekten).
+    """
+    kind: str
+    project_id: str
+    task_id: Optional[str] = None
+    data: Optional[Dict[str, Any]] = None
+    version: Optional[int] = None
+
+
+class MergeResult(NamedTuple):
+    """Ergebnis eines Schreibzugriffs mit optimistischer Sperre.
+
+    ``written`` enthält die übernommenen Werte, ``conflicts`` die Felder, die
+    zwischenzeitlich anders geändert wurden, mit ihrem aktuellen Wert.
+    """
+    written: Dict[str, Any]
+    conflicts: Dict[str, Any]
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _completed_at(status, previous=None):
+    return (previous or _now()) if status == 'completed' else None
+
+
+def _merge_columns(current, columns, expected):
+    """Teilt Änderungen in übernehmbare und Konflikte (Spalte wurde zwischenzeitlich anders geändert)."""
+    if expected is None:
+        return dict(columns), {}
+    changes, conflicts = {}, {}
+    for column, value in columns.items():
+        if column not in expected or current[column] == expected[column] or current[column] == value:
+            changes[column] = value
+        else:
+            conflicts[column] = current[column]
+    return changes, conflicts
+
+
+def _task_row(task, project_id, position):
+    task.setdefault('id', str(uuid.uuid4()))
+    status = task.get('status', 'open')
+    return (task['id'], project_id, position, task.get('task', ''), task.get('responsible', ''),
+            task.get('due_date'), status, task.get('priority', 'medium'),
+            _completed_at(status, task.get('completed_at')))
+
+
+def _unique_task_ids(rows) -> set:
+    task_ids = {row[0] for row in rows}
+    if len(task_ids) != len(rows):
+        duplicates = {task_id for task_id, count in Counter(row[0] for row in rows).items() if count > 1}
+        raise TaskIdConflict('Doppelte Aufgaben-IDs: ' + ', '.join(sorted(duplicates)), duplicates)
+    return task_ids
+
+
+class ProjectStore:
+    """Thread-sichere Projektablage; jede Streamlit-Session nutzt eine eigene Verbindung."""
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._listeners: List[Callable[[ChangeEvent], None]] = []
+        self._migrate()
+
+    # Verbindungen & Transaktionen
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                   check_same_thread=False, factory=TimedConnection)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA foreign_keys = ON')
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            self._local.conn = conn
+            self._local.depth = 0
+            self._local.events = []
+        return conn
+
+    # Änderungsereignisse
+    def subscribe(self, listener: Callable[[ChangeEvent], None]):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[ChangeEvent], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _emit(self, kind, project_id, task_id=None, data=None):
+        self._local.events.append(ChangeEvent(kind, project_id, task_id, data))
+
+    def _dispatch(self, events):
+        for event in events:
+            for listener in list(self._listeners):
+                try:
+                    listener(event)
+                except Exception:
+                    logger.exception('Listener für %s fehlgeschlagen', event.kind)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Schreibtransaktion; verschachtelte Aufrufe laufen in der äußeren mit."""
+        conn = self._connect()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        self._local.depth = 1
+        self._local.events = []
+        try:
+            yield conn
+            events = self._record_changes(conn, self._local.events)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            self._local.events = []
+            raise
+        else:
+            conn.execute('COMMIT')
+            self._local.events = []
+            self._dispatch(events)
+        finally:
+            self._local.depth = 0
+
+    def _record_changes(self, conn, events: List[ChangeEvent]) -> List[ChangeEvent]:
+        """Erhöht die Version jedes geänderten Projekts einmal pro Transaktion und protokolliert sie."""
+        if not events:
+            return events
+        origin = current_origin.get()
+        now = _now()
+        versions = {}
+        derived = {}
+        for event in events:
+            derived[event.project_id] = derived.get(event.project_id, True) and event.kind in DERIVED_EVENTS
+        for project_id, only_derived in derived.items():
+            conn.execute('UPDATE projects SET version = version + 1 WHERE id = ?', (project_id,))
+            row = conn.execute('SELECT version FROM projects WHERE id = ?', (project_id,)).fetchone()
+            versions[project_id] = row[0] if row else None
+            cursor = conn.execute(
+                'INSERT INTO changes (project_id, version, origin, changed_at, derived) VALUES (?, ?, ?, ?, ?)',
+                (project_id, versions[project_id], origin, now, int(only_derived)))
+        if cursor.lastrowid % CHANGE_FEED_PRUNE_EVERY < len(versions):
+            conn.execute('DELETE FROM changes WHERE seq <= ?', (cursor.lastrowid - CHANGE_FEED_KEEP,))
+        for project_id in dict.fromkeys(event.project_id for event in events if event.kind in HISTORY_EVENTS):
+            if versions[project_id] is not None:
+                self._record_version(conn, project_id, versions[project_id], origin, now)
+        return [event._replace(version=versions[event.project_id]) for event in events]
+
+    def _record_version(self, conn, project_id, version, origin, now):
+        """Legt den Stand nach einer Änderung als Delta zum vorherigen ab, regelmäßig als Vollstand."""
+        snapshot = self._snapshot(conn, project_id)
+        head = self._history_state(conn, project_id)
+        if head is None:
+            data, checkpoint = history.encode(snapshot), True
+        else:
+            state, _, deltas = head
+            ops = history.diff(state, snapshot)
+            if not ops:
+                return
+            data = history.encode(ops)
+            checkpoint = deltas + 1 >= history.CHECKPOINT_EVERY
+            if not checkpoint and len(data) >= history.COMPRESS_MIN_BYTES:
+                # Große Änderungen (z. B. Import über ein bestehendes Projekt) direkt als Vollstand
+                full = history.encode(snapshot)
+                checkpoint = len(full) <= 2 * len(data)
+            if checkpoint:
+                data = history.encode(snapshot)
+        conn.execute('INSERT OR REPLACE INTO project_versions (project_id, version, checkpoint, data, changed_at, '
+                     'origin) VALUES (?, ?, ?, ?, ?, ?)', (project_id, version, int(checkpoint), data, now, origin))
+
+    def _snapshot(self, conn, project_id) -> Dict[str, Any]:
+        """Inhalt eines Projekts für die Versionsablage (Aufgaben nach ID, siehe ``kvp.history``)."""
+        snapshot = dict(conn.execute('SELECT name, description, created_date, status FROM projects WHERE id = ?',
+                                     (project_id,)).fetchone())
+        for phase in PHASES:
+            snapshot[phase] = {}
+        for phase, field, value in conn.execute(
+                'SELECT phase, field, value FROM section_fields WHERE project_id = ?', (project_id,)):
+            snapshot.setdefault(phase, {})[field] = json.loads(value)
+        snapshot['tasks'] = {row['id']: {column: row[column] for column in row.keys() if column != 'id'}
+                             for row in conn.execute(
+                                 'SELECT id, task, responsible, due_date, status, priority, position, completed_at '
+                                 'FROM tasks WHERE project_id = ?', (project_id,))}
+        return snapshot
+
+    def _history_state(self, conn, project_id, version=None):
+        """``(stand, version, deltas seit dem Vollstand)`` zum Stand ``version`` (Standard: neuester)."""
+        bound, params = ('', ()) if version is None else (' AND version <= ?', (version,))
+        row = conn.execute(
+            'SELECT version, data FROM project_versions WHERE project_id = ? AND checkpoint = 1'
+            f'{bound} ORDER BY version DESC LIMIT 1', (project_id, *params)).fetchone()
+        if row is None:
+            return None
+        state = history.decode(row['data'])
+        deltas = conn.execute(
+            f'SELECT version, data FROM project_versions WHERE project_id = ? AND version > ?{bound} '
+            'ORDER BY version', (project_id, row['version'], *params)).fetchall()
+        for delta in deltas:
+            history.patch(state, history.decode(delta['data']))
+        return state, deltas[-1]['version'] if deltas else row['version'], len(deltas)
+
+    def _migrate(self):
+        conn = self._connect()
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for index, script in enumerate(MIGRATIONS[version:], start=version + 1):
+            try:
+                conn.executescript(f'BEGIN IMMEDIATE; {script}; PRAGMA user_version = {index}; COMMIT;')
+            except sqlite3.Error:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # Lesen
+    def list_projects(self, project_ids: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Schlanke Projektliste (ohne Abschnitte und Aufgaben) für die Auswahl, optional nur ``project_ids``."""
+        if project_ids is None:
+            rows = self._connect().execute(
+                'SELECT id, name, status, progress FROM projects ORDER BY rowid')
+            return [dict(row) for row in rows]
+        # Abfrage über den Primärschlüssel, Reihenfolge wie ohne Filter
+        rows = self._select_for_projects('SELECT rowid, id, name, status, progress FROM projects', 'id',
+                                         project_ids)
+        return [{'id': row['id'], 'name': row['name'], 'status': row['status'], 'progress': row['progress']}
+                for row in sorted(rows, key=lambda row: row['rowid'])]
+
+    def count_projects(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM projects').fetchone()[0]
+
+    def count_by_status(self) -> Dict[str, int]:
+        rows = self._connect().execute(
+            'SELECT status, COUNT(*) FROM projects GROUP BY status')
+        return {status: count for status, count in rows}
+
+    def project_name(self, project_id: str) -> Optional[str]:
+        row = self._connect().execute('SELECT name FROM projects WHERE id = ?', (project_id,)).fetchone()
+        return row[0] if row else None
+
+    def project_version(self, project_id: str) -> Optional[int]:
+        row = self._connect().execute('SELECT version FROM projects WHERE id = ?', (project_id,)).fetchone()
+        return row[0] if row else None
+
+    def last_change_seq(self) -> int:
+        return self._connect().execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+
+    def changes_since(self, seq: int, limit: int = 1000) -> Optional[List[Dict[str, Any]]]:
+        """Änderungen nach ``seq`` (``seq``, ``project_id``, ``version``, ``origin``, ``changed_at``,
+        ``derived``: nur abgeleitete Werte wie der Fortschritt).
+
+        ``None`` bedeutet, dass ältere Einträge bereits entfernt wurden; der
+        Aufrufer muss dann alles neu laden.
+        """
+        rows = self._connect().execute(
+            'SELECT seq, project_id, version, origin, changed_at, derived FROM changes '
+            'WHERE seq > ? ORDER BY seq LIMIT ?', (seq, limit)).fetchall()
+        # Lücken entstehen nur durch das Aufräumen alter Einträge
+        if rows and rows[0]['seq'] > seq + 1:
+            return None
+        return [dict(row) for row in rows]
+
+    def load_project(self, project_id: str, with_tasks: bool = True) -> Dict[str, Any]:
+        """Lädt genau ein Projekt im Format von ``create_sample_project()``.
+
+        Mit ``with_tasks=False`` bleiben die Aufgaben in der Datenbank; die
+        Oberfläche holt sie seitenweise über ``query_tasks``.
+        """
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT id, name, description, created_date, status, version, progress FROM projects WHERE id = ?',
+            (project_id,)).fetchone()
+        if row is None:
+            raise ProjectNotFound(project_id)
+        project = dict(row)
+        for phase in PHASES:
+            project[phase] = {}
+        for phase, field, value in conn.execute(
+                'SELECT phase, field, value FROM section_fields WHERE project_id = ?',
+                (project_id,)):
+            project.setdefault(phase, {})[field] = json.loads(value)
+        if with_tasks:
+            tasks = self.load_tasks(project_id)
+            if tasks:
+                project['do']['implementation_steps'] = tasks
+        return project
+
+    def load_tasks(self, project_id: str) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            'SELECT id, task, responsible, due_date, status, priority FROM tasks '
+            'WHERE project_id = ? ORDER BY position', (project_id,))
+        return [dict(row) for row in rows]
+
+    def query_tasks(self, project_id: str, statuses: Optional[List[str]] = None,
+                    responsible: Optional[str] = None, due_from: Optional[str] = None,
+                    due_to: Optional[str] = None, order_by: str = 'position',
+                    descending: bool = False, limit: int = 25, offset: int = 0):
+        """Gefilterte, sortierte Seite der Aufgaben eines Projekts.
+
+        Liefert ``(aufgaben, gesamtzahl)``; ``aufgaben`` ist ein nach Task-ID
+        geschlüsseltes Dict in Anzeigereihenfolge. Gefiltert und sortiert wird in SQL.
+        """
+        if order_by not in TASK_SORT_COLUMNS:
+            raise ValueError(f'Unbekannte Sortierung: {order_by}')
+        where = ['project_id = ?']
+        params: List[Any] = [project_id]
+        if statuses:
+            where.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if responsible:
+            where.append('responsible = ?')
+            params.append(responsible)
+        if due_from:
+            where.append('due_date >= ?')
+            params.append(due_from)
+        if due_to:
+            where.append('due_date <= ?')
+            params.append(due_to)
+        clause = ' AND '.join(where)
+        conn = self._connect()
+        total = conn.execute(f'SELECT COUNT(*) FROM tasks WHERE {clause}', params).fetchone()[0]
+        direction = 'DESC' if descending else 'ASC'
+        rows = conn.execute(
+            'SELECT id, task, responsible, due_date, status, priority, position FROM tasks '
+            f'WHERE {clause} ORDER BY {order_by} {direction}, position LIMIT ? OFFSET ?',
+            params + [limit, offset])
+        return {row['id']: dict(row) for row in rows}, total
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            'SELECT id, project_id, task, responsible, due_date, status, priority, position '
+            'FROM tasks WHERE id = ?', (task_id,)).fetchone()
+        return dict(row) if row else None
+
+    def task_responsibles(self, project_id: str) -> List[str]:
+        rows = self._connect().execute(
+            "SELECT DISTINCT responsible FROM tasks WHERE project_id = ? AND responsible != '' "
+            'ORDER BY responsible', (project_id,))
+        return [row[0] for row in rows]
+
+    def load_tasks_by_id(self, task_ids: List[str]) -> List[Dict[str, Any]]:
+        """Aufgaben samt Projektname in der Reihenfolge von ``task_ids``."""
+        if not task_ids:
+            return []
+        placeholders = ', '.join('?' * len(task_ids))
+        rows = self._connect().execute(
+            'SELECT t.id, t.project_id, p.name AS project_name, t.task, t.responsible, '
+            't.due_date, t.status, t.priority FROM tasks t JOIN projects p ON p.id = t.project_id '
+            f'WHERE t.id IN ({placeholders})', list(task_ids))
+        by_id = {row['id']: dict(row) for row in rows}
+        return [by_id[task_id] for task_id in task_ids if task_id in by_id]
+
+    def iter_task_rows(self, project_ids: Optional[List[str]] = None) -> Iterator[sqlite3.Row]:
+        """Schlanke Aufgabenzeilen (ohne Texte) für den Aufbau von Indizes."""
+        sql = 'SELECT id, project_id, status, due_date FROM tasks'
+        if project_ids is None:
+            return self._connect().execute(sql)
+        return iter(self._select_for_projects(sql, 'project_id', project_ids))
+
+    def task_projects(self, task_ids: List[str]) -> Dict[str, str]:
+        """Vorhandene Aufgaben aus ``task_ids`` als ``task_id -> project_id``."""
+        if not task_ids:
+            return {}
+        rows = self._select_for_projects('SELECT id, project_id FROM tasks', 'id', task_ids)
+        return {task_id: project_id for task_id, project_id in rows}
+
+    def project_statuses(self, project_ids: List[str]) -> Dict[str, str]:
+        rows = self._select_for_projects('SELECT id, status FROM projects', 'id', project_ids)
+        return {project_id: status for project_id, status in rows}
+
+    def iter_search_texts(self, section_fields: Iterable[tuple]) -> Iterator[tuple]:
+        """``(project_id, feld, wert)`` aller durchsuchbaren Texte für den Aufbau des Suchindex.
+
+        Felder heißen ``name``, ``description``, ``<phase>.<feld>`` und ``task:<task_id>``.
+        """
+        conn = self._connect()
+        for project_id, name, description in conn.execute(
+                'SELECT id, name, description FROM projects'):
+            yield project_id, 'name', name
+            yield project_id, 'description', description
+        wanted = set(section_fields)
+        phases = sorted({phase for phase, _ in wanted})
+        for project_id, phase, field, value in conn.execute(
+                'SELECT project_id, phase, field, value FROM section_fields '
+                f"WHERE phase IN ({', '.join('?' * len(phases))})", phases):
+            if (phase, field) in wanted:
+                yield project_id, f'{phase}.{field}', json.loads(value)
+        for task_id, project_id, text in conn.execute('SELECT id, project_id, task FROM tasks'):
+            yield project_id, f'task:{task_id}', text
+
+    def analytics_task_rows(self, project_ids: Optional[List[str]] = None) -> List[tuple]:
+        """``(task_id, project_id, project_status, responsible, status, due_date, completed_at)``
+        für die Portfolioauswertung."""
+        sql = ('SELECT t.id, t.project_id, p.status, t.responsible, t.status, t.due_date, '
+               't.completed_at FROM tasks t JOIN projects p ON p.id = t.project_id')
+        return [tuple(row) for row in self._select_for_projects(sql, 't.project_id', project_ids)]
+
+    def analytics_project_rows(self, project_ids: Optional[List[str]] = None) -> List[tuple]:
+        """``(project_id, name, status, created_date, progress, verbesserung_prozent)`` je Projekt."""
+        sql = ("SELECT p.id, p.name, p.status, p.created_date, p.progress, "
+               "json_extract(f.value, '$.verbesserung_prozent') FROM projects p "
+               "LEFT JOIN section_fields f ON f.project_id = p.id AND f.phase = 'check' "
+               "AND f.field = 'metrics'")
+        return [tuple(row) for row in self._select_for_projects(sql, 'p.id', project_ids)]
+
+    def _select_for_projects(self, sql, column, project_ids):
+        conn = self._connect()
+        if project_ids is None:
+            return conn.execute(sql).fetchall()
+        rows = []
+        project_ids = list(project_ids)
+        # SQLite begrenzt die Zahl der Platzhalter je Anweisung
+        for start in range(0, len(project_ids), 500):
+            chunk = project_ids[start:start + 500]
+            rows.extend(conn.execute(f"{sql} WHERE {column} IN ({', '.join('?' * len(chunk))})",
+                                     chunk).fetchall())
+        return rows
+
+    def iter_projects(self, batch_size: int = 500, statuses: Optional[List[str]] = None,
+                      project_ids: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Alle (oder gefilterte) Projekte nacheinander laden, ohne den Bestand im Speicher zu halten."""
+        last_rowid = 0
+        conn = self._connect()
+        where = ''
+        params: List[Any] = []
+        if statuses:
+            where += f" AND status IN ({', '.join('?' * len(statuses))})"
+            params.extend(statuses)
+        if project_ids is not None:
+            wanted = set(project_ids)
+        while True:
+            rows = conn.execute(
+                f'SELECT rowid, id FROM projects WHERE rowid > ?{where} ORDER BY rowid LIMIT ?',
+                [last_rowid, *params, batch_size]).fetchall()
+            if not rows:
+                return
+            for rowid, project_id in rows:
+                last_rowid = rowid
+                if project_ids is not None and project_id not in wanted:
+                    continue
+                try:
+                    yield self.load_project(project_id)
+                except ProjectNotFound:
+                    continue
+
+    # Schreiben
+    def save_project(self, project: Dict[str, Any]):
+        self.insert_projects([project])
+
+    def insert_projects(self, projects: Iterable[Dict[str, Any]]) -> List[str]:
+        """Legt Projekte samt Abschnitten und Aufgaben gebündelt in einer Transaktion an.
+
+        Neue Projekte erhalten die ``DEFAULT_GRANTS``; geliefert werden ihre IDs.
+        """
+        created = []
+        with self.transaction() as conn:
+            for project in projects:
+                project.setdefault('id', str(uuid.uuid4()))
+                is_new = conn.execute('SELECT 1 FROM projects WHERE id = ?', (project['id'],)).fetchone() is None
+                if is_new:
+                    created.append(project['id'])
+                conn.execute(
+                    'INSERT INTO projects (id, name, description, created_date, status, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT(id) DO UPDATE SET name = excluded.name, '
+                    'description = excluded.description, created_date = excluded.created_date, '
+                    'status = excluded.status, updated_at = excluded.updated_at',
+                    (project['id'], project.get('name', ''), project.get('description', ''),
+                     project.get('created_date') or datetime.now().strftime('%Y-%m-%d'),
+                     project.get('status', 'draft'), _now()))
+                conn.execute('DELETE FROM section_fields WHERE project_id = ?', (project['id'],))
+                for phase in PHASES:
+                    fields = dict(project.get(phase) or {})
+                    if phase == 'do':
+                        fields.pop('implementation_steps', None)
+                    self._write_fields(conn, project['id'], phase, fields)
+                tasks = (project.get('do') or {}).get('implementation_steps', [])
+                self._replace_tasks(conn, project['id'], tasks)
+                self._emit('project_saved', project['id'], data={**project, 'created': is_new})
+            for principal, level in DEFAULT_GRANTS:
+                self.grant(created, principal, level)
+        return created
+
+    def update_project(self, project_id: str, expected: Optional[Dict[str, Any]] = None,
+                       **columns) -> Dict[str, Any]:
+        """Ändert Projektspalten; mit ``expected`` (Ausgangswerte) nur, wenn niemand dazwischen kam.
+
+        Liefert die Konflikte als ``spalte -> aktueller Wert``.
+        """
+        unknown = set(columns) - set(PROJECT_COLUMNS)
+        if unknown:
+            raise ValueError(f'Unbekannte Projektspalten: {sorted(unknown)}')
+        if not columns:
+            return {}
+        with self.transaction() as conn:
+            row = conn.execute(f"SELECT {', '.join(columns)} FROM projects WHERE id = ?",
+                               (project_id,)).fetchone()
+            if row is None:
+                return {}
+            changes, conflicts = _merge_columns(dict(row), columns, expected)
+            if changes:
+                assignments = ', '.join(f'{column} = ?' for column in changes)
+                conn.execute(f'UPDATE projects SET {assignments}, updated_at = ? WHERE id = ?',
+                             (*changes.values(), _now(), project_id))
+                self._emit('project_updated', project_id, data=changes)
+        return conflicts
+
+    def write_fields(self, project_id: str, phase: str, fields: Dict[str, Any]):
+        """Schreibt einzelne Felder eines PDCA-Abschnitts."""
+        if phase not in PHASES:
+            raise ValueError(f'Unbekannte Phase: {phase}')
+        with self.transaction() as conn:
+            cursor = conn.execute('UPDATE projects SET updated_at = ? WHERE id = ?', (_now(), project_id))
+            if cursor.rowcount == 0:
+                raise ProjectNotFound(project_id)
+            self._write_fields(conn, project_id, phase, fields)
+            self._emit('fields_written', project_id, data={'phase': phase, 'fields': dict(fields)})
+
+    def merge_fields(self, project_id: str, phase: str, fields: Dict[str, Any],
+                     base: Dict[str, Any], expected_version: Optional[int] = None) -> MergeResult:
+        """Schreibt Felder mit optimistischer Sperre und feldweiser Zusammenführung.
+
+        Stimmt ``expected_version`` noch, wird direkt geschrieben. Sonst wird
+        jedes Feld mit seinem Ausgangswert ``base`` verglichen: unverändert
+        gebliebene Felder werden überschrieben, gleichzeitig anders geänderte
+        Felder bleiben erhalten und werden als Konflikt gemeldet. Felder, die
+        in ``base`` fehlen, galten beim Bearbeiten als nicht vorhanden.
+        """
+        if not fields:
+            return MergeResult({}, {})
+        with self.transaction() as conn:
+            row = conn.execute('SELECT version FROM projects WHERE id = ?', (project_id,)).fetchone()
+            if row is None:
+                raise ProjectNotFound(project_id)
+            if expected_version is not None and row[0] == expected_version:
+                written, conflicts = dict(fields), {}
+            else:
+                placeholders = ', '.join('?' * len(fields))
+                current = {field: json.loads(value) for field, value in conn.execute(
+                    'SELECT field, value FROM section_fields WHERE project_id = ? AND phase = ? '
+                    f'AND field IN ({placeholders})', (project_id, phase, *fields))}
+                written, conflicts = {}, {}
+                for field, value in fields.items():
+                    stored = current.get(field, _MISSING)
+                    if stored == base.get(field, _MISSING) or stored == value:
+                        written[field] = value
+                    else:
+                        conflicts[field] = None if stored is _MISSING else stored
+            if written:
+                self.write_fields(project_id, phase, written)
+        return MergeResult(written, conflicts)
+
+    def _write_fields(self, conn, project_id, phase, fields):
+        conn.executemany(
+            'INSERT INTO section_fields (project_id, phase, field, value) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(project_id, phase, field) DO UPDATE SET value = excluded.value',
+            [(project_id, phase, field, _dumps(value)) for field, value in fields.items()])
+
+    # Abgeleitete Daten des Hintergrunddienstes (ohne Versionierung und Änderungsereignisse)
+    def projects_without_progress(self) -> List[str]:
+        return [row[0] for row in self._connect().execute(
+            'SELECT id FROM projects WHERE progress IS NULL ORDER BY rowid')]
+
+    def set_progress(self, progress: Dict[str, float]):
+        """Speichert geänderte Fortschrittswerte; je Projekt ein ``progress_updated``-Ereignis."""
+        with self.transaction() as conn:
+            current = dict(self._select_for_projects('SELECT id, progress FROM projects', 'id', list(progress)))
+            changed = {project_id: value for project_id, value in progress.items()
+                       if project_id in current and (current[project_id] is None
+                                                     or abs(current[project_id] - value) > 1e-9)}
+            conn.executemany('UPDATE projects SET progress = ? WHERE id = ?',
+                             [(value, project_id) for project_id, value in changed.items()])
+            for project_id, value in changed.items():
+                self._emit('progress_updated', project_id, data={'progress': value})
+
+    def sent_reminders(self, task_ids: Optional[List[str]] = None) -> set:
+        """Bereits verschickte Erinnerungen als ``(task_id, art, fälligkeit)``."""
+        rows = self._select_for_projects('SELECT task_id, kind, due_date FROM reminders_sent',
+                                         'task_id', task_ids)
+        return {tuple(row) for row in rows}
+
+    def mark_reminders_sent(self, keys: Iterable[tuple]):
+        now = _now()
+        with self.transaction() as conn:
+            # Aufgaben, die inzwischen gelöscht wurden, fallen über den Fremdschlüssel heraus
+            conn.executemany(
+                'INSERT OR IGNORE INTO reminders_sent (task_id, kind, due_date, sent_at) '
+                'SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM tasks WHERE id = ?)',
+                [(task_id, kind, due_date, now, task_id) for task_id, kind, due_date in keys])
+
+    def worker_state(self, name: str) -> Optional[Any]:
+        row = self._connect().execute('SELECT value FROM worker_state WHERE name = ?', (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_worker_state(self, name: str, value: Any):
+        with self.transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO worker_state (name, value, updated_at) VALUES (?, ?, ?)',
+                         (name, _dumps(value), _now()))
+
+    # Benutzer, Teams und Freigaben (Berechtigungen prüft kvp.access)
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute('SELECT id, name, role FROM users WHERE id = ?', (user_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_users(self) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self._connect().execute('SELECT id, name, role FROM users ORDER BY name')]
+
+    def count_users(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def save_user(self, user_id: str, name: str, role: str):
+        with self.transaction() as conn:
+            conn.execute('INSERT INTO users (id, name, role, created_at) VALUES (?, ?, ?, ?) '
+                         'ON CONFLICT(id) DO UPDATE SET name = excluded.name, role = excluded.role',
+                         (user_id, name, role, _now()))
+
+    def list_teams(self) -> List[Dict[str, Any]]:
+        """Teams samt Mitgliedern (``members``: Benutzer-IDs)."""
+        conn = self._connect()
+        teams = {row['id']: dict(row, members=[]) for row in conn.execute('SELECT id, name FROM teams ORDER BY name')}
+        for team_id, user_id in conn.execute('SELECT team_id, user_id FROM team_members ORDER BY user_id'):
+            teams[team_id]['members'].append(user_id)
+        return list(teams.values())
+
+    def save_team(self, team_id: str, name: str, members: Iterable[str]):
+        """Legt ein Team an bzw. ändert es; ``members`` ersetzt die bisherigen Mitglieder."""
+        with self.transaction() as conn:
+            conn.execute('INSERT INTO teams (id, name) VALUES (?, ?) '
+                         'ON CONFLICT(id) DO UPDATE SET name = excluded.name', (team_id, name))
+            conn.execute('DELETE FROM team_members WHERE team_id = ?', (team_id,))
+            conn.executemany('INSERT INTO team_members (team_id, user_id) VALUES (?, ?)',
+                             [(team_id, user_id) for user_id in members])
+
+    def user_teams(self, user_id: str) -> List[str]:
+        return [row[0] for row in self._connect().execute(
+            'SELECT team_id FROM team_members WHERE user_id = ?', (user_id,))]
+
+    def project_acl(self, project_id: str) -> Dict[str, int]:
+        """Freigaben eines Projekts als ``principal -> stufe`` (``user:<id>`` bzw. ``team:<id>``)."""
+        return {principal: level for principal, level in self._connect().execute(
+            'SELECT principal, level FROM project_acl WHERE project_id = ? ORDER BY principal', (project_id,))}
+
+    def access_levels(self, principals: List[str]) -> Dict[str, int]:
+        """Höchste Stufe je Projekt über alle ``principals`` (Abfrage über den Index nach Principal)."""
+        if not principals:
+            return {}
+        rows = self._connect().execute(
+            'SELECT project_id, MAX(level) FROM project_acl '
+            f"WHERE principal IN ({', '.join('?' * len(principals))}) GROUP BY project_id", principals)
+        return {project_id: level for project_id, level in rows}
+
+    def grant(self, project_ids: Iterable[str], principal: str, level: int):
+        with self.transaction() as conn:
+            for project_id in project_ids:
+                conn.execute('INSERT INTO project_acl (project_id, principal, level) VALUES (?, ?, ?) '
+                             'ON CONFLICT(project_id, principal) DO UPDATE SET level = excluded.level',
+                             (project_id, principal, level))
+                self._emit('acl_changed', project_id, data={'principal': principal, 'level': level})
+
+    def revoke(self, project_id: str, principal: str):
+        with self.transaction() as conn:
+            cursor = conn.execute('DELETE FROM project_acl WHERE project_id = ? AND principal = ?',
+                                  (project_id, principal))
+            if cursor.rowcount:
+                self._emit('acl_changed', project_id, data={'principal': principal, 'level': None})
+
+    def delete_project(self, project_id: str):
+        with self.transaction() as conn:
+            cursor = conn.execute('DELETE FROM projects WHERE id = ?', (project_id,))
+            if cursor.rowcount:
+                self._emit('project_deleted', project_id)
+
+    # Versionsstände (Deltas mit regelmäßigen Vollständen, siehe kvp.history)
+    def list_versions(self, project_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Abgelegte Stände, neueste zuerst, mit Größe und geänderten Feldern je Delta."""
+        rows = self._connect().execute(
+            'SELECT version, checkpoint, data, changed_at, origin FROM project_versions WHERE project_id = ? '
+            'ORDER BY version DESC LIMIT ?', (project_id, limit))
+        return [{'version': row['version'], 'checkpoint': bool(row['checkpoint']), 'size': len(row['data']),
+                 'changed_at': row['changed_at'], 'origin': row['origin'],
+                 'changes': [] if row['checkpoint'] else history.changed_paths(history.decode(row['data']))}
+                for row in rows]
+
+    def load_version(self, project_id: str, version: int) -> Dict[str, Any]:
+        """Stand eines Projekts zur Version ``version`` im Format von ``load_project`` (samt Aufgaben)."""
+        state = self._history_state(self._connect(), project_id, version)
+        if state is None:
+            if self.project_version(project_id) is None:
+                raise ProjectNotFound(project_id)
+            raise KeyError(f'Keine Version {version} von Projekt {project_id}')
+        return history.as_project(state[0], project_id, state[1])
+
+    def restore_version(self, project_id: str, version: int):
+        """Stellt einen früheren Stand wieder her; das ergibt eine neue Version."""
+        project = self.load_version(project_id, version)
+        project['restored_from'] = project.pop('version')
+        self.insert_projects([project])
+
+    # Kennzahlen-Zeitreihen (Messwerte als gepackte Blöcke, siehe kvp.timeseries)
+    def list_metrics(self, project_id: str) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            'SELECT m.metric, m.unit, m.target, m.lower_is_better, COALESCE(SUM(c.count), 0) AS count, '
+            'MIN(c.first_ts) AS first_ts, MAX(c.last_ts) AS last_ts FROM metrics m '
+            'LEFT JOIN metric_chunks c ON c.project_id = m.project_id AND c.metric = m.metric '
+            'WHERE m.project_id = ? GROUP BY m.metric ORDER BY m.metric', (project_id,))
+        return [dict(row, lower_is_better=bool(row['lower_is_better'])) for row in rows]
+
+    def metric_chunks(self, project_id: str, metric: str, start: Optional[float] = None,
+                      end: Optional[float] = None, last: bool = False) -> List[sqlite3.Row]:
+        """Blöcke einer Messreihe in Zeitreihenfolge, die ``[start, end]`` berühren (bzw. nur den letzten)."""
+        where = ['project_id = ?', 'metric = ?']
+        params: List[Any] = [project_id, metric]
+        if start is not None:
+            where.append('last_ts >= ?')
+            params.append(start)
+        if end is not None:
+            where.append('first_ts <= ?')
+            params.append(end)
+        order = 'DESC LIMIT 1' if last else 'ASC'
+        return self._connect().execute(
+            'SELECT chunk, first_ts, last_ts, count, timestamps, vals FROM metric_chunks '
+            f"WHERE {' AND '.join(where)} ORDER BY chunk {order}", params).fetchall()
+
+    def define_metric(self, project_id: str, metric: str, unit: str = '', target: Optional[float] = None,
+                      lower_is_better: bool = True):
+        with self.transaction() as conn:
+            if conn.execute('SELECT 1 FROM projects WHERE id = ?', (project_id,)).fetchone() is None:
+                raise ProjectNotFound(project_id)
+            conn.execute(
+                'INSERT INTO metrics (project_id, metric, unit, target, lower_is_better) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT(project_id, metric) DO UPDATE SET unit = excluded.unit, '
+                'target = excluded.target, lower_is_better = excluded.lower_is_better',
+                (project_id, metric, unit, target, int(lower_is_better)))
+            self._emit('metric_defined', project_id, data={'metric': metric, 'unit': unit, 'target': target,
+                                                            'lower_is_better': lower_is_better})
+
+    def delete_metric(self, project_id: str, metric: str):
+        with self.transaction() as conn:
+            cursor = conn.execute('DELETE FROM metrics WHERE project_id = ? AND metric = ?', (project_id, metric))
+            if cursor.rowcount:
+                self._emit('metric_deleted', project_id, data={'metric': metric})
+
+    def replace_metric_chunks(self, project_id: str, metric: str, from_chunk: int,
+                              chunks: List[tuple], added: int):
+        """Ersetzt alle Blöcke ab ``from_chunk`` durch ``(first_ts, last_ts, count, timestamps, vals)``."""
+        with self.transaction() as conn:
+            if conn.execute('SELECT 1 FROM metrics WHERE project_id = ? AND metric = ?',
+                            (project_id, metric)).fetchone() is None:
+                raise KeyError(f'Unbekannte Kennzahl: {metric}')
+            conn.execute('DELETE FROM metric_chunks WHERE project_id = ? AND metric = ? AND chunk >= ?',
+                         (project_id, metric, from_chunk))
+            conn.executemany(
+                'INSERT INTO metric_chunks (project_id, metric, chunk, first_ts, last_ts, count, timestamps, vals) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(project_id, metric, from_chunk + offset, *chunk) for offset, chunk in enumerate(chunks)])
+            self._emit('measurements_added', project_id, data={'metric': metric, 'count': added})
+
+    # Aufgaben
+    def _replace_tasks(self, conn, project_id, tasks):
+        """Gleicht die Aufgaben eines Projekts ab; bestehende Aufgaben werden aktualisiert statt neu
+        angelegt, damit ihre verschickten Erinnerungen (``reminders_sent``) erhalten bleiben."""
+        rows = [_task_row(task, project_id, position) for position, task in enumerate(tasks)]
+        kept = _unique_task_ids(rows)
+        conn.executemany('DELETE FROM tasks WHERE id = ?',
+                         [(task_id,) for task_id, in conn.execute(
+                             'SELECT id FROM tasks WHERE project_id = ?', (project_id,)) if task_id not in kept])
+        cursor = conn.executemany(_UPSERT_TASK, rows)
+        if cursor.rowcount != len(rows):
+            # Das Upsert lässt Aufgaben anderer Projekte unverändert
+            foreign = {task_id for task_id, owner in self.task_projects(list(kept)).items() if owner != project_id}
+            raise TaskIdConflict('Aufgaben-IDs gehören bereits zu einem anderen Projekt: '
+                                 + ', '.join(sorted(foreign)), foreign)
+
+    def _insert_tasks(self, conn, rows):
+        taken = set(self.task_projects(list(_unique_task_ids(rows))))
+        if taken:
+            raise TaskIdConflict('Aufgaben-IDs sind bereits vergeben: ' + ', '.join(sorted(taken)), taken)
+        conn.executemany(_INSERT_TASK, rows)
+
+    def add_task(self, project_id: str, task: Dict[str, Any]) -> str:
+        task.setdefault('id', str(uuid.uuid4()))
+        with self.transaction() as conn:
+            position = conn.execute(
+                'SELECT COALESCE(MAX(position) + 1, 0) FROM tasks WHERE project_id = ?',
+                (project_id,)).fetchone()[0]
+            self._insert_tasks(conn, [_task_row(task, project_id, position)])
+            self._emit('task_added', project_id, task['id'], data=dict(task))
+        return task['id']
+
+    def append_tasks(self, project_id: str, tasks: List[Dict[str, Any]]):
+        """Hängt viele Aufgaben in einer Transaktion an (z. B. beim Massenimport)."""
+        with self.transaction() as conn:
+            if conn.execute('SELECT 1 FROM projects WHERE id = ?', (project_id,)).fetchone() is None:
+                raise ProjectNotFound(project_id)
+            start = conn.execute(
+                'SELECT COALESCE(MAX(position) + 1, 0) FROM tasks WHERE project_id = ?',
+                (project_id,)).fetchone()[0]
+            rows = []
+            for position, task in enumerate(tasks, start=start):
+                rows.append(_task_row(task, project_id, position))
+                self._emit('task_added', project_id, task['id'], data=dict(task))
+            self._insert_tasks(conn, rows)
+
+    def update_task(self, task_id: str, expected: Optional[Dict[str, Any]] = None,
+                    **columns) -> Dict[str, Any]:
+        """Ändert Aufgabenspalten; ``expected`` wie bei ``update_project``."""
+        unknown = set(columns) - set(TASK_COLUMNS)
+        if unknown:
+            raise ValueError(f'Unbekannte Aufgabenspalten: {sorted(unknown)}')
+        if not columns:
+            return {}
+        with self.transaction() as conn:
+            row = conn.execute(f"SELECT project_id, {', '.join(TASK_COLUMNS)} FROM tasks WHERE id = ?",
+                               (task_id,)).fetchone()
+            if row is None:
+                return {}
+            changes, conflicts = _merge_columns(dict(row), columns, expected)
+            if not changes:
+                return conflicts
+            if 'status' in changes and changes['status'] != row['status']:
+                # Abschlusszeitpunkt für die Durchsatzauswertung
+                changes['completed_at'] = _completed_at(changes['status'])
+            assignments = ', '.join(f'{column} = ?' for column in changes)
+            conn.execute(f'UPDATE tasks SET {assignments} WHERE id = ?',
+                         (*changes.values(), task_id))
+            self._emit('task_updated', row['project_id'], task_id, data=changes)
+        return conflicts
+
+    def update_task_statuses(self, statuses: Dict[str, str],
+                             expected: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Mehrere Statusänderungen (``task_id -> status``) in einer Transaktion.
+
+        ``expected`` enthält den angezeigten Ausgangsstatus je Aufgabe; geliefert
+        werden die Aufgaben, deren Status inzwischen anders geändert wurde.
+        """
+        conflicts = {}
+        with self.transaction():
+            for task_id, status in statuses.items():
+                base = None if expected is None else {'status': expected[task_id]}
+                conflict = self.update_task(task_id, expected=base, status=status)
+                if conflict:
+                    conflicts[task_id] = conflict['status']
+        return conflicts
+
+    def delete_task(self, task_id: str):
+        with self.transaction() as conn:
+            row = conn.execute('SELECT project_id FROM tasks WHERE id = ?', (task_id,)).fetchone()
+            if row is None:
+                return
+            conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+            self._emit('task_deleted', row[0], task_id)
+
+
+def default_db_path() -> str:
+    return os.environ.get(
+        'KVP_DB_PATH',
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'kvp.db'))
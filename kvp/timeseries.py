@@ -0,0 +1,134 @@
+"""Messreihen für benannte Kennzahlen der Check-Phase.
+
+Messwerte (Zeitpunkt, Wert) liegen als gepackte float64-Arrays in Blöcken zu
+``CHUNK_POINTS`` Punkten (Tabelle ``metric_chunks``). Neue Messwerte werden
+an den letzten Block angehängt; nur verspätete Werte lösen ein Umsortieren
+der betroffenen Blöcke aus. Zum Zeichnen werden die Reihen vorab auf eine
+feste Zahl von Zeitfenstern verdichtet (min/max/Mittelwert je Fenster),
+sodass auch Monate an Schichtwerten mit wenigen hundert Punkten auskommen.
+"""
+
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from .storage import ProjectStore
+
+CHUNK_POINTS = 4096
+_DTYPE = '<f8'
+
+
+def to_epoch(value) -> float:
+    """``datetime``, ``date``, ISO-Text oder Zahl -> Sekunden seit 1970."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.strip())
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, date):
+        return datetime.combine(value, time()).timestamp()
+    raise ValueError(f'Ungültiger Zeitpunkt: {value!r}')
+
+
+def _pack(ts: np.ndarray, vals: np.ndarray):
+    for start in range(0, len(ts), CHUNK_POINTS):
+        part_ts = ts[start:start + CHUNK_POINTS]
+        part_vals = vals[start:start + CHUNK_POINTS]
+        yield (float(part_ts[0]), float(part_ts[-1]), len(part_ts),
+               part_ts.astype(_DTYPE).tobytes(), part_vals.astype(_DTYPE).tobytes())
+
+
+def _unpack(rows) -> Tuple[np.ndarray, np.ndarray]:
+    if not rows:
+        return np.empty(0), np.empty(0)
+    return (np.concatenate([np.frombuffer(row['timestamps'], dtype=_DTYPE) for row in rows]),
+            np.concatenate([np.frombuffer(row['vals'], dtype=_DTYPE) for row in rows]))
+
+
+def record_measurements(store: ProjectStore, project_id: str, metric: str,
+                        points: Iterable[Tuple[object, float]]) -> int:
+    """Speichert Messwerte ``(zeitpunkt, wert)``; liefert die Anzahl."""
+    points = list(points)
+    if not points:
+        return 0
+    new_ts = np.array([to_epoch(moment) for moment, _ in points], dtype=_DTYPE)
+    new_vals = np.array([float(value) for _, value in points], dtype=_DTYPE)
+    with store.transaction():
+        # Im Normalfall ist nur der letzte Block betroffen
+        rows = store.metric_chunks(project_id, metric, start=float(new_ts.min())) \
+            or store.metric_chunks(project_id, metric, last=True)
+        old_ts, old_vals = _unpack(rows)
+        ts = np.concatenate([old_ts, new_ts])
+        vals = np.concatenate([old_vals, new_vals])
+        order = np.argsort(ts, kind='stable')
+        store.replace_metric_chunks(project_id, metric, rows[0]['chunk'] if rows else 0,
+                                    list(_pack(ts[order], vals[order])), added=len(points))
+    return len(points)
+
+
+def load_series(store: ProjectStore, project_id: str, metric: str, start: Optional[float] = None,
+                end: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Zeitstempel und Werte im Bereich ``[start, end]`` (Sekunden seit 1970)."""
+    ts, vals = _unpack(store.metric_chunks(project_id, metric, start=start, end=end))
+    low = 0 if start is None else np.searchsorted(ts, start, side='left')
+    high = len(ts) if end is None else np.searchsorted(ts, end, side='right')
+    return ts[low:high], vals[low:high]
+
+
+def metric_levels(store: ProjectStore, project_id: str, metric: str, first_ts: float,
+                  points: int = 5) -> Optional[Tuple[float, float]]:
+    """Ausgangsniveau (Mittel der ersten) und aktuelles Niveau (Mittel der letzten ``points`` Werte).
+
+    Liest nur den ersten und den letzten Block der Reihe.
+    """
+    _, first = _unpack(store.metric_chunks(project_id, metric, end=first_ts)[:1])
+    _, last = _unpack(store.metric_chunks(project_id, metric, last=True))
+    if not len(first) or not len(last):
+        return None
+    return float(first[:points].mean()), float(last[-points:].mean())
+
+
+def rolling_mean(ts: np.ndarray, vals: np.ndarray, window_seconds: float) -> np.ndarray:
+    """Gleitender Mittelwert über das Zeitfenster ``(t - window, t]`` je Punkt."""
+    if not len(ts):
+        return np.empty(0)
+    sums = np.concatenate(([0.0], np.cumsum(vals)))
+    left = np.searchsorted(ts, ts - window_seconds, side='right')
+    right = np.arange(1, len(ts) + 1)
+    return (sums[right] - sums[left]) / (right - left)
+
+
+def downsample(ts: np.ndarray, vals: np.ndarray, buckets: int = 400) -> Dict[str, np.ndarray]:
+    """Verdichtet auf höchstens ``buckets`` gleich breite Zeitfenster (min/max/Mittelwert/Anzahl).
+
+    ``ts`` ist der Mittelpunkt der Messzeitpunkte je Fenster. Kurze Reihen
+    werden unverändert zurückgegeben.
+    """
+    if len(ts) <= buckets:
+        return {'ts': ts, 'min': vals, 'max': vals, 'mean': vals, 'count': np.ones(len(ts), dtype=np.int64)}
+    width = (ts[-1] - ts[0]) / buckets or 1.0
+    bucket = np.minimum(((ts - ts[0]) // width).astype(np.int64), buckets - 1)
+    starts = np.flatnonzero(np.concatenate(([True], bucket[1:] != bucket[:-1])))
+    counts = np.diff(np.concatenate((starts, [len(ts)])))
+    return {
+        'ts': np.add.reduceat(ts, starts) / counts,
+        'min': np.minimum.reduceat(vals, starts),
+        'max': np.maximum.reduceat(vals, starts),
+        'mean': np.add.reduceat(vals, starts) / counts,
+        'count': counts,
+    }
+
+
+def chart_series(store: ProjectStore, project_id: str, metric: str, start: Optional[float] = None,
+                 end: Optional[float] = None, buckets: int = 400,
+                 rolling_window_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """Für ein Diagramm aufbereitete Reihe: verdichtete Fenster, optional mit gleitendem Mittel."""
+    ts, vals = load_series(store, project_id, metric, start, end)
+    series = downsample(ts, vals, buckets)
+    if rolling_window_seconds:
+        rolling = rolling_mean(ts, vals, rolling_window_seconds)
+        series['rolling'] = downsample(ts, rolling, buckets)['mean']
+    series['points'] = len(ts)
+    return series
@@ -0,0 +1,276 @@
+"""Hintergrunddienst für Fälligkeitserinnerungen, Status-Fortschreibung und Kennzahlen.
+
+Läuft als eigener Prozess neben der Streamlit-Anwendung::
+
+    python -m kvp.worker --outbox data/outbox.jsonl
+    python -m kvp.worker --smtp localhost:1025 --smtp-to team@example.org
+
+Der Dienst hält einen ``AggregateIndex`` (inkl. Fälligkeitsindex) im
+Speicher und folgt dem Änderungsprotokoll der Ablage, liest also je Lauf nur
+die geänderten Projekte neu. Pro Lauf werden
+
+* Erinnerungen zu überfälligen und bald fälligen Aufgaben an die
+  konfigurierten Ausgänge gegeben (je Aufgabe, Art und Fälligkeit einmal),
+* der Projektstatus aus dem Aufgabenstand fortgeschrieben,
+* der Fortschritt geänderter Projekte neu berechnet (``projects.progress``).
+
+Die Ergebnisse liegen vorberechnet in der Ablage, Reruns der Oberfläche lesen
+sie nur: Status und Fortschritt je Projekt in ``projects``, die Kennzahlen des
+Laufs (überfällig, bald fällig) in ``worker_state['last_run']``. Aufgabenzahlen
+je Projekt liefert der ``AggregateIndex`` der Oberfläche, eine eigene
+Zusammenfassungstabelle ist deshalb nicht nötig.
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import smtplib
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from email.message import EmailMessage
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from .aggregates import AggregateIndex
+from .progress import refresh_progress, rolled_up_status
+from .storage import ProjectStore, current_origin, default_db_path
+
+logger = logging.getLogger(__name__)
+
+# Herkunft der Schreibzugriffe des Dienstes im Änderungsprotokoll
+WORKER_ORIGIN = 'worker'
+REMINDER_KINDS = {'overdue': "Überfällig", 'due_soon': "Bald fällig"}
+
+
+class Reminder(NamedTuple):
+    kind: str
+    task_id: str
+    project_id: str
+    project_name: str
+    task: str
+    responsible: str
+    due_date: str
+
+    def text(self) -> str:
+        due = date.fromisoformat(self.due_date)
+        return (f"{REMINDER_KINDS[self.kind]} ({due:%d.%m.%Y}): {self.task} – {self.project_name}"
+                f" · verantwortlich: {self.responsible or 'nicht zugewiesen'}")
+
+
+class ReminderSink:
+    """Ausgang für Erinnerungen; ``send`` wirft bei Fehlern, dann wird im nächsten Lauf erneut versucht."""
+
+    def send(self, reminders: List[Reminder]):
+        raise NotImplementedError
+
+
+class FileSink(ReminderSink):
+    """Hängt Erinnerungen als JSON-Zeilen an eine Ausgangsdatei an."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def send(self, reminders: List[Reminder]):
+        queued_at = datetime.now().isoformat(timespec='seconds')
+        with open(self.path, 'a', encoding='utf-8') as outbox:
+            for reminder in reminders:
+                outbox.write(json.dumps({**reminder._asdict(), 'text': reminder.text(),
+                                         'queued_at': queued_at}, ensure_ascii=False) + '\n')
+
+
+class SmtpSink(ReminderSink):
+    """Verschickt je Lauf eine Sammelmail, z. B. an einen lokalen Test-SMTP-Server."""
+
+    def __init__(self, host: str = 'localhost', port: int = 1025, sender: str = 'kvp-tool@localhost',
+                 recipients: Sequence[str] = ()):
+        if not recipients:
+            raise ValueError('SmtpSink benötigt mindestens einen Empfänger')
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = list(recipients)
+
+    def send(self, reminders: List[Reminder]):
+        by_responsible = defaultdict(list)
+        for reminder in reminders:
+            by_responsible[reminder.responsible or 'Nicht zugewiesen'].append(reminder)
+        lines = []
+        for responsible, items in sorted(by_responsible.items()):
+            lines.append(f'{responsible}:')
+            lines.extend(f'  - {reminder.text()}' for reminder in items)
+            lines.append('')
+        message = EmailMessage()
+        message['Subject'] = f'KVP-Tool: {len(reminders)} Erinnerungen zu Aufgaben'
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message.set_content('\n'.join(lines))
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            smtp.send_message(message)
+
+
+class Worker:
+    """Ein Lauf (``run_once``) ist idempotent; ``run_forever`` wiederholt ihn im festen Takt."""
+
+    def __init__(self, store: ProjectStore, sinks: Sequence[ReminderSink] = (), interval_seconds: float = 60,
+                 reminder_days: int = 3, max_reminders: int = 500):
+        self.store = store
+        self.sinks = list(sinks)
+        self.interval_seconds = interval_seconds
+        self.reminder_days = reminder_days
+        self.max_reminders = max_reminders
+        self.aggregates = AggregateIndex()
+        self._change_seq = 0
+        self._loaded = False
+        self._sent: Optional[set] = None
+
+    # Änderungen verfolgen
+    def _changed_projects(self) -> set:
+        """Seit dem letzten Lauf geänderte Projekte; beim ersten Lauf oder nach einer Lücke alle."""
+        changes = None if not self._loaded else self.store.changes_since(self._change_seq, limit=100000)
+        if changes is None:
+            # Protokollstand vor dem Einlesen merken, damit nichts verloren geht
+            self._change_seq = self.store.last_change_seq()
+            self.aggregates.load(self.store)
+            self._sent = None
+            self._loaded = True
+            return set(self.aggregates.project_ids())
+        if not changes:
+            return set()
+        self._change_seq = changes[-1]['seq']
+        # Neu berechneter Fortschritt (auch der eigene) ändert weder Aufgaben noch Status
+        changed = {change['project_id'] for change in changes if not change['derived']}
+        self.aggregates.reload_projects(self.store, changed)
+        return changed
+
+    # Status-Fortschreibung
+    def roll_up_statuses(self, project_ids) -> int:
+        updates = []
+        for project_id in project_ids:
+            status = self.aggregates.project_status(project_id)
+            new_status = rolled_up_status(status, self.aggregates.task_counts(project_id))
+            if status is not None and new_status is not None:
+                updates.append((project_id, status, new_status))
+        if not updates:
+            return 0
+        changed = 0
+        token = current_origin.set(WORKER_ORIGIN)
+        try:
+            with self.store.transaction():
+                for project_id, status, new_status in updates:
+                    # Nur übernehmen, wenn niemand den Status zwischenzeitlich geändert hat
+                    if not self.store.update_project(project_id, expected={'status': status}, status=new_status):
+                        changed += 1
+                        logger.info('Projekt %s: Status %s -> %s', project_id, status, new_status)
+        finally:
+            current_origin.reset(token)
+        return changed
+
+    # Erinnerungen
+    def queue_reminders(self, today: date) -> int:
+        if not self.sinks:
+            return 0
+        candidates = ([('overdue', day, task_id)
+                       for day, task_id in self.aggregates.overdue_tasks(limit=None, today=today)]
+                      + [('due_soon', day, task_id)
+                         for day, task_id in self.aggregates.due_soon_tasks(self.reminder_days, today)])
+        if not candidates:
+            return 0
+        if self._sent is None:
+            self._sent = self.store.sent_reminders()
+        pending = [(task_id, kind, day.isoformat()) for kind, day, task_id in candidates
+                   if (task_id, kind, day.isoformat()) not in self._sent][:self.max_reminders]
+        if not pending:
+            return 0
+        tasks = {task['id']: task for task in self.store.load_tasks_by_id([key[0] for key in pending])}
+        reminders = [Reminder(kind, task_id, tasks[task_id]['project_id'], tasks[task_id]['project_name'],
+                              tasks[task_id]['task'], tasks[task_id]['responsible'], due_date)
+                     for task_id, kind, due_date in pending if task_id in tasks]
+        for sink in self.sinks:
+            try:
+                sink.send(reminders)
+            except Exception:
+                logger.exception('Erinnerungen über %s fehlgeschlagen, neuer Versuch im nächsten Lauf',
+                                  type(sink).__name__)
+                return 0
+        keys = [(r.task_id, r.kind, r.due_date) for r in reminders]
+        self.store.mark_reminders_sent(keys)
+        self._sent.update(keys)
+        return len(reminders)
+
+    def run_once(self, today: Optional[date] = None) -> Dict[str, Any]:
+        started = time.perf_counter()
+        today = today or date.today()
+        changed = self._changed_projects()
+        token = current_origin.set(WORKER_ORIGIN)
+        try:
+            progress = refresh_progress(self.store, changed)
+        finally:
+            current_origin.reset(token)
+        stats = {
+            'changed_projects': len(changed),
+            'progress_updates': len(progress),
+            'status_updates': self.roll_up_statuses(changed),
+            'reminders': self.queue_reminders(today),
+            'overdue': self.aggregates.overdue_count(today=today),
+            'due_soon': self.aggregates.due_soon_count(self.reminder_days, today=today),
+        }
+        stats['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        stats['finished_at'] = datetime.now().isoformat(timespec='seconds')
+        self.store.set_worker_state('last_run', stats)
+        return stats
+
+    def run_forever(self, stop: Optional[threading.Event] = None):
+        stop = stop or threading.Event()
+        while True:
+            try:
+                stats = self.run_once()
+                logger.info('Lauf beendet: %s', stats)
+            except Exception:
+                logger.exception('Lauf des Hintergrunddienstes fehlgeschlagen')
+            if stop.wait(self.interval_seconds):
+                return
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Hintergrunddienst: Erinnerungen, Statusfortschreibung, Kennzahlen')
+    parser.add_argument('--db', default=default_db_path(), help='SQLite-Datenbank')
+    parser.add_argument('--interval', type=float, default=60, help='Sekunden zwischen zwei Läufen')
+    parser.add_argument('--once', action='store_true', help='Nur einen Lauf ausführen')
+    parser.add_argument('--reminder-days', type=int, default=3, help='Vorlauf für "bald fällig" in Tagen')
+    parser.add_argument('--outbox', help='Erinnerungen als JSON-Zeilen an diese Datei anhängen')
+    parser.add_argument('--smtp', metavar='HOST:PORT', help='Erinnerungen per SMTP verschicken')
+    parser.add_argument('--smtp-from', default='kvp-tool@localhost')
+    parser.add_argument('--smtp-to', action='append', default=[], help='Empfänger (mehrfach möglich)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    sinks: List[ReminderSink] = []
+    if args.outbox:
+        sinks.append(FileSink(args.outbox))
+    if args.smtp:
+        if not args.smtp_to:
+            parser.error('--smtp benötigt mindestens ein --smtp-to')
+        host, _, port = args.smtp.partition(':')
+        sinks.append(SmtpSink(host or 'localhost', int(port or 25), args.smtp_from, args.smtp_to))
+
+    worker = Worker(ProjectStore(args.db), sinks, interval_seconds=args.interval,
+                    reminder_days=args.reminder_days)
+    if args.once:
+        print(json.dumps(worker.run_once(), ensure_ascii=False))
+        return 0
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        worker.run_forever(stop)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
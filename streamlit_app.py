@@ -1,11 +1,35 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import json
+import csv
+import gzip
+import functools
+import html
+import io
+import os
+import re
 from typing import Dict, List, Any
 import uuid
+from collections import Counter
+
+from kvp import charts, profiling
+from kvp.access import (EVERYONE, LEVEL_LABELS, ROLES, PermissionDenied, ScopedStore, compile_permissions,
+                        ensure_admin, team_principal, user_principal)
+from kvp.aggregates import AggregateIndex, TASK_STATUSES
+from kvp.autosave import AutoSaver
+from kvp.cache import VersionedCache
+from kvp.exporter import export_jsonl, export_parquet
+from kvp.importer import PROJECT_STATUSES, detect_format, import_stream
+from kvp.journal import EventJournal, current_actor, default_journal_dir
+from kvp.progress import ProgressTracker
+from kvp.reports import REPORT_FORMATS, ReportPool
+from kvp.sample import create_sample_project
+from kvp.search import SearchIndex
+from kvp.timeseries import chart_series, record_measurements, to_epoch
+from kvp.worker import WORKER_ORIGIN
+from kvp.storage import PHASES, ProjectStore, ProjectNotFound, TaskIdConflict, current_origin, default_db_path
+
+STYLESHEET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'kvp.css')
 
 # Konfiguration der Seite
 st.set_page_config(
@@ -15,129 +39,1100 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# CSS für modernes Design
-st.markdown("""
-<style>
-    .pdca-header {
-        background: linear-gradient(90deg, #FF6B6B, #4ECDC4, #45B7D1, #96CEB4);
-        padding: 20px;
-        border-radius: 10px;
-        text-align: center;
-        color: white;
-        font-size: 24px;
-        font-weight: bold;
-        margin-bottom: 20px;
-    }
-    
-    .phase-card {
-        padding: 15px;
-        border-radius: 10px;
-        margin: 10px 0;
-        border-left: 5px solid;
-    }
-    
-    .plan-card { border-left-color: #FF6B6B; background-color: #FFE5E5; }
-    .do-card { border-left-color: #4ECDC4; background-color: #E5F9F6; }
-    .check-card { border-left-color: #45B7D1; background-color: #E5F3FF; }
-    .act-card { border-left-color: #96CEB4; background-color: #E5F5E5; }
-    
-    .task-completed { text-decoration: line-through; opacity: 0.6; }
-    .priority-high { border-left: 3px solid #FF4444; }
-    .priority-medium { border-left: 3px solid #FFA500; }
-    .priority-low { border-left: 3px solid #4CAF50; }
-    
-    .metric-card {
-        background: white;
-        padding: 20px;
-        border-radius: 10px;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        text-align: center;
-    }
-</style>
-""", unsafe_allow_html=True)
+# CSS für modernes Design: einmal pro Prozess gelesen und verdichtet, jeder Durchlauf sendet nur den fertigen Block
+@st.cache_resource
+def get_stylesheet():
+    with open(STYLESHEET_PATH, encoding='utf-8') as css_file:
+        css = css_file.read()
+    return '<style>' + re.sub(r'\s*([{};:,])\s*', r'\1', re.sub(r'\s+', ' ', css)).strip() + '</style>'
+
+st.markdown(get_stylesheet(), unsafe_allow_html=True)
+
+# Gemeinsame Projektablage (eine Instanz pro Prozess, von allen Sessions geteilt)
+@st.cache_resource
+def get_store():
+    return ProjectStore(default_db_path())
+
+# Kennung dieses Prozesses; Herkunft aller Sessions im Änderungsprotokoll ist "<prozess>:<session>"
+@st.cache_resource
+def get_process_origin():
+    return f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+# Geteilter Lese-Cache aller Sessions, invalidiert über die Änderungsereignisse der Projekte
+@st.cache_resource
+def get_cache():
+    cache = VersionedCache()
+    get_store().subscribe(cache.apply)
+    get_profiler().add_collector(cache.prometheus_lines)
+    return cache
+
+# Kennzahlen-Index, wird einmal aufgebaut und danach über Änderungsereignisse gepflegt
+@st.cache_resource
+def get_aggregates():
+    store = get_store()
+    index = AggregateIndex()
+    store.subscribe(index.apply)
+    index.load(store)
+    return index
+
+# Portfolio-Auswertung (DataFrames), wird bei Änderungen projektweise nachgeladen; pandas lädt erst
+# mit dem ersten Portfolio-Dashboard
+@st.cache_resource
+def get_analytics():
+    from kvp.analytics import PortfolioAnalytics
+
+    store = get_store()
+    analytics = PortfolioAnalytics(store, cache=get_cache())
+    store.subscribe(analytics.apply)
+    get_loaded_resources()['analytics'] = analytics
+    return analytics
+
+# Erst bei Bedarf angelegte Ressourcen, soweit bereits vorhanden
+@st.cache_resource
+def get_loaded_resources():
+    return {}
+
+# Änderungen aus anderen Prozessen (``None``: alle); eine noch nicht angelegte Auswertung liest ohnehin
+# den aktuellen Stand
+def invalidate_analytics(project_ids):
+    analytics = get_loaded_resources().get('analytics')
+    if analytics is not None:
+        analytics.invalidate(project_ids)
+
+# Ereignisjournal aller Änderungen (Audit-Historie und "Letzte Aktionen")
+@st.cache_resource
+def get_journal():
+    journal = EventJournal(default_journal_dir(default_db_path()))
+    journal.attach(get_store())
+    return journal
+
+# Fortschritt je Projekt, wird nach Änderungsereignissen neu berechnet und in der Datenbank abgelegt
+@st.cache_resource
+def get_progress_tracker():
+    store = get_store()
+    tracker = ProgressTracker(store)
+    store.subscribe(tracker.apply)
+    tracker.load()
+    tracker.start(origin=f"{get_process_origin()}:progress")
+    return tracker
+
+# Laufzeitmessung aller Reruns (Debug-Panel, Log, Prometheus-Textdatei)
+@st.cache_resource
+def get_profiler():
+    return profiling.Profiler()
+
+# Volltext-Suchindex, wird einmal aufgebaut und danach feldweise nachgeführt
+@st.cache_resource
+def get_search_index():
+    store = get_store()
+    index = SearchIndex()
+    store.subscribe(index.apply)
+    index.load(store)
+    return index
+
+# A3-Berichte werden in eigenen Prozessen erzeugt (Anzahl über KVP_REPORT_WORKERS, Standard alle Kerne)
+@st.cache_resource
+def get_report_pool():
+    return ReportPool(default_db_path(), workers=int(os.environ.get('KVP_REPORT_WORKERS', 0)) or None)
+
+# Rechte eines Benutzers, gelten bis zur nächsten Änderung an Projekten oder Freigaben
+def get_permissions(user_id):
+    return get_cache().get_or_compute("permissions", user_id, lambda: compile_permissions(get_store(), user_id))
+
+# Angemeldeter Benutzer: vom vorgeschalteten Login-Proxy per Header (KVP_USER_HEADER), sonst KVP_USER
+def current_user_id():
+    header = os.environ.get('KVP_USER_HEADER')
+    context = getattr(st, 'context', None)
+    if header and context is not None:
+        user_id = context.headers.get(header)
+        if user_id:
+            return user_id
+    return os.environ.get('KVP_USER', 'admin')
+
+AUTOSAVE_DEBOUNCE_SECONDS = 2.0
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports')
+ACTION_ICONS = {
+    'project_saved': "➕",
+    'project_updated': "✏️",
+    'project_deleted': "🗑️",
+    'fields_written': "📝",
+    'task_added': "📌",
+    'task_updated': "✅",
+    'task_deleted': "🗑️",
+    'metric_defined': "📈",
+    'metric_deleted': "🗑️",
+    'measurements_added': "📈",
+    'acl_changed': "🔐"
+}
+METRIC_RANGES = {"7 Tage": 7, "30 Tage": 30, "90 Tage": 90, "Alles": None}
+METRIC_CHART_BUCKETS = 400
+TASK_SORT_LABELS = {
+    'position': "Reihenfolge",
+    'due_date': "Fälligkeit",
+    'status': "Status",
+    'responsible': "Verantwortlich",
+    'task': "Aufgabe"
+}
 
 # Initialisierung der Session State
 def init_session_state():
-    if 'projects' not in st.session_state:
-        st.session_state.projects = {}
+    if 'user_id' not in st.session_state:
+        # Die erste Anmeldung einer neuen Installation wird Admin
+        st.session_state.user_id = current_user_id()
+        ensure_admin(get_store(), st.session_state.user_id)
+    try:
+        permissions = get_permissions(st.session_state.user_id)
+    except PermissionDenied:
+        st.error(f"Kein Zugang für Benutzer „{st.session_state.user_id}“. Bitte wenden Sie sich an einen Admin.")
+        st.stop()
+    # Alle Zugriffe der Sitzung laufen über die Ablage mit Rechteprüfung
+    if 'store' not in st.session_state:
+        st.session_state.store = ScopedStore(get_store(), permissions)
+    st.session_state.store.permissions = permissions
+    if 'autosave' not in st.session_state:
+        st.session_state.autosave = AutoSaver(st.session_state.store, debounce_seconds=AUTOSAVE_DEBOUNCE_SECONDS)
     if 'current_project' not in st.session_state:
         st.session_state.current_project = None
-    if 'user_role' not in st.session_state:
-        st.session_state.user_role = 'Admin'
     if 'tasks' not in st.session_state:
         st.session_state.tasks = {}
     if 'comments' not in st.session_state:
         st.session_state.comments = {}
+    if 'report_batch' not in st.session_state:
+        st.session_state.report_batch = None
+        st.session_state.report_zip = None
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = f"{get_process_origin()}:{uuid.uuid4()}"
+        st.session_state.change_seq = get_store().last_change_seq()
+        st.session_state.sync_notices = []
+    bind_session_context()
 
-# Beispieldaten erstellen
-def create_sample_project():
-    sample_id = str(uuid.uuid4())
-    return {
-        'id': sample_id,
-        'name': 'Beispiel: Reduzierung der Wartezeiten',
-        'description': 'Wartezeiten in der Produktion um 30% reduzieren',
-        'created_date': datetime.now().strftime('%Y-%m-%d'),
-        'status': 'in_progress',
-        'plan': {
-            'problem': 'Lange Wartezeiten zwischen Produktionsschritten',
-            'goal': 'Wartezeiten um 30% reduzieren',
-            'root_cause': 'Unausgewogene Maschinenkapazitäten',
-            'measures': ['Maschinenanalyse', 'Prozessoptimierung', 'Schulung']
-        },
-        'do': {
-            'implementation_steps': [
-                {'task': 'Maschinenauslastung analysieren', 'responsible': 'Max Mustermann', 'due_date': '2024-07-15', 'status': 'completed'},
-                {'task': 'Engpässe identifizieren', 'responsible': 'Anna Schmidt', 'due_date': '2024-07-20', 'status': 'in_progress'},
-                {'task': 'Optimierungsmaßnahmen implementieren', 'responsible': 'Tom Weber', 'due_date': '2024-07-30', 'status': 'open'}
-            ]
-        },
-        'check': {
-            'metrics': {'wartezeit_vorher': 45, 'wartezeit_nachher': 32, 'verbesserung_prozent': 28.9},
-            'results': 'Wartezeiten konnten um 28.9% reduziert werden'
-        },
-        'act': {
-            'standardization': 'Neue Arbeitsanweisungen erstellt',
-            'lessons_learned': 'Regelmäßige Kapazitätsanalyse ist essentiell',
-            'next_steps': 'Ausweitung auf andere Produktionslinien'
-        }
-    }
+# Schreibzugriffe dieser Session im Änderungsprotokoll und Journal kennzeichnen. Die Kontextvariablen
+# gelten je Thread; Fragment-Reruns laufen in einem neuen Thread und müssen sie selbst setzen.
+def bind_session_context():
+    current_origin.set(st.session_state.session_id)
+    current_actor.set(st.session_state.user_id)
 
-# Fortschrittsberechnung
-def calculate_progress(project_data):
-    phases = ['plan', 'do', 'check', 'act']
-    completed_phases = 0
-    
-    if project_data.get('plan', {}).get('problem'):
-        completed_phases += 0.25
-    if project_data.get('do', {}).get('implementation_steps'):
-        completed_phases += 0.25
-    if project_data.get('check', {}).get('results'):
-        completed_phases += 0.25
-    if project_data.get('act', {}).get('standardization'):
-        completed_phases += 0.25
-    
-    return min(completed_phases * 100, 100)
+def session_store():
+    return st.session_state.store
+
+def permissions():
+    return st.session_state.store.permissions
+
+# Zeitangabe für "Letzte Aktionen"
+def format_when(timestamp):
+    moment = datetime.fromisoformat(timestamp)
+    days = (datetime.now().date() - moment.date()).days
+    if days == 0:
+        return f"heute {moment:%H:%M}"
+    if days == 1:
+        return "gestern"
+    return f"{moment:%d.%m.%Y}"
+
+# Suchtreffer öffnen (wie ein Projektwechsel über die Auswahlliste)
+def on_search_select(project_id):
+    if project_id != st.session_state.current_project:
+        st.session_state.autosave.flush(force=True)
+    st.session_state.current_project = project_id
+
+# Aufgaben werden über ihre stabile ID angesprochen; die Callbacks laufen vor dem
+# nächsten Rerun, sodass Widget-Zustände anderer Aufgaben erhalten bleiben
+def on_task_status_change(task_id, shown_status):
+    key = f"status_{task_id}"
+    conflicts = session_store().update_task(task_id, expected={'status': shown_status},
+                                        status=st.session_state[key])
+    if conflicts:
+        st.session_state[key] = conflicts['status']
+        st.session_state.sync_notices.append(
+            "Der Aufgabenstatus wurde inzwischen in einer anderen Sitzung geändert; der aktuelle Stand wird angezeigt.")
+
+def on_project_rename(project_id, shown_name):
+    key = f"proj_name_{project_id}"
+    conflicts = session_store().update_project(project_id, expected={'name': shown_name}, name=st.session_state[key])
+    if conflicts:
+        st.session_state[key] = conflicts['name']
+        st.session_state.sync_notices.append(
+            "Der Projektname wurde inzwischen in einer anderen Sitzung geändert; der aktuelle Stand wird angezeigt.")
+
+# Eigene Schreibzugriffe laufen über Callbacks, der Datenbankstand gleicht dem Widget-Zustand also
+# schon vor dem nächsten Rerun. Weicht er ab, hat eine andere Sitzung geändert: Widget neu aufbauen.
+def sync_widget(key, stored_value):
+    if key in st.session_state and st.session_state[key] != stored_value:
+        del st.session_state[key]
+
+def on_task_delete(task_id):
+    session_store().delete_task(task_id)
+    st.session_state.pop(f"status_{task_id}", None)
+
+# Autosave- und Sync-Status; läuft als Fragment periodisch, damit vorgemerkte Änderungen auch ohne
+# weitere Eingabe gespeichert und Änderungen anderer Sitzungen am aktiven Projekt übernommen werden
+def render_autosave_status():
+    bind_session_context()
+    saver = st.session_state.autosave
+    saver.flush()
+
+    store = get_store()
+    changes = store.changes_since(st.session_state.change_seq)
+    if changes is None:
+        # Lücke im Protokoll: alle Indizes des Prozesses neu aufbauen
+        st.session_state.change_seq = store.last_change_seq()
+        get_aggregates().load(store)
+        get_search_index().load(store)
+        invalidate_analytics(None)
+        get_cache().invalidate()
+        remote_change = True
+    else:
+        if changes:
+            st.session_state.change_seq = changes[-1]['seq']
+        # Neu berechneter Fortschritt ist keine Bearbeitung in einer anderen Sitzung
+        remote_change = any(change['project_id'] == st.session_state.current_project and not change['derived']
+                            and change['origin'] != st.session_state.session_id for change in changes)
+        # Änderungen anderer Prozesse (Hintergrunddienst, weitere Streamlit-Server, Import über die
+        # Kommandozeile) erreichen die Indizes nicht über Ereignisse und werden hier nachgelesen
+        own_prefix = f"{get_process_origin()}:"
+        foreign_projects = {change['project_id'] for change in changes
+                            if not (change['origin'] or '').startswith(own_prefix)}
+        if foreign_projects:
+            get_aggregates().reload_projects(store, foreign_projects)
+            get_search_index().reload_projects(store, foreign_projects)
+            invalidate_analytics(foreign_projects)
+            get_cache().invalidate(foreign_projects)
+        worker_projects = {change['project_id'] for change in changes
+                           if change['origin'] == WORKER_ORIGIN and not change['derived']}
+        if st.session_state.current_project in worker_projects:
+            st.session_state.sync_notices.append("⚙️ Der Projektstatus wurde aus dem Aufgabenstand fortgeschrieben.")
+            st.rerun()
+    if remote_change and st.session_state.current_project:
+        st.session_state.sync_notices.append("🔄 Das Projekt wurde in einer anderen Sitzung geändert und neu geladen.")
+        st.rerun()
+
+    for conflict in saver.conflicts:
+        st.session_state.sync_notices.append(
+            f"⚠️ Konflikt in {conflict.phase.capitalize()} / {conflict.field}: gleichzeitig in einer anderen "
+            f"Sitzung geändert, deren Fassung wurde übernommen. Ihre Eingabe: {conflict.mine}")
+    saver.conflicts.clear()
+    for notice in st.session_state.sync_notices:
+        st.warning(notice)
+    st.session_state.sync_notices = []
+
+    stats = saver.rerun_stats
+    if saver.has_pending:
+        st.caption("💾 Ungespeicherte Änderungen …")
+    else:
+        st.caption(f"💾 Gespeichert · {stats['writes']} Schreibvorgänge / {stats['bytes']} Bytes in diesem Durchlauf")
+
+# Eigener Messpunkt; als Fragment-Rerun ein eigener Durchlauf, sonst Abschnitt des umgebenden Reruns
+def profiled(name, render):
+    @functools.wraps(render)
+    def run(*args, **kwargs):
+        with get_profiler().run(name):
+            return render(*args, **kwargs)
+    return run
+
+render_autosave_status = profiled("autosave", render_autosave_status)
+if hasattr(st, 'fragment'):
+    render_autosave_status = st.fragment(run_every=AUTOSAVE_DEBOUNCE_SECONDS)(render_autosave_status)
+
+# Fortschritt eines laufenden Berichtsauftrags; nach Abschluss ein voller Rerun für die Downloads
+def render_report_progress():
+    batch = st.session_state.report_batch
+    if batch.finished:
+        st.rerun()
+    st.progress(batch.done / batch.total, text=f"{batch.done} von {batch.total} Berichten fertig …")
+
+if hasattr(st, 'fragment'):
+    render_report_progress = st.fragment(run_every=1.0)(render_report_progress)
+
+def render_report_downloads(batch):
+    for project_id, error in list(batch.errors().items())[:3]:
+        st.error(f"{project_id}: {error}")
+    results = batch.results()
+    if len(results) == 1:
+        with open(results[0]['path'], 'rb') as report_file:
+            st.download_button(f"💾 {batch.fmt.upper()} herunterladen", report_file,
+                               file_name=f"A3_{results[0]['name'].replace(' ', '_')}.{batch.fmt}",
+                               key="download_report", use_container_width=True)
+    elif results:
+        if st.session_state.report_zip is None:
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            st.session_state.report_zip = batch.write_zip(os.path.join(EXPORT_DIR, f"berichte_{stamp}.zip"))
+        with open(st.session_state.report_zip, 'rb') as zip_file:
+            st.download_button(f"💾 {len(results)} Berichte (ZIP) herunterladen", zip_file,
+                               file_name=os.path.basename(st.session_state.report_zip),
+                               key="download_reports", use_container_width=True)
+    else:
+        st.info("Keine Projekte ausgewählt.")
+    if st.button("✖ Schließen", key="close_reports"):
+        st.session_state.report_batch = None
+        st.rerun()
+
+# Plan-Phase
+def render_plan(current_proj):
+    saver = st.session_state.autosave
+
+    with st.container():
+        st.markdown('<div class="card-title">📋 Plan - Planen</div>', unsafe_allow_html=True)
+
+        if permissions().can_write(current_proj['id']):
+            # Problemdefinition
+            with st.container():
+                st.subheader("Problemdefinition")
+                problem = st.text_area("Was ist das Problem?", 
+                                     current_proj.get('plan', {}).get('problem', ''),
+                                     help="Beschreiben Sie das Problem konkret und messbar",
+                                     label_visibility="collapsed")
+
+            # Zielsetzung
+            with st.container():
+                st.subheader("Zielsetzung")
+                goal = st.text_area("Was ist das Ziel?", 
+                                  current_proj.get('plan', {}).get('goal', ''),
+                                  help="SMART-Ziele: Spezifisch, Messbar, Erreichbar, Relevant, Terminiert",
+                                  label_visibility="collapsed")
+
+            # Ursachenanalyse
+            with st.container():
+                st.subheader("Ursachenanalyse")
+                root_cause = st.text_area("Was sind die Hauptursachen?", 
+                                        current_proj.get('plan', {}).get('root_cause', ''),
+                                        help="Nutzen Sie 5-Why, Ishikawa-Diagramm oder andere Analysemethoden",
+                                        label_visibility="collapsed")
+
+            # Maßnahmenplanung
+            with st.container():
+                st.subheader("Maßnahmenplanung")
+                measures_text = st.text_area("Geplante Maßnahmen (eine pro Zeile):", 
+                                           '\n'.join(current_proj.get('plan', {}).get('measures', [])),
+                                           label_visibility="collapsed")
+                measures = [m.strip() for m in measures_text.split('\n') if m.strip()]
+
+            # Automatisches Speichern
+            if 'plan' not in current_proj:
+                current_proj['plan'] = {}
+            current_proj['plan'].update({
+                'problem': problem,
+                'goal': goal,
+                'root_cause': root_cause,
+                'measures': measures
+            })
+            saver.stage(current_proj['id'], 'plan', current_proj['plan'])
+        else:
+            # Nur anzeigen für Leser
+            plan_data = current_proj.get('plan', {})
+            if plan_data.get('problem'):
+                with st.container():
+                    st.markdown("**Problem:**")
+                    st.markdown(f'<div class="card">{plan_data["problem"]}</div>', unsafe_allow_html=True)
+            if plan_data.get('goal'):
+                with st.container():
+                    st.markdown("**Ziel:**")
+                    st.markdown(f'<div class="card">{plan_data["goal"]}</div>', unsafe_allow_html=True)
+            if plan_data.get('root_cause'):
+                with st.container():
+                    st.markdown("**Ursachen:**")
+                    st.markdown(f'<div class="card">{plan_data["root_cause"]}</div>', unsafe_allow_html=True)
+            if plan_data.get('measures'):
+                with st.container():
+                    st.markdown("**Maßnahmen:**")
+                    measures_html = '<div class="card">' + ''.join([f'<div class="file-browser-item"><span class="file-browser-item-icon">•</span><div class="file-browser-item-text">{measure}</div></div>' for measure in plan_data['measures']]) + '</div>'
+                    st.markdown(measures_html, unsafe_allow_html=True)
+
+# Do-Phase
+def render_do(current_proj):
+    store = session_store()
+    aggregates = get_aggregates()
+
+    with st.container():
+        st.markdown('<div class="card-title">🔨 Do - Umsetzen</div>', unsafe_allow_html=True)
+
+        # Aufgaben-Management
+        st.subheader("Aufgaben-Tracking")
+
+        if permissions().can_write(current_proj['id']):
+            # Neue Aufgabe hinzufügen
+            with st.expander("➕ Neue Aufgabe hinzufügen"):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    new_task = st.text_input("Aufgabe:")
+                with col2:
+                    new_responsible = st.text_input("Verantwortlich:")
+                with col3:
+                    new_date = st.date_input("Fälligkeitsdatum:")
+
+                if st.button("Aufgabe hinzufügen") and new_task:
+                    store.add_task(current_proj['id'], {
+                        'id': str(uuid.uuid4()),
+                        'task': new_task,
+                        'responsible': new_responsible,
+                        'due_date': new_date.strftime('%Y-%m-%d'),
+                        'status': 'open',
+                        'priority': 'medium'
+                    })
+                    st.rerun()
+
+        # Aufgabenliste anzeigen (gefiltert, sortiert und seitenweise; nur die sichtbare Seite erzeugt Widgets)
+        task_total = aggregates.task_counts(current_proj['id'])['total']
+        if task_total:
+            with st.expander("🔎 Filter & Sortierung"):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    status_filter = st.multiselect("Status:", TASK_STATUSES, key="task_filter_status")
+                    responsible_filter = st.selectbox("Verantwortlich:",
+                                                      ['Alle'] + store.task_responsibles(current_proj['id']),
+                                                      key="task_filter_responsible")
+                with col2:
+                    due_range = st.date_input("Fällig zwischen:", value=(), key="task_filter_due")
+                    order_by = st.selectbox("Sortieren nach:", list(TASK_SORT_LABELS),
+                                            format_func=TASK_SORT_LABELS.get, key="task_sort")
+                with col3:
+                    descending = st.checkbox("Absteigend", key="task_sort_desc")
+                    page_size = st.selectbox("Aufgaben pro Seite:", [10, 25, 50, 100], index=1,
+                                             key="task_page_size")
+
+            page = st.session_state.get('task_page', 1)
+            page_tasks, matching = store.query_tasks(
+                current_proj['id'],
+                statuses=status_filter,
+                responsible=None if responsible_filter == 'Alle' else responsible_filter,
+                due_from=due_range[0].isoformat() if len(due_range) > 0 else None,
+                due_to=due_range[1].isoformat() if len(due_range) > 1 else None,
+                order_by=order_by,
+                descending=descending,
+                limit=page_size,
+                offset=(page - 1) * page_size
+            )
+            page_count = max(1, -(-matching // page_size))
+            if page > page_count:
+                st.session_state.task_page = page_count
+                st.rerun()
+
+            view_mode = "Liste"
+            if permissions().can_write(current_proj['id']):
+                view_mode = st.radio("Ansicht:", ["Liste", "Tabelle bearbeiten"], horizontal=True,
+                                     key="task_view_mode", label_visibility="collapsed")
+
+            if view_mode == "Tabelle bearbeiten":
+                # pandas erst für den Tabelleneditor laden, nicht beim Start
+                import pandas as pd
+
+                # Mehrere Statusänderungen mit einem Absenden (ein Rerun statt einer pro Aufgabe)
+                with st.form(f"task_grid_{current_proj['id']}"):
+                    edited = st.data_editor(
+                        pd.DataFrame(list(page_tasks.values()),
+                                     columns=['id', 'task', 'responsible', 'due_date', 'status']).set_index('id'),
+                        column_order=['task', 'responsible', 'due_date', 'status'],
+                        column_config={
+                            'task': "Aufgabe",
+                            'responsible': "Verantwortlich",
+                            'due_date': "Fällig",
+                            'status': st.column_config.SelectboxColumn("Status", options=TASK_STATUSES, required=True)
+                        },
+                        disabled=['task', 'responsible', 'due_date'],
+                        hide_index=True,
+                        use_container_width=True
+                    )
+                    if st.form_submit_button("💾 Status übernehmen"):
+                        changes = {task_id: status for task_id, status in edited['status'].items()
+                                   if status != page_tasks[task_id]['status']}
+                        if changes:
+                            conflicts = store.update_task_statuses(
+                                changes, expected={task_id: page_tasks[task_id]['status'] for task_id in changes})
+                            if conflicts:
+                                st.session_state.sync_notices.append(
+                                    f"{len(conflicts)} Aufgaben wurden inzwischen in einer anderen Sitzung geändert "
+                                    "und nicht überschrieben.")
+                            st.rerun()
+            else:
+                for task_id, task in page_tasks.items():
+                    status_class = f"status-{task['status']}"
+                    task_class = "task-completed" if task['status'] == 'completed' else ""
+
+                    with st.container():
+                        st.markdown(f"""
+                        <div class="task-item">
+                            <span class="{status_class} status-indicator"></span>
+                            <div class="file-browser-item-text {task_class}" style="flex-grow:1">{task["task"]}</div>
+                            <div style="margin-right:15px;">👤 {task['responsible']}</div>
+                            <div style="margin-right:15px;">📅 {task['due_date']}</div>
+                        """, unsafe_allow_html=True)
+
+                        col1, col2 = st.columns([5, 1])
+                        with col1:
+                            if permissions().can_write(current_proj['id']):
+                                sync_widget(f"status_{task_id}", task['status'])
+                                st.selectbox("Status", TASK_STATUSES,
+                                             index=TASK_STATUSES.index(task['status']),
+                                             key=f"status_{task_id}",
+                                             on_change=on_task_status_change, args=(task_id, task['status']),
+                                             label_visibility="collapsed")
+
+                        with col2:
+                            if permissions().can_manage(current_proj['id']):
+                                st.button("🗑️", key=f"delete_{task_id}",
+                                          on_click=on_task_delete, args=(task_id,))
+
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                st.number_input("Seite:", min_value=1, max_value=page_count, step=1, key="task_page")
+            with col2:
+                st.caption(f"{matching} von {task_total} Aufgaben · Seite {page} von {page_count}")
+        else:
+            st.info("Noch keine Aufgaben definiert.")
+
+# Check-Phase
+def render_check(current_proj):
+    saver = st.session_state.autosave
+
+    with st.container():
+        st.markdown('<div class="card-title">📊 Check - Überprüfen</div>', unsafe_allow_html=True)
+
+        if permissions().can_write(current_proj['id']):
+            st.subheader("Kennzahlen & Ergebnisse")
+
+            # Metriken eingeben
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                metric1 = st.number_input("Vorher-Wert:", 
+                                        value=current_proj.get('check', {}).get('metrics', {}).get('wartezeit_vorher', 0.0),
+                                        label_visibility="collapsed")
+            with col2:
+                metric2 = st.number_input("Nachher-Wert:", 
+                                        value=current_proj.get('check', {}).get('metrics', {}).get('wartezeit_nachher', 0.0),
+                                        label_visibility="collapsed")
+            with col3:
+                if metric1 > 0:
+                    improvement = ((metric1 - metric2) / metric1) * 100
+                    st.metric("Verbesserung", f"{improvement:.1f}%")
+
+            # Ergebnisbewertung
+            st.subheader("Ergebnisbewertung")
+            results = st.text_area("Ergebnisbewertung:", 
+                                 current_proj.get('check', {}).get('results', ''),
+                                 label_visibility="collapsed")
+
+            # Speichern
+            if 'check' not in current_proj:
+                current_proj['check'] = {}
+            current_proj['check'].update({
+                'metrics': {
+                    'wartezeit_vorher': metric1,
+                    'wartezeit_nachher': metric2,
+                    'verbesserung_prozent': round(improvement, 1) if metric1 > 0 else 0
+                },
+                'results': results
+            })
+            saver.stage(current_proj['id'], 'check', current_proj['check'])
+        else:
+            # Nur anzeigen
+            check_data = current_proj.get('check', {})
+            if check_data.get('metrics'):
+                metrics = check_data['metrics']
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.markdown(f"""
+                    <div class="metric-card">
+                        <div class="metric-value">{metrics.get('wartezeit_vorher', 0)}</div>
+                        <div class="metric-label">Vorher</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                with col2:
+                    st.markdown(f"""
+                    <div class="metric-card">
+                        <div class="metric-value">{metrics.get('wartezeit_nachher', 0)}</div>
+                        <div class="metric-label">Nachher</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                with col3:
+                    st.markdown(f"""
+                    <div class="metric-card">
+                        <div class="metric-value">{metrics.get('verbesserung_prozent', 0):.1f}%</div>
+                        <div class="metric-label">Verbesserung</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+
+            if check_data.get('results'):
+                with st.container():
+                    st.markdown("**Ergebnisse:**")
+                    st.markdown(f'<div class="card">{check_data["results"]}</div>', unsafe_allow_html=True)
+
+        render_metric_series(current_proj, editable=permissions().can_write(current_proj['id']))
+
+# Messreihen: Diagramm aus verdichteten Zeitfenstern statt aller Einzelwerte
+def render_metric_chart(current_proj, info, days):
+    # Zeitfenster stundengenau, damit alle Sessions dieselben Diagrammdaten aus dem Cache teilen
+    hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+    start = hour.timestamp() - days * 86400 if days else None
+    series = get_cache().get_or_compute(
+        "chart_series", (info['metric'], days, hour if days else None),
+        lambda: chart_series(session_store(), current_proj['id'], info['metric'], start=start,
+                             buckets=METRIC_CHART_BUCKETS, rolling_window_seconds=7 * 86400),
+        project_id=current_proj['id'])
+    if not series['points']:
+        st.info("Im gewählten Zeitraum liegen keine Messwerte vor.")
+        return
+    fig = charts.metric_series_chart(
+        series, info['metric'], info['unit'], info['target'],
+        key=[current_proj['id'], info['metric'], current_proj.get('version'), days,
+             datetime.now().strftime('%Y-%m-%d %H') if days else None])
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"{series['points']} Messwerte, verdichtet auf {len(series['ts'])} Zeitfenster (min/max/Mittelwert)")
+
+def parse_measurements_csv(upload):
+    """CSV mit den Spalten ``zeitpunkt`` und ``wert`` (oder ``timestamp``/``value``)."""
+    reader = csv.DictReader(io.TextIOWrapper(upload, encoding='utf-8-sig', newline=''))
+    points = []
+    for line, row in enumerate(reader, start=2):
+        moment = row.get('zeitpunkt') or row.get('timestamp')
+        value = row.get('wert') or row.get('value')
+        try:
+            points.append((to_epoch(moment), float(str(value).replace(',', '.'))))
+        except (TypeError, ValueError):
+            raise ValueError(f"Zeile {line}: ungültiger Zeitpunkt oder Wert")
+    return points
+
+def render_metric_series(current_proj, editable):
+    store = session_store()
+    project_id = current_proj['id']
+    st.subheader("📈 Messreihen")
+
+    if editable:
+        with st.expander("➕ Kennzahl anlegen"):
+            with st.form(f"metric_define_{project_id}", clear_on_submit=True):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    name = st.text_input("Name:", placeholder="z. B. Wartezeit")
+                with col2:
+                    unit = st.text_input("Einheit:", placeholder="z. B. min")
+                with col3:
+                    target = st.text_input("Zielwert (optional):")
+                lower_is_better = st.checkbox("Niedriger ist besser", value=True)
+                if st.form_submit_button("Anlegen") and name.strip():
+                    try:
+                        target_value = float(target.replace(',', '.')) if target.strip() else None
+                    except ValueError:
+                        st.error("Der Zielwert muss eine Zahl sein.")
+                    else:
+                        store.define_metric(project_id, name.strip(), unit.strip(), target_value, lower_is_better)
+                        st.rerun()
+
+    metrics = {info['metric']: info for info in store.list_metrics(project_id)}
+    if not metrics:
+        st.info("Noch keine Messreihen angelegt.")
+        return
+    metric = st.selectbox("Kennzahl:", list(metrics), key=f"metric_select_{project_id}")
+    info = metrics[metric]
+
+    if editable:
+        col1, col2 = st.columns(2)
+        with col1:
+            with st.form(f"metric_add_{project_id}", clear_on_submit=True):
+                st.markdown("**Messwert erfassen**")
+                day = st.date_input("Datum:", datetime.now().date())
+                moment = st.time_input("Uhrzeit:", datetime.now().time().replace(second=0, microsecond=0))
+                value = st.number_input(f"Wert ({info['unit'] or 'Wert'}):", value=0.0)
+                if st.form_submit_button("Speichern"):
+                    record_measurements(store, project_id, metric, [(datetime.combine(day, moment), value)])
+                    st.rerun()
+        with col2:
+            upload = st.file_uploader("Messwerte importieren (CSV: zeitpunkt, wert)", type=['csv'],
+                                      key=f"metric_upload_{project_id}")
+            if upload is not None and st.button("Import starten", key=f"metric_import_{project_id}"):
+                try:
+                    count = record_measurements(store, project_id, metric, parse_measurements_csv(upload))
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    st.success(f"{count} Messwerte importiert.")
+
+    days = METRIC_RANGES[st.radio("Zeitraum:", list(METRIC_RANGES), index=1, horizontal=True,
+                                  key=f"metric_range_{project_id}")]
+    render_metric_chart(current_proj, info, days)
+
+# Act-Phase
+def render_act(current_proj):
+    saver = st.session_state.autosave
+
+    with st.container():
+        st.markdown('<div class="card-title">🎯 Act - Handeln</div>', unsafe_allow_html=True)
+
+        if permissions().can_write(current_proj['id']):
+            st.subheader("Standardisierung & Nächste Schritte")
+
+            # Standardisierung
+            standardization = st.text_area("Standardisierung:", 
+                                         current_proj.get('act', {}).get('standardization', ''),
+                                         help="Wie werden die Verbesserungen dauerhaft verankert?",
+                                         label_visibility="collapsed")
+
+            # Lessons Learned
+            lessons = st.text_area("Lessons Learned:", 
+                                 current_proj.get('act', {}).get('lessons_learned', ''),
+                                 help="Was haben Sie gelernt? Was würden Sie anders machen?",
+                                 label_visibility="collapsed")
+
+            # Nächste Schritte
+            next_steps = st.text_area("Nächste Schritte:", 
+                                    current_proj.get('act', {}).get('next_steps', ''),
+                                    help="Welche Folgemaßnahmen sind geplant?",
+                                    label_visibility="collapsed")
+
+            # Speichern
+            if 'act' not in current_proj:
+                current_proj['act'] = {}
+            current_proj['act'].update({
+                'standardization': standardization,
+                'lessons_learned': lessons,
+                'next_steps': next_steps
+            })
+            saver.stage(current_proj['id'], 'act', current_proj['act'])
+        else:
+            # Nur anzeigen
+            act_data = current_proj.get('act', {})
+            if act_data.get('standardization'):
+                with st.container():
+                    st.markdown("**Standardisierung:**")
+                    st.markdown(f'<div class="card">{act_data["standardization"]}</div>', unsafe_allow_html=True)
+            if act_data.get('lessons_learned'):
+                with st.container():
+                    st.markdown("**Lessons Learned:**")
+                    st.markdown(f'<div class="card">{act_data["lessons_learned"]}</div>', unsafe_allow_html=True)
+            if act_data.get('next_steps'):
+                with st.container():
+                    st.markdown("**Nächste Schritte:**")
+                    st.markdown(f'<div class="card">{act_data["next_steps"]}</div>', unsafe_allow_html=True)
+
+# Dashboard
+def render_dashboard(current_proj):
+    scope = st.radio("Ansicht", ["Projekt", "Portfolio"], horizontal=True,
+                     key="dashboard_scope", label_visibility="collapsed")
+    readable = permissions().readable
+    if scope == "Portfolio" and readable is not None and len(readable) < get_aggregates().status_counts()['all']:
+        # Portfolio-Kennzahlen beruhen auf allen Projekten
+        st.info("Die Portfolio-Auswertung steht nur mit Zugriff auf alle Projekte zur Verfügung.")
+    elif scope == "Portfolio":
+        render_portfolio_dashboard()
+    else:
+        render_project_dashboard(current_proj)
+
+def render_portfolio_dashboard():
+    analytics = get_analytics()
+    today = datetime.now().date()
+    summary = analytics.summary(today)
+
+    with st.container():
+        st.markdown('<div class="card-title">🌐 Portfolio-Dashboard</div>', unsafe_allow_html=True)
+
+        avg_improvement = summary['avg_improvement']
+        avg_progress = summary['avg_progress']
+        kpis = [
+            (summary['projects'], "Projekte"),
+            (summary['tasks'], "Aufgaben"),
+            (f"{summary['completion_rate']:.0%}", "Abschlussquote"),
+            ("–" if avg_progress is None else f"{avg_progress:.0f}%", "Ø Fortschritt"),
+            ("–" if avg_improvement is None else f"{avg_improvement:.1f}%", "Ø Verbesserung")
+        ]
+        for col, (value, label) in zip(st.columns(len(kpis)), kpis):
+            with col:
+                st.markdown(f"""
+                <div class="metric-card">
+                    <div class="metric-value">{value}</div>
+                    <div class="metric-label">{label}</div>
+                </div>
+                """, unsafe_allow_html=True)
+
+        lagging = analytics.progress_overview(limit=20)
+        if len(lagging):
+            with st.expander("🐢 Offene Projekte mit dem geringsten Fortschritt"):
+                st.dataframe(lagging.rename(columns={'name': "Projekt", 'status': "Status", 'progress': "Fortschritt"}),
+                             column_config={"Fortschritt": st.column_config.ProgressColumn(
+                                 "Fortschritt", format="%.0f %%", min_value=0, max_value=100)},
+                             use_container_width=True, hide_index=True)
+
+        if not summary['tasks']:
+            st.info("Noch keine Aufgaben im Portfolio.")
+            return
+
+        col1, col2 = st.columns(2)
+        with col1:
+            by_responsible = analytics.completion_by_responsible(top=15)
+            st.plotly_chart(charts.completion_by_responsible_bar(by_responsible, analytics.version),
+                            use_container_width=True)
+        with col2:
+            by_status = analytics.overdue_by_status(today)
+            st.plotly_chart(charts.overdue_ratio_bar(by_status, analytics.version, today),
+                            use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            distribution = analytics.improvement_distribution()
+            if distribution['stats']['count']:
+                st.plotly_chart(charts.improvement_histogram(distribution['bins'], analytics.version),
+                                use_container_width=True)
+                st.caption(f"Median {distribution['stats']['50%']:.1f}% · "
+                           f"Spannweite {distribution['stats']['min']:.1f}% bis {distribution['stats']['max']:.1f}%")
+            else:
+                st.info("Noch keine Verbesserungswerte erfasst.")
+        with col2:
+            throughput = analytics.weekly_throughput()
+            if len(throughput):
+                st.plotly_chart(charts.throughput_line(throughput, analytics.version),
+                                use_container_width=True)
+            else:
+                st.info("Noch keine abgeschlossenen Aufgaben mit Zeitstempel.")
+
+def render_project_dashboard(current_proj):
+    store = session_store()
+    aggregates = get_aggregates()
+
+    with st.container():
+        st.markdown('<div class="card-title">📈 Projekt-Dashboard</div>', unsafe_allow_html=True)
+
+        # KPIs
+        col1, col2, col3, col4 = st.columns(4)
+
+        task_counts = aggregates.task_counts(current_proj['id'])
+        total_tasks = task_counts['total']
+        completed_tasks = task_counts['completed']
+        in_progress_tasks = task_counts['in_progress']
+        overdue_tasks = aggregates.overdue_count(current_proj['id'])
+
+        with col1:
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-value">{total_tasks}</div>
+                <div class="metric-label">Gesamt Aufgaben</div>
+            </div>
+            """, unsafe_allow_html=True)
+        with col2:
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-value">{completed_tasks}</div>
+                <div class="metric-label">Abgeschlossen</div>
+            </div>
+            """, unsafe_allow_html=True)
+        with col3:
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-value">{in_progress_tasks}</div>
+                <div class="metric-label">In Bearbeitung</div>
+            </div>
+            """, unsafe_allow_html=True)
+        with col4:
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-value">{overdue_tasks}</div>
+                <div class="metric-label">Überfällig</div>
+            </div>
+            """, unsafe_allow_html=True)
+
+        # Aufgaben-Status Diagramm
+        if total_tasks:
+            status_counts = {status: n for status, n in task_counts.items() if status != 'total' and n}
+
+            st.plotly_chart(charts.status_pie(status_counts), use_container_width=True)
+
+        # Zeitlicher Verlauf: Messreihen, sonst Vorher/Nachher-Vergleich
+        metric_series = store.list_metrics(current_proj['id'])
+        check_data = current_proj.get('check', {}).get('metrics', {})
+        if metric_series:
+            for info in metric_series:
+                render_metric_chart(current_proj, info, None)
+        elif check_data:
+            fig = charts.before_after_bar(check_data.get('wartezeit_vorher', 0), check_data.get('wartezeit_nachher', 0))
+            st.plotly_chart(fig, use_container_width=True)
+
+        # Überfällige Aufgaben aller sichtbaren Projekte (Bereichsabfrage auf dem Fälligkeitsindex)
+        readable = permissions().readable
+        if readable is None:
+            portfolio_overdue = aggregates.overdue_count()
+            due_soon = aggregates.due_soon_count(7)
+        else:
+            portfolio_overdue = len(aggregates.overdue_tasks(limit=None, project_ids=readable))
+            due_soon = len(aggregates.due_soon_tasks(7, project_ids=readable))
+        with st.expander(f"⏰ Überfällige Aufgaben aller Projekte ({portfolio_overdue})"):
+            st.caption(f"Fällig in den nächsten 7 Tagen: {due_soon}")
+            overdue_ids = [task_id for _, task_id in aggregates.overdue_tasks(limit=50, project_ids=readable)]
+            overdue_rows = store.load_tasks_by_id(overdue_ids)
+            if overdue_rows:
+                st.dataframe(
+                    [{'Projekt': t['project_name'], 'Aufgabe': t['task'], 'Verantwortlich': t['responsible'],
+                      'Fällig': t['due_date'], 'Status': t['status']} for t in overdue_rows],
+                    use_container_width=True, hide_index=True
+                )
+                if portfolio_overdue > len(overdue_rows):
+                    st.caption(f"Die ältesten {len(overdue_rows)} von {portfolio_overdue} Aufgaben werden angezeigt.")
+            else:
+                st.success("Keine überfälligen Aufgaben.")
+
+# Jede Phase ist ein eigenes Fragment: Eingaben in einer Phase führen nur diese erneut aus
+def as_fragment(name, render):
+    render = profiled(f"phase:{name}", render)
+    return st.fragment(render) if hasattr(st, 'fragment') else render
+
+PHASE_VIEWS = {
+    'plan': ("📋 Plan", as_fragment('plan', render_plan)),
+    'do': ("🔨 Do", as_fragment('do', render_do)),
+    'check': ("📊 Check", as_fragment('check', render_check)),
+    'act': ("🎯 Act", as_fragment('act', render_act)),
+    'dashboard': ("📈 Dashboard", as_fragment('dashboard', render_dashboard))
+}
+
+# Debug-Panel (nur Admin): zeigt den zuletzt abgeschlossenen Rerun und Mittelwerte je Abschnitt
+def render_debug_panel():
+    profiler = get_profiler()
+    with st.expander("🩺 Performance"):
+        last = profiler.last("main")
+        if last is None:
+            st.caption("Noch kein vollständiger Durchlauf gemessen.")
+            return
+        st.caption(f"Letzter Rerun: {last['duration_ms']:.0f} ms · {last['queries']} Abfragen "
+                   f"({last['query_ms']:.0f} ms)")
+        if 'bytes' in last:
+            st.caption(f"{last['elements']} Elemente, davon {last['widgets']} Widgets · "
+                       f"{last['bytes'] / 1024:.1f} KB an den Browser")
+        else:
+            st.caption(f"Widgets und Bytes werden in {profiler.sample_rate:.0%} der Reruns gezählt.")
+        st.dataframe([{'Abschnitt': path, 'ms': values['ms'], 'Aufrufe': values['calls']}
+                      for path, values in sorted(last['sections'].items(), key=lambda item: -item[1]['ms'])],
+                     use_container_width=True, hide_index=True)
+        st.markdown("**Mittelwerte seit Start**")
+        st.dataframe([{'Abschnitt': row['section'], 'Ø ms': round(row['mean_ms'], 1),
+                       'p95 ms': round(row['p95_ms'], 1), 'max ms': round(row['max_ms'], 1),
+                       'Aufrufe': row['calls']} for row in profiler.section_stats()[:15]],
+                     use_container_width=True, hide_index=True)
+        st.markdown("**Geteilter Cache**")
+        st.dataframe([{'Bereich': row['namespace'], 'Treffer': row['hits'], 'Fehlschläge': row['misses'],
+                       'Quote': f"{row['hit_rate']:.0%}", 'Einträge': row['entries']}
+                      for row in get_cache().stats()]
+                     + [{'Bereich': "figures", 'Treffer': charts.figure_cache.hits,
+                         'Fehlschläge': charts.figure_cache.misses,
+                         'Quote': f"{charts.figure_cache.hits / ((charts.figure_cache.hits + charts.figure_cache.misses) or 1):.0%}",
+                         'Einträge': len(charts.figure_cache._entries)}],
+                     use_container_width=True, hide_index=True)
+        st.download_button("📄 Prometheus-Metriken", profiler.prometheus_text(), file_name="kvp.prom",
+                           mime="text/plain", use_container_width=True)
+
+# Freigaben des aktiven Projekts (für alle, die es verwalten dürfen)
+def render_sharing(current_proj):
+    store = session_store()
+    project_id = current_proj['id']
+    with st.expander("🔐 Freigaben"):
+        labels = {team_principal(team['id']): f"👥 {team['name']}" for team in get_store().list_teams()}
+        labels.update({user_principal(user['id']): f"👤 {user['name']}" for user in get_store().list_users()})
+        for principal, level in store.project_acl(project_id).items():
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.markdown(f"{labels.get(principal, principal)} · {LEVEL_LABELS.get(level, level)}")
+            with col2:
+                st.button("✖", key=f"revoke_{principal}", on_click=store.revoke, args=(project_id, principal))
+        st.caption(f"Ohne Freigabe für {labels.get(EVERYONE, EVERYONE)} sehen nur die genannten Benutzer und Teams "
+                   "sowie Admins das Projekt.")
+        with st.form(f"grant_{project_id}", clear_on_submit=True):
+            principal = st.selectbox("Freigeben für:", list(labels), format_func=labels.get)
+            level = st.radio("Stufe:", list(LEVEL_LABELS), format_func=LEVEL_LABELS.get, horizontal=True)
+            if st.form_submit_button("Freigeben"):
+                store.grant(project_id, principal, level)
+                st.rerun()
+
+# Frühere Stände des aktiven Projekts ansehen, mit dem aktuellen vergleichen und wiederherstellen
+def render_versions(current_proj):
+    store = session_store()
+    project_id = current_proj['id']
+    with st.expander("🕘 Versionen"):
+        versions = store.list_versions(project_id)
+        if len(versions) < 2:
+            st.caption("Noch keine früheren Stände.")
+            return
+        labels = {row['version']: f"v{row['version']} · {row['changed_at'][:16].replace('T', ' ')} · "
+                                  + (', '.join(row['changes']) or "Vollstand") for row in versions}
+        # Der neueste Stand ist der aktuelle
+        version = st.selectbox("Stand:", list(labels)[1:], format_func=labels.get, key=f"version_{project_id}")
+        earlier = store.load_version(project_id, version)
+        changed = [column for column in ('name', 'description', 'status') if earlier[column] != current_proj[column]]
+        for phase in PHASES:
+            current_fields = current_proj.get(phase, {})
+            changed += [f"{phase}.{field}" for field in sorted(set(earlier[phase]) | set(current_fields))
+                        if field != 'implementation_steps' and earlier[phase].get(field) != current_fields.get(field)]
+        st.caption("Seitdem geändert: " + (', '.join(changed) or "nur Aufgaben"))
+        st.json({phase: earlier[phase] for phase in PHASES}, expanded=False)
+        if permissions().can_write(project_id) and st.button("↩️ Diesen Stand wiederherstellen",
+                                                            use_container_width=True):
+            # Vorgemerkte Eingaben würden den wiederhergestellten Stand sonst überschreiben
+            st.session_state.autosave.discard(project_id)
+            try:
+                store.restore_version(project_id, version)
+            except TaskIdConflict as exc:
+                st.error(f"Wiederherstellen nicht möglich: {exc}")
+            else:
+                st.rerun()
+
+# Benutzer und Teams (nur Admin); Rechte werden danach für alle Sitzungen neu aufgelöst
+def render_user_admin():
+    store = get_store()
+    with st.expander("👥 Benutzer & Teams"):
+        users = store.list_users()
+        user_names = {user['id']: user['name'] for user in users}
+        st.dataframe([{'Login': user['id'], 'Name': user['name'], 'Rolle': user['role']} for user in users],
+                     use_container_width=True, hide_index=True)
+        with st.form("user_form", clear_on_submit=True):
+            st.markdown("**Benutzer anlegen oder ändern**")
+            user_id = st.text_input("Login:")
+            name = st.text_input("Name:")
+            role = st.selectbox("Rolle:", ROLES, index=len(ROLES) - 1)
+            if st.form_submit_button("Speichern") and user_id.strip():
+                store.save_user(user_id.strip(), name.strip() or user_id.strip(), role)
+                # Kein Projektbezug: alle aufgelösten Rechte verwerfen
+                get_cache().invalidate([])
+                st.rerun()
+
+        teams = [team for team in store.list_teams() if team_principal(team['id']) != EVERYONE]
+        for team in teams:
+            st.markdown(f"**{team['name']}**: " + (", ".join(user_names.get(member, member)
+                                                           for member in team['members']) or "–"))
+        with st.form("team_form", clear_on_submit=True):
+            st.markdown("**Team anlegen oder ändern**")
+            team_id = st.text_input("Team-ID:")
+            team_name = st.text_input("Teamname:")
+            members = st.multiselect("Mitglieder:", list(user_names), format_func=user_names.get)
+            if st.form_submit_button("Speichern") and team_id.strip() \
+                    and team_principal(team_id.strip()) != EVERYONE:
+                store.save_team(team_id.strip(), team_name.strip() or team_id.strip(), members)
+                get_cache().invalidate([])
+                st.rerun()
 
 # Hauptanwendung
 def main():
     init_session_state()
-    
+    store = session_store()
+    user = permissions()
+    aggregates = get_aggregates()
+    journal = get_journal()
+    progress_tracker = get_progress_tracker()
+    saver = st.session_state.autosave
+    saver.begin_rerun()
+    cache = get_cache()
+
     # Header
     st.markdown('<div class="header">Digitales KVP-Tool</div>', unsafe_allow_html=True)
     
     # Sidebar für Projektauswahl
-    with st.sidebar:
+    with st.sidebar, profiling.section("sidebar"):
         st.markdown("### Projektverwaltung")
         
         # File browser inspired project selection
         st.markdown("#### Kategorien")
         
         # Project status categories
+        # Projektliste des Benutzers (Admins: alle Projekte)
+        project_list = cache.get_or_compute("projects", user.user_id, store.list_projects)
+        if user.readable is None:
+            by_status = aggregates.status_counts()
+        else:
+            by_status = dict(Counter(proj['status'] for proj in project_list), all=len(project_list))
         status_counts = {
-            'all': len(st.session_state.projects),
-            'in_progress': len([p for p in st.session_state.projects.values() if p.get('status') == 'in_progress']),
-            'completed': len([p for p in st.session_state.projects.values() if p.get('status') == 'completed']),
-            'draft': len([p for p in st.session_state.projects.values() if p.get('status') == 'draft'])
+            'all': by_status['all'],
+            'in_progress': by_status.get('in_progress', 0),
+            'completed': by_status.get('completed', 0),
+            'draft': by_status.get('draft', 0)
         }
         
         col1, col2 = st.columns([1, 2])
@@ -160,7 +1155,7 @@ def main():
         
         # Buttons for new projects
         st.markdown("---")
-        if st.button("➕ Neues Projekt", use_container_width=True):
+        if user.can_create and st.button("➕ Neues Projekt", use_container_width=True):
             new_project = {
                 'id': str(uuid.uuid4()),
                 'name': 'Neues KVP-Projekt',
@@ -169,19 +1164,53 @@ def main():
                 'status': 'draft',
                 'plan': {}, 'do': {}, 'check': {}, 'act': {}
             }
-            st.session_state.projects[new_project['id']] = new_project
+            store.save_project(new_project)
             st.session_state.current_project = new_project['id']
             st.rerun()
-        
-        if st.button("📝 Beispielprojekt laden", use_container_width=True):
+
+        if user.can_create and st.button("📝 Beispielprojekt laden", use_container_width=True):
             sample = create_sample_project()
-            st.session_state.projects[sample['id']] = sample
+            store.save_project(sample)
             st.session_state.current_project = sample['id']
             st.rerun()
-        
+
+        # Massenimport (Datei wird blockweise gelesen und in Bündeln gespeichert)
+        if user.is_admin:
+            with st.expander("📤 Projekte importieren"):
+                upload = st.file_uploader("JSON, JSONL oder CSV:", type=['json', 'jsonl', 'ndjson', 'csv', 'gz'])
+                if upload is not None and st.button("Import starten", use_container_width=True):
+                    try:
+                        fmt = detect_format(upload.name)
+                    except ValueError as exc:
+                        st.error(str(exc))
+                    else:
+                        raw = gzip.GzipFile(fileobj=upload) if upload.name.endswith('.gz') else upload
+                        with st.spinner("Importiere …"):
+                            report = import_stream(store, io.TextIOWrapper(raw, encoding='utf-8', newline=''), fmt)
+                        st.success(report.summary())
+                        if report.errors:
+                            st.warning(f"{report.rejected} Datensätze abgelehnt")
+                            st.dataframe([{'Datensatz': no, 'Grund': reason} for no, reason in report.errors],
+                                         use_container_width=True, hide_index=True)
+
+        # Volltextsuche über Namen, PDCA-Texte und Aufgaben
+        query = st.text_input("🔎 Projekte durchsuchen", key="project_search",
+                              placeholder="z. B. Rüstzeit, Kanban …")
+        if query.strip():
+            normalized = " ".join(query.lower().split())
+            hits = cache.get_or_compute("search", (normalized, user.user_id), lambda: get_search_index().search(
+                normalized, limit=10, project_ids=user.readable))
+            if hits:
+                for hit in hits:
+                    st.button(f"{hit.name} · {', '.join(hit.fields)}", key=f"search_hit_{hit.project_id}",
+                              on_click=on_search_select, args=(hit.project_id,), use_container_width=True)
+            else:
+                st.caption("Keine Treffer.")
+
         # Project list
-        if st.session_state.projects:
-            project_names = {pid: proj['name'] for pid, proj in st.session_state.projects.items()}
+        if project_list:
+            project_names = {proj['id']: proj['name'] if proj['progress'] is None
+                             else f"{proj['name']} · {proj['progress']:.0f} %" for proj in project_list}
             selected_project = st.selectbox(
                 "Aktives Projekt:",
                 options=list(project_names.keys()),
@@ -190,21 +1219,29 @@ def main():
                       list(project_names.keys()).index(st.session_state.current_project) 
                       if st.session_state.current_project in project_names else 0
             )
+            if selected_project != st.session_state.current_project:
+                saver.flush(force=True)
             st.session_state.current_project = selected_project
         
-        # User role
-        st.selectbox("Benutzerrolle:", ['Admin', 'Bearbeiter', 'Leser'], 
-                    index=['Admin', 'Bearbeiter', 'Leser'].index(st.session_state.user_role),
-                    key='user_role')
+        # Angemeldeter Benutzer (Rolle wird von Admins vergeben)
+        st.caption(f"👤 {user.name} · {user.role}")
         
-        # Recent actions
+        # Recent actions (Tail-Abfrage auf dem Ereignisjournal)
         st.markdown("---")
         st.markdown("### Letzte Aktionen")
-        st.markdown('<div class="file-browser-item"><span class="file-browser-item-icon">📝</span><div class="file-browser-item-text">Projekt aktualisiert</div><div class="file-browser-item-count">heute</div></div>', unsafe_allow_html=True)
-        st.markdown('<div class="file-browser-item"><span class="file-browser-item-icon">✅</span><div class="file-browser-item-text">Aufgabe erledigt</div><div class="file-browser-item-count">gestern</div></div>', unsafe_allow_html=True)
+        only_current = st.checkbox("Nur aktives Projekt", key="journal_only_current")
+        journal_scope = st.session_state.current_project if only_current else None
+        entries = cache.get_or_compute("journal", (journal_scope, user.user_id), lambda: journal.recent(
+            5, project_id=journal_scope, project_ids=user.readable))
+        for entry in entries:
+            st.markdown(f'<div class="file-browser-item"><span class="file-browser-item-icon">{ACTION_ICONS.get(entry["kind"], "📝")}</span>'
+                        f'<div class="file-browser-item-text">{html.escape(entry["summary"])}<br><small>{html.escape(entry["project_name"])}</small></div>'
+                        f'<div class="file-browser-item-count">{format_when(entry["ts"])}</div></div>', unsafe_allow_html=True)
+        if not entries:
+            st.caption("Noch keine Aktionen.")
     
     # Hauptinhalt
-    if not st.session_state.projects:
+    if not project_list:
         with st.container():
             st.info("👋 Willkommen! Erstellen Sie ein neues Projekt oder laden Sie das Beispielprojekt.")
             
@@ -223,22 +1260,28 @@ def main():
                 """)
         return
     
-    # Aktuelles Projekt anzeigen
-    current_proj = st.session_state.projects[st.session_state.current_project]
-    
+    # Aktuelles Projekt anzeigen (nur dieses wird aus der Datenbank geladen)
+    try:
+        with profiling.section("load_project"):
+            current_proj = store.load_project(st.session_state.current_project, with_tasks=False)
+    except ProjectNotFound:
+        st.session_state.current_project = None
+        st.rerun()
+    saver.track(current_proj)
+
     # Project header with progress
-    with st.container():
+    with st.container(), profiling.section("header"):
         col1, col2 = st.columns([3, 1])
         with col1:
-            if st.session_state.user_role in ['Admin', 'Bearbeiter']:
-                new_name = st.text_input("Projektname:", current_proj['name'], key="proj_name")
-                if new_name != current_proj['name']:
-                    current_proj['name'] = new_name
+            if permissions().can_write(current_proj['id']):
+                sync_widget(f"proj_name_{current_proj['id']}", current_proj['name'])
+                st.text_input("Projektname:", current_proj['name'], key=f"proj_name_{current_proj['id']}",
+                              on_change=on_project_rename, args=(current_proj['id'], current_proj['name']))
             else:
                 st.markdown(f'<div class="card-title">{current_proj["name"]}</div>', unsafe_allow_html=True)
         
         with col2:
-            progress = calculate_progress(current_proj)
+            progress = progress_tracker.progress(current_proj)
             st.markdown(f"""
             <div class="metric-card">
                 <div class="metric-value">{progress:.0f}%</div>
@@ -246,357 +1289,99 @@ def main():
             </div>
             """, unsafe_allow_html=True)
     
-    # Tabs für PDCA-Phasen
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["📋 Plan", "🔨 Do", "📊 Check", "🎯 Act", "📈 Dashboard"])
-    
-    with tab1:  # PLAN
-        with st.container():
-            st.markdown('<div class="card-title">📋 Plan - Planen</div>', unsafe_allow_html=True)
-            
-            if st.session_state.user_role in ['Admin', 'Bearbeiter']:
-                # Problemdefinition
-                with st.container():
-                    st.subheader("Problemdefinition")
-                    problem = st.text_area("Was ist das Problem?", 
-                                         current_proj.get('plan', {}).get('problem', ''),
-                                         help="Beschreiben Sie das Problem konkret und messbar",
-                                         label_visibility="collapsed")
-                
-                # Zielsetzung
-                with st.container():
-                    st.subheader("Zielsetzung")
-                    goal = st.text_area("Was ist das Ziel?", 
-                                      current_proj.get('plan', {}).get('goal', ''),
-                                      help="SMART-Ziele: Spezifisch, Messbar, Erreichbar, Relevant, Terminiert",
-                                      label_visibility="collapsed")
-                
-                # Ursachenanalyse
-                with st.container():
-                    st.subheader("Ursachenanalyse")
-                    root_cause = st.text_area("Was sind die Hauptursachen?", 
-                                            current_proj.get('plan', {}).get('root_cause', ''),
-                                            help="Nutzen Sie 5-Why, Ishikawa-Diagramm oder andere Analysemethoden",
-                                            label_visibility="collapsed")
-                
-                # Maßnahmenplanung
-                with st.container():
-                    st.subheader("Maßnahmenplanung")
-                    measures_text = st.text_area("Geplante Maßnahmen (eine pro Zeile):", 
-                                               '\n'.join(current_proj.get('plan', {}).get('measures', [])),
-                                               label_visibility="collapsed")
-                    measures = [m.strip() for m in measures_text.split('\n') if m.strip()]
-                
-                # Automatisches Speichern
-                if 'plan' not in current_proj:
-                    current_proj['plan'] = {}
-                current_proj['plan'].update({
-                    'problem': problem,
-                    'goal': goal,
-                    'root_cause': root_cause,
-                    'measures': measures
-                })
-            else:
-                # Nur anzeigen für Leser
-                plan_data = current_proj.get('plan', {})
-                if plan_data.get('problem'):
-                    with st.container():
-                        st.markdown("**Problem:**")
-                        st.markdown(f'<div class="card">{plan_data["problem"]}</div>', unsafe_allow_html=True)
-                if plan_data.get('goal'):
-                    with st.container():
-                        st.markdown("**Ziel:**")
-                        st.markdown(f'<div class="card">{plan_data["goal"]}</div>', unsafe_allow_html=True)
-                if plan_data.get('root_cause'):
-                    with st.container():
-                        st.markdown("**Ursachen:**")
-                        st.markdown(f'<div class="card">{plan_data["root_cause"]}</div>', unsafe_allow_html=True)
-                if plan_data.get('measures'):
-                    with st.container():
-                        st.markdown("**Maßnahmen:**")
-                        measures_html = '<div class="card">' + ''.join([f'<div class="file-browser-item"><span class="file-browser-item-icon">•</span><div class="file-browser-item-text">{measure}</div></div>' for measure in plan_data['measures']]) + '</div>'
-                        st.markdown(measures_html, unsafe_allow_html=True)
-    
-    with tab2:  # DO
-        with st.container():
-            st.markdown('<div class="card-title">🔨 Do - Umsetzen</div>', unsafe_allow_html=True)
-            
-            # Aufgaben-Management
-            st.subheader("Aufgaben-Tracking")
-            
-            if st.session_state.user_role in ['Admin', 'Bearbeiter']:
-                # Neue Aufgabe hinzufügen
-                with st.expander("➕ Neue Aufgabe hinzufügen"):
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        new_task = st.text_input("Aufgabe:")
-                    with col2:
-                        new_responsible = st.text_input("Verantwortlich:")
-                    with col3:
-                        new_date = st.date_input("Fälligkeitsdatum:")
-                    
-                    if st.button("Aufgabe hinzufügen") and new_task:
-                        if 'do' not in current_proj:
-                            current_proj['do'] = {'implementation_steps': []}
-                        if 'implementation_steps' not in current_proj['do']:
-                            current_proj['do']['implementation_steps'] = []
-                        
-                        current_proj['do']['implementation_steps'].append({
-                            'task': new_task,
-                            'responsible': new_responsible,
-                            'due_date': new_date.strftime('%Y-%m-%d'),
-                            'status': 'open',
-                            'priority': 'medium'
-                        })
-                        st.rerun()
-            
-            # Aufgabenliste anzeigen
-            tasks = current_proj.get('do', {}).get('implementation_steps', [])
-            if tasks:
-                for i, task in enumerate(tasks):
-                    status_class = f"status-{task['status']}"
-                    task_class = "task-completed" if task['status'] == 'completed' else ""
-                    
-                    with st.container():
-                        st.markdown(f"""
-                        <div class="task-item">
-                            <span class="{status_class} status-indicator"></span>
-                            <div class="file-browser-item-text {task_class}" style="flex-grow:1">{task["task"]}</div>
-                            <div style="margin-right:15px;">👤 {task['responsible']}</div>
-                            <div style="margin-right:15px;">📅 {task['due_date']}</div>
-                        """, unsafe_allow_html=True)
-                        
-                        col1, col2 = st.columns([5, 1])
-                        with col1:
-                            if st.session_state.user_role in ['Admin', 'Bearbeiter']:
-                                new_status = st.selectbox("Status", ['open', 'in_progress', 'completed'], 
-                                                        index=['open', 'in_progress', 'completed'].index(task['status']),
-                                                        key=f"status_{i}",
-                                                        label_visibility="collapsed")
-                                task['status'] = new_status
-                        
-                        with col2:
-                            if st.session_state.user_role == 'Admin':
-                                if st.button("🗑️", key=f"delete_{i}"):
-                                    tasks.pop(i)
-                                    st.rerun()
-            else:
-                st.info("Noch keine Aufgaben definiert.")
-    
-    with tab3:  # CHECK
-        with st.container():
-            st.markdown('<div class="card-title">📊 Check - Überprüfen</div>', unsafe_allow_html=True)
-            
-            if st.session_state.user_role in ['Admin', 'Bearbeiter']:
-                st.subheader("Kennzahlen & Ergebnisse")
-                
-                # Metriken eingeben
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    metric1 = st.number_input("Vorher-Wert:", 
-                                            value=current_proj.get('check', {}).get('metrics', {}).get('wartezeit_vorher', 0.0),
-                                            label_visibility="collapsed")
-                with col2:
-                    metric2 = st.number_input("Nachher-Wert:", 
-                                            value=current_proj.get('check', {}).get('metrics', {}).get('wartezeit_nachher', 0.0),
-                                            label_visibility="collapsed")
-                with col3:
-                    if metric1 > 0:
-                        improvement = ((metric1 - metric2) / metric1) * 100
-                        st.metric("Verbesserung", f"{improvement:.1f}%")
-                
-                # Ergebnisbewertung
-                st.subheader("Ergebnisbewertung")
-                results = st.text_area("Ergebnisbewertung:", 
-                                     current_proj.get('check', {}).get('results', ''),
-                                     label_visibility="collapsed")
-                
-                # Speichern
-                if 'check' not in current_proj:
-                    current_proj['check'] = {}
-                current_proj['check'].update({
-                    'metrics': {
-                        'wartezeit_vorher': metric1,
-                        'wartezeit_nachher': metric2,
-                        'verbesserung_prozent': improvement if metric1 > 0 else 0
-                    },
-                    'results': results
-                })
-            else:
-                # Nur anzeigen
-                check_data = current_proj.get('check', {})
-                if check_data.get('metrics'):
-                    metrics = check_data['metrics']
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <div class="metric-value">{metrics.get('wartezeit_vorher', 0)}</div>
-                            <div class="metric-label">Vorher</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    with col2:
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <div class="metric-value">{metrics.get('wartezeit_nachher', 0)}</div>
-                            <div class="metric-label">Nachher</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    with col3:
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <div class="metric-value">{metrics.get('verbesserung_prozent', 0):.1f}%</div>
-                            <div class="metric-label">Verbesserung</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                
-                if check_data.get('results'):
-                    with st.container():
-                        st.markdown("**Ergebnisse:**")
-                        st.markdown(f'<div class="card">{check_data["results"]}</div>', unsafe_allow_html=True)
-    
-    with tab4:  # ACT
-        with st.container():
-            st.markdown('<div class="card-title">🎯 Act - Handeln</div>', unsafe_allow_html=True)
-            
-            if st.session_state.user_role in ['Admin', 'Bearbeiter']:
-                st.subheader("Standardisierung & Nächste Schritte")
-                
-                # Standardisierung
-                standardization = st.text_area("Standardisierung:", 
-                                             current_proj.get('act', {}).get('standardization', ''),
-                                             help="Wie werden die Verbesserungen dauerhaft verankert?",
-                                             label_visibility="collapsed")
-                
-                # Lessons Learned
-                lessons = st.text_area("Lessons Learned:", 
-                                     current_proj.get('act', {}).get('lessons_learned', ''),
-                                     help="Was haben Sie gelernt? Was würden Sie anders machen?",
-                                     label_visibility="collapsed")
-                
-                # Nächste Schritte
-                next_steps = st.text_area("Nächste Schritte:", 
-                                        current_proj.get('act', {}).get('next_steps', ''),
-                                        help="Welche Folgemaßnahmen sind geplant?",
-                                        label_visibility="collapsed")
-                
-                # Speichern
-                if 'act' not in current_proj:
-                    current_proj['act'] = {}
-                current_proj['act'].update({
-                    'standardization': standardization,
-                    'lessons_learned': lessons,
-                    'next_steps': next_steps
-                })
-            else:
-                # Nur anzeigen
-                act_data = current_proj.get('act', {})
-                if act_data.get('standardization'):
-                    with st.container():
-                        st.markdown("**Standardisierung:**")
-                        st.markdown(f'<div class="card">{act_data["standardization"]}</div>', unsafe_allow_html=True)
-                if act_data.get('lessons_learned'):
-                    with st.container():
-                        st.markdown("**Lessons Learned:**")
-                        st.markdown(f'<div class="card">{act_data["lessons_learned"]}</div>', unsafe_allow_html=True)
-                if act_data.get('next_steps'):
-                    with st.container():
-                        st.markdown("**Nächste Schritte:**")
-                        st.markdown(f'<div class="card">{act_data["next_steps"]}</div>', unsafe_allow_html=True)
-    
-    with tab5:  # DASHBOARD
-        with st.container():
-            st.markdown('<div class="card-title">📈 Projekt-Dashboard</div>', unsafe_allow_html=True)
-            
-            # KPIs
-            col1, col2, col3, col4 = st.columns(4)
-            
-            tasks = current_proj.get('do', {}).get('implementation_steps', [])
-            total_tasks = len(tasks)
-            completed_tasks = len([t for t in tasks if t['status'] == 'completed'])
-            in_progress_tasks = len([t for t in tasks if t['status'] == 'in_progress'])
-            overdue_tasks = len([t for t in tasks if t['status'] != 'completed' and 
-                               datetime.strptime(t['due_date'], '%Y-%m-%d') < datetime.now()])
-            
-            with col1:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <div class="metric-value">{total_tasks}</div>
-                    <div class="metric-label">Gesamt Aufgaben</div>
-                </div>
-                """, unsafe_allow_html=True)
-            with col2:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <div class="metric-value">{completed_tasks}</div>
-                    <div class="metric-label">Abgeschlossen</div>
-                </div>
-                """, unsafe_allow_html=True)
-            with col3:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <div class="metric-value">{in_progress_tasks}</div>
-                    <div class="metric-label">In Bearbeitung</div>
-                </div>
-                """, unsafe_allow_html=True)
-            with col4:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <div class="metric-value">{overdue_tasks}</div>
-                    <div class="metric-label">Überfällig</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            # Aufgaben-Status Diagramm
-            if tasks:
-                status_counts = {}
-                for task in tasks:
-                    status = task['status']
-                    status_counts[status] = status_counts.get(status, 0) + 1
-                
-                fig = px.pie(
-                    values=list(status_counts.values()),
-                    names=list(status_counts.keys()),
-                    title="Aufgaben-Status Verteilung",
-                    color_discrete_map={
-                        'completed': '#2ecc71',
-                        'in_progress': '#f39c12',
-                        'open': '#e74c3c'
-                    }
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Zeitlicher Verlauf (falls Metriken vorhanden)
-            check_data = current_proj.get('check', {}).get('metrics', {})
-            if check_data:
-                fig = go.Figure()
-                fig.add_trace(go.Bar(
-                    x=['Vorher', 'Nachher'],
-                    y=[check_data.get('wartezeit_vorher', 0), check_data.get('wartezeit_nachher', 0)],
-                    marker_color=['#e74c3c', '#2ecc71']
-                ))
-                fig.update_layout(title="Verbesserung im Vergleich", yaxis_title="Wert")
-                st.plotly_chart(fig, use_container_width=True)
-    
+    # PDCA-Phasen: nur die ausgewählte Phase wird gerendert, die übrigen bleiben unberührt
+    active_phase = st.radio("Phase:", list(PHASE_VIEWS), format_func=lambda phase: PHASE_VIEWS[phase][0],
+                            horizontal=True, key="active_phase", label_visibility="collapsed")
+    PHASE_VIEWS[active_phase][1](current_proj)
+
     # Export-Funktionen in der Sidebar
     st.sidebar.markdown("---")
     st.sidebar.markdown("### Aktionen")
+    with st.sidebar, profiling.section("actions"):
+        render_autosave_status()
+        worker_run = store.worker_state('last_run')
+        if worker_run:
+            st.caption(f"⚙️ Hintergrunddienst: letzter Lauf {format_when(worker_run['finished_at'])} · "
+                       f"{worker_run['overdue']} überfällig · {worker_run['due_soon']} bald fällig")
+        if user.is_admin and st.button("🔍 Kennzahlen prüfen", use_container_width=True):
+            problems = aggregates.verify(get_store())
+            if problems:
+                aggregates.load(get_store())
+                st.warning("Index neu aufgebaut: " + "; ".join(problems))
+            else:
+                st.success("Kennzahlen-Index ist konsistent.")
+        render_versions(current_proj)
+        if user.can_manage(current_proj['id']):
+            render_sharing(current_proj)
+        if user.is_admin:
+            render_user_admin()
+            render_debug_panel()
     
     if st.sidebar.button("📥 Projekt exportieren", use_container_width=True):
-        project_json = json.dumps(current_proj, indent=2, ensure_ascii=False, default=str)
+        project_json = json.dumps(store.load_project(current_proj['id']), indent=2, ensure_ascii=False, default=str)
         st.sidebar.download_button(
             label="💾 JSON herunterladen",
             data=project_json,
             file_name=f"kvp_projekt_{current_proj['name'].replace(' ', '_')}.json",
             mime="application/json"
         )
-    
-    if st.sidebar.button("🗑️ Projekt löschen", use_container_width=True) and st.session_state.user_role == 'Admin':
-        if len(st.session_state.projects) > 1:
-            del st.session_state.projects[st.session_state.current_project]
-            st.session_state.current_project = list(st.session_state.projects.keys())[0]
+
+    # Portfolio-Export: wird projektweise in eine Datei unter exports/ geschrieben
+    with st.sidebar.expander("📦 Portfolio exportieren"):
+        export_statuses = st.multiselect("Status:", PROJECT_STATUSES, key="export_statuses")
+        export_format = st.radio("Format:", ["JSONL (gzip)", "Parquet"], key="export_format", horizontal=True)
+        if st.button("Export erstellen", use_container_width=True):
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            try:
+                if export_format == "Parquet":
+                    paths = export_parquet(store, os.path.join(EXPORT_DIR, f"portfolio_{stamp}"),
+                                           statuses=export_statuses)
+                else:
+                    path = os.path.join(EXPORT_DIR, f"portfolio_{stamp}.jsonl.gz")
+                    export_jsonl(store, path, statuses=export_statuses)
+                    paths = {'portfolio': path}
+            except RuntimeError as exc:
+                st.error(str(exc))
+            else:
+                for name, path in paths.items():
+                    with open(path, 'rb') as export_file:
+                        st.download_button(f"💾 {os.path.basename(path)} herunterladen", export_file,
+                                           file_name=os.path.basename(path), key=f"download_{name}",
+                                           use_container_width=True)
+
+    # A3-Berichte: Aufträge laufen im Prozesspool, die Sitzung fragt nur den Stand ab
+    with st.sidebar.expander("📄 A3-Berichte"):
+        report_format = st.radio("Format:", REPORT_FORMATS, format_func=str.upper, key="report_format",
+                                 horizontal=True)
+        report_statuses = st.multiselect("Status (Sammelbericht):", PROJECT_STATUSES, key="report_statuses")
+        report_ids = None
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Dieses Projekt", use_container_width=True):
+                report_ids = [current_proj['id']]
+        with col2:
+            if st.button("Alle sichtbaren", use_container_width=True):
+                report_ids = [project['id'] for project in project_list
+                              if not report_statuses or project['status'] in report_statuses]
+        if report_ids is not None:
+            st.session_state.report_batch = get_report_pool().submit(report_ids, report_format)
+            st.session_state.report_zip = None
+        batch = st.session_state.report_batch
+        if batch is not None:
+            if batch.finished:
+                render_report_downloads(batch)
+            else:
+                render_report_progress()
+
+    if user.can_manage(current_proj['id']) and st.sidebar.button("🗑️ Projekt löschen", use_container_width=True):
+        if len(project_list) > 1:
+            store.delete_project(current_proj['id'])
+            saver.discard(current_proj['id'])
+            st.session_state.current_project = next(p['id'] for p in project_list if p['id'] != current_proj['id'])
             st.rerun()
         else:
             st.sidebar.error("Das letzte Projekt kann nicht gelöscht werden.")
 
 if __name__ == "__main__":
-    main()
+    with get_profiler().run("main"):
+        main()
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kvp.access import ScopedStore, compile_permissions, ensure_admin  # noqa: E402
+from kvp.storage import ProjectStore  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProjectStore(str(tmp_path / 'kvp.db'))
+    ensure_admin(store, 'admin')
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def scoped(store):
+    """``scoped(user_id, role)`` legt den Benutzer an und liefert seine Sicht auf die Ablage."""
+    def make(user_id, role='Bearbeiter'):
+        if store.get_user(user_id) is None:
+            store.save_user(user_id, user_id, role)
+        return ScopedStore(store, compile_permissions(store, user_id))
+    return make
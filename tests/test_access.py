@@ -0,0 +1,69 @@
+import pytest
+
+from kvp.access import EVERYONE, MANAGE, READ, WRITE, PermissionDenied, team_principal
+from kvp.storage import ProjectNotFound
+
+
+@pytest.fixture
+def projects(store):
+    """``offen`` ist für alle bearbeitbar, ``intern`` nur für das Team ``qs``, ``privat`` für niemanden."""
+    store.insert_projects([{'id': project_id, 'name': project_id,
+                            'do': {'implementation_steps': [{'id': f'{project_id}-1', 'task': 'Aufgabe'}]}}
+                           for project_id in ('offen', 'intern', 'privat')])
+    store.revoke('intern', EVERYONE)
+    store.revoke('privat', EVERYONE)
+    store.save_user('qs-mitglied', 'QS-Mitglied', 'Bearbeiter')
+    store.save_team('qs', 'QS', ['qs-mitglied'])
+    store.grant(['intern'], team_principal('qs'), READ)
+    return store
+
+
+def test_scoped_store_hides_unreadable_projects(projects, scoped):
+    view = scoped('bea')
+    assert [project['id'] for project in view.list_projects()] == ['offen']
+    with pytest.raises(ProjectNotFound):
+        view.load_project('privat')
+    assert view.get_task('privat-1') is None
+    assert view.task_projects(['offen-1', 'privat-1']) == {'offen-1': 'offen', 'privat-1': ''}
+
+
+def test_scoped_store_rejects_writes_without_grant(projects, scoped):
+    view = scoped('qs-mitglied')
+    assert {project['id'] for project in view.list_projects()} == {'offen', 'intern'}
+    assert view.load_project('intern')['name'] == 'intern'
+    view.write_fields('offen', 'plan', {'problem': 'erlaubt'})
+    with pytest.raises(PermissionDenied):
+        view.write_fields('intern', 'plan', {'problem': 'nur Lesen'})
+    with pytest.raises(PermissionDenied):
+        view.update_task('intern-1', status='done')
+
+
+def test_reader_role_caps_grants(projects, scoped):
+    view = scoped('leser', role='Leser')
+    assert view.load_project('offen')['name'] == 'offen'
+    assert not view.permissions.can_create
+    with pytest.raises(PermissionDenied):
+        view.write_fields('offen', 'plan', {'problem': 'nur Lesen'})
+    with pytest.raises(PermissionDenied):
+        view.insert_projects([{'id': 'neu', 'name': 'neu'}])
+
+
+def test_editor_manages_only_through_personal_grant(projects, scoped):
+    projects.grant(['offen'], EVERYONE, MANAGE)
+    view = scoped('bea')
+    assert view.permissions.level('offen') == WRITE
+    with pytest.raises(PermissionDenied):
+        view.delete_project('offen')
+    view.insert_projects([{'id': 'eigenes', 'name': 'eigenes'}])
+    assert view.permissions.can_manage('eigenes')
+    assert scoped('bea').permissions.can_manage('eigenes')
+    view.grant('eigenes', team_principal('qs'), READ)
+
+
+def test_changes_since_lists_only_readable_projects(projects, scoped):
+    view = scoped('bea')
+    seq = projects.last_change_seq()
+    projects.write_fields('offen', 'plan', {'problem': 'sichtbar'})
+    projects.write_fields('privat', 'plan', {'problem': 'unsichtbar'})
+    assert [change['project_id'] for change in view.changes_since(seq)] == ['offen']
+    assert [change['project_id'] for change in projects.changes_since(seq)] == ['offen', 'privat']
@@ -0,0 +1,25 @@
+from kvp.autosave import AutoSaver
+
+
+def _check(before, after, improvement):
+    return {'metrics': {'wartezeit_vorher': before, 'wartezeit_nachher': after,
+                        'verbesserung_prozent': improvement}, 'results': ''}
+
+
+def test_recomputed_float_noise_is_not_a_change(store):
+    store.save_project({'id': 'a', 'name': 'A', 'check': _check(0.7, 0.1, (0.7 - 0.1) / 0.7 * 100)})
+    saver = AutoSaver(store)
+    saver.track(store.load_project('a'))
+    # gleiche Eingaben, anders gerundet berechnet
+    saver.stage('a', 'check', _check(0.7, 0.1, 100 - 0.1 / 0.7 * 100))
+    assert not saver.has_pending
+
+
+def test_real_changes_are_staged(store):
+    store.save_project({'id': 'a', 'name': 'A', 'check': _check(45, 32, 28.9)})
+    saver = AutoSaver(store)
+    saver.track(store.load_project('a'))
+    saver.stage('a', 'check', _check(45, 30, 33.3))
+    assert saver.has_pending
+    assert saver.flush(force=True)
+    assert store.load_project('a')['check']['metrics']['verbesserung_prozent'] == 33.3
@@ -0,0 +1,37 @@
+import random
+from datetime import date, timedelta
+
+from kvp.duedates import DueDateIndex
+
+
+def _tasks(count, seed=7):
+    rng = random.Random(seed)
+    start = date(2026, 1, 1)
+    return [(f't{number}', f'p{number % 5}', (start + timedelta(days=rng.randrange(120))).isoformat())
+            for number in range(count)]
+
+
+def test_add_many_matches_single_inserts():
+    tasks = _tasks(300) + [('ohne', 'p0', None), ('kaputt', 'p1', 'irgendwann')]
+    single, bulk = DueDateIndex(), DueDateIndex()
+    for task in tasks:
+        single.add(*task)
+    bulk.add_many(tasks)
+    assert len(bulk) == len(single) == 300
+    as_of = date(2026, 2, 15)
+    assert bulk.overdue(as_of, limit=None) == single.overdue(as_of, limit=None)
+    for project_id in ('p0', 'p3'):
+        assert bulk.due_dates(project_id) == single.due_dates(project_id)
+        assert bulk.count_due_within(10, as_of, project_id) == single.count_due_within(10, as_of, project_id)
+
+
+def test_add_many_replaces_known_tasks_and_keeps_order_for_updates():
+    index = DueDateIndex()
+    index.add_many(_tasks(50))
+    index.add_many([('t1', 'p9', '2025-12-01'), ('t1', 'p9', '2025-12-02')])
+    assert index.project_of('t1') == 'p9'
+    assert index.due_dates('p9') == ['2025-12-02']
+    index.add('neu', 'p9', '2025-11-30')
+    assert [task_id for _, task_id in index.overdue(date(2026, 1, 1), limit=2)] == ['neu', 't1']
+    index.remove('t1')
+    assert len(index) == 50
@@ -0,0 +1,57 @@
+import io
+import json
+
+from kvp.importer import import_records, import_stream, iter_csv
+
+
+def _jsonl(*records):
+    return io.StringIO('\n'.join(json.dumps(record) for record in records))
+
+
+def _project(project_id, *task_ids):
+    return {'id': project_id, 'name': project_id.upper(),
+            'do': {'implementation_steps': [{'id': task_id, 'task': f'Aufgabe {task_id}'}
+                                            for task_id in task_ids]}}
+
+
+def test_import_through_scoped_store(store, scoped):
+    bob = scoped('bob')
+    report = import_stream(bob, _jsonl(_project('a', 't1', 't2'), _project('b', 't3')), 'jsonl')
+    assert (report.projects, report.tasks, report.rejected) == (2, 3, 0)
+    assert [task['id'] for task in bob.load_tasks('a')] == ['t1', 't2']
+    assert store.project_acl('a') == {'team:all': 2, 'user:bob': 3}
+
+
+def test_csv_continuation_through_scoped_store(scoped):
+    bob = scoped('bob')
+    csv_text = 'project_id,name,task_id,task\np,P,u1,a\np,P,u2,b\np,P,u3,c\n'
+    report = import_records(bob, iter_csv(io.StringIO(csv_text), max_tasks_per_record=2))
+    assert (report.projects, report.tasks, report.rejected) == (1, 3, 0)
+    assert len(bob.load_tasks('p')) == 3
+
+
+def test_duplicate_task_ids_are_rejected(store):
+    report = import_stream(store, _jsonl(_project('a', 't1'), _project('b', 't1'), _project('c', 't2', 't2')),
+                           'jsonl')
+    assert (report.projects, report.rejected) == (1, 2)
+    assert report.errors == [(2, 'Aufgaben-ID t1 gehört bereits zu Projekt a'),
+                             (3, 'Aufgaben-ID t2 ist doppelt')]
+
+
+def test_clash_with_invisible_project_hides_its_id(store, scoped):
+    store.save_project(_project('secret', 'h1'))
+    store.revoke('secret', 'team:all')
+    report = import_stream(scoped('bob'), _jsonl(_project('mine', 'h1')), 'jsonl')
+    assert report.rejected == 1
+    assert report.errors == [(1, 'Aufgaben-ID h1 gehört bereits zu einem anderen Projekt')]
+    assert 'secret' not in report.errors[0][1]
+
+
+def test_task_ids_taken_after_validation_reject_only_that_record(store, monkeypatch):
+    store.save_project(_project('a', 't1'))
+    # Als hätte eine andere Sitzung t1 zwischen Prüfung und Schreiben vergeben
+    monkeypatch.setattr(store, 'task_projects', lambda task_ids: {})
+    report = import_stream(store, _jsonl(_project('b', 't2'), _project('c', 't1'), _project('d', 't3')), 'jsonl')
+    assert (report.projects, report.rejected) == (2, 1)
+    assert report.errors[0][0] == 2
+    assert store.project_name('c') is None
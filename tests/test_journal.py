@@ -0,0 +1,41 @@
+from kvp.journal import EventJournal
+
+
+def _record(ts, actor='anna', field='problem', project_id='p1', kind='fields_written'):
+    return {'ts': f'2026-10-18T10:{ts}', 'kind': kind, 'project_id': project_id, 'actor': actor,
+            'origin': f'session-{ts}', 'phase': 'plan', 'fields': [field]}
+
+
+def _compacted(tmp_path, records):
+    journal = EventJournal(str(tmp_path / 'journal'), segment_max_bytes=400, compact_interval_seconds=1e9)
+    for record in records:
+        journal.append(record)
+    # Nur abgeschlossene Segmente werden verdichtet: mit fremden Einträgen abschließen
+    for _ in range(3):
+        journal.append(_record('59:00', project_id='p2', kind='task_added'))
+    journal.compact()
+    return journal
+
+
+def test_compaction_keeps_time_order(tmp_path):
+    records = [_record('00:00'), _record('01:00', field='goal'), _record('02:00'),
+               _record('03:00', kind='task_added'), _record('04:00'), _record('05:00', field='goal')]
+    journal = _compacted(tmp_path, records)
+    history = journal.history('p1')
+    assert [record['ts'] for record in history] == sorted(record['ts'] for record in history)
+    assert sum(record.get('count', 1) for record in history) == len(records)
+    problem = [record for record in history
+               if record['kind'] == 'fields_written' and record['fields'] == ['problem']]
+    assert len(problem) == 1
+    assert problem[0]['ts'] == '2026-10-18T10:04:00' and problem[0]['first_ts'] == '2026-10-18T10:00:00'
+    # recent() liefert nach der Verdichtung weiterhin den neuesten Eintrag zuerst
+    assert journal.recent(1, project_id='p1')[0]['ts'] == history[-1]['ts']
+    journal.close()
+
+
+def test_coalescing_groups_by_actor_not_session(tmp_path):
+    records = [_record('00:00'), _record('01:00'), _record('02:00', actor='ben'), _record('03:00', actor='ben')]
+    journal = _compacted(tmp_path, records)
+    history = journal.history('p1')
+    assert [(record['actor'], record.get('count', 1)) for record in history] == [('anna', 2), ('ben', 2)]
+    journal.close()
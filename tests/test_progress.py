@@ -0,0 +1,52 @@
+import time
+
+from kvp.progress import ProgressTracker
+
+
+def _project(project_id, *statuses):
+    return {'id': project_id, 'name': project_id.upper(), 'plan': {'problem': 'Rüstzeit zu hoch'},
+            'do': {'implementation_steps': [{'id': f'{project_id}-{i}', 'task': 'x', 'status': status}
+                                            for i, status in enumerate(statuses)]}}
+
+
+def _tracker(store):
+    tracker = ProgressTracker(store)
+    store.subscribe(tracker.apply)
+    tracker.load()
+    return tracker
+
+
+def test_new_projects_go_to_backlog_and_updates_are_dirty(store):
+    tracker = _tracker(store)
+    store.save_project(_project('a', 'open'))
+    assert tracker.pending == 1
+    first = tracker.flush()['a']
+    store.save_project(_project('a', 'completed'))
+    assert tracker._dirty == {'a': None} and not tracker._backlog
+    assert tracker.flush()['a'] > first
+
+
+def test_progress_update_is_a_derived_change(store):
+    store.save_project(_project('a', 'open'))
+    seq = store.last_change_seq()
+    events = []
+    store.subscribe(events.append)
+    _tracker(store).flush()
+    assert [event.kind for event in events] == ['progress_updated']
+    assert [change['derived'] for change in store.changes_since(seq)] == [1]
+    # Unveränderter Wert: kein weiteres Ereignis
+    store.set_progress({'a': store.list_projects()[0]['progress']})
+    assert len(events) == 1
+
+
+def test_background_thread_recomputes_without_flush(store):
+    store.save_project(_project('a', 'open'))
+    tracker = _tracker(store)
+    tracker.start(interval_seconds=0.05)
+    try:
+        deadline = time.monotonic() + 5
+        while store.list_projects()[0]['progress'] is None and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        tracker.stop()
+    assert store.list_projects()[0]['progress'] is not None
@@ -0,0 +1,91 @@
+import pytest
+
+from kvp.history import CHECKPOINT_EVERY
+from kvp.storage import TaskIdConflict
+
+
+def _project(project_id, *task_ids, **columns):
+    return {'id': project_id, 'name': project_id.upper(), **columns,
+            'do': {'implementation_steps': [{'id': task_id, 'task': f'Aufgabe {task_id}'}
+                                            for task_id in task_ids]}}
+
+
+def test_replace_tasks_keeps_sent_reminders(store):
+    store.save_project(_project('a', 't1', 't2'))
+    store.mark_reminders_sent([('t1', 'overdue', '2026-01-01')])
+    project = store.load_project('a')
+    project['do']['implementation_steps'][0]['task'] = 'geändert'
+    store.save_project(project)
+    assert store.sent_reminders() == {('t1', 'overdue', '2026-01-01')}
+    assert [task['task'] for task in store.load_tasks('a')] == ['geändert', 'Aufgabe t2']
+
+
+def test_replace_tasks_removes_dropped_tasks(store):
+    store.save_project(_project('a', 't1', 't2'))
+    store.mark_reminders_sent([('t1', 'overdue', '2026-01-01')])
+    store.save_project(_project('a', 't2'))
+    assert [task['id'] for task in store.load_tasks('a')] == ['t2']
+    assert store.sent_reminders() == set()
+
+
+def test_replace_tasks_rejects_duplicate_ids(store):
+    store.save_project(_project('a', 't1'))
+    with pytest.raises(TaskIdConflict) as excinfo:
+        store.save_project(_project('a', 't1', 't1', name='Neu'))
+    assert excinfo.value.task_ids == ['t1']
+    assert store.project_name('a') == 'A'
+    assert len(store.load_tasks('a')) == 1
+
+
+def test_replace_tasks_rejects_foreign_ids(store):
+    store.save_project(_project('a', 't1'))
+    with pytest.raises(TaskIdConflict) as excinfo:
+        store.save_project(_project('b', 't2', 't1'))
+    assert excinfo.value.task_ids == ['t1']
+    assert store.project_name('b') is None
+    assert store.get_task('t1')['project_id'] == 'a'
+
+
+def test_append_tasks_rejects_taken_ids(store):
+    store.save_project(_project('a', 't1'))
+    store.save_project(_project('b'))
+    with pytest.raises(TaskIdConflict):
+        store.append_tasks('b', [{'id': 't1', 'task': 'x'}])
+    assert store.load_tasks('b') == []
+
+
+def test_merge_fields_writes_directly_with_current_version(store):
+    store.save_project({'id': 'a', 'name': 'A', 'plan': {'problem': 'alt'}})
+    version = store.project_version('a')
+    result = store.merge_fields('a', 'plan', {'problem': 'neu'}, base={'problem': 'x'}, expected_version=version)
+    assert result.written == {'problem': 'neu'} and result.conflicts == {}
+    assert store.load_project('a')['plan']['problem'] == 'neu'
+
+
+def test_merge_fields_reports_concurrent_changes(store):
+    store.save_project({'id': 'a', 'name': 'A', 'plan': {'problem': 'alt', 'goal': 'alt'}})
+    base = store.load_project('a')
+    store.write_fields('a', 'plan', {'problem': 'von anderen'})
+    result = store.merge_fields('a', 'plan', {'problem': 'eigenes', 'goal': 'eigenes', 'scope': 'neu'},
+                                base=base['plan'], expected_version=base['version'])
+    # goal war unverändert, scope galt als nicht vorhanden; nur problem kollidiert
+    assert result.written == {'goal': 'eigenes', 'scope': 'neu'}
+    assert result.conflicts == {'problem': 'von anderen'}
+    assert store.load_project('a')['plan'] == {'problem': 'von anderen', 'goal': 'eigenes', 'scope': 'neu'}
+
+
+def test_restore_version_across_checkpoints(store):
+    store.save_project(_project('a', 't1'))
+    for step in range(1, 2 * CHECKPOINT_EVERY + 5):
+        store.write_fields('a', 'plan', {'problem': f'Stand {step}'})
+    store.save_project(_project('a', 't2'))
+    for version in (1, CHECKPOINT_EVERY - 1, CHECKPOINT_EVERY, CHECKPOINT_EVERY + 1, 2 * CHECKPOINT_EVERY + 3):
+        expected = 'Stand %d' % (version - 1) if version > 1 else None
+        assert store.load_version('a', version)['plan'].get('problem') == expected
+    assert [task['id'] for task in store.load_version('a', 1)['do']['implementation_steps']] == ['t1']
+    latest = store.project_version('a')
+    store.restore_version('a', CHECKPOINT_EVERY + 1)
+    restored = store.load_project('a')
+    assert restored['version'] == latest + 1
+    assert restored['plan']['problem'] == 'Stand %d' % CHECKPOINT_EVERY
+    assert [task['id'] for task in store.load_tasks('a')] == ['t1']